@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from produtos import estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconcilia o contador de produtos publicados das categorias com os produtos (reparo de divergências)'
+
+    def handle(self, *args, **options):
+        corrigidas = estatisticas.recalcular_categorias()
+        self.stdout.write(self.style.SUCCESS(f'Contadores de produtos reconciliados: {corrigidas} categorias corrigidas'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categorias', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='total_produtos_publicados',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Produtos Publicados'),
+        ),
+    ]
@@ -92,6 +92,14 @@ class Categoria(models.Model):
         help_text='Ordem de exibição da categoria (menor = primeiro)'
     )
 
+    # Produtos publicados e não deletados; mantido pelos sinais de Produto
+    # (ver produtos.estatisticas), nunca gravado pelo save() da categoria
+    total_produtos_publicados = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Produtos Publicados'
+    )
+
     class Meta:
         db_table = 'categorias'
         verbose_name = 'Categoria'
@@ -140,17 +148,9 @@ class Categoria(models.Model):
     @property
     def quantidade_produtos(self):
         """
-        Retorna a quantidade de produtos nesta categoria.
+        Retorna a quantidade de produtos publicados nesta categoria.
         """
-        try:
-            from produtos.models import Produto
-            return Produto.objects.filter(
-                categoria=self,
-                publicado=True,
-                deleted=False
-            ).count()
-        except (ImportError, AttributeError):
-            return 0
+        return self.total_produtos_publicados
     
     @classmethod
     def categorias_ativas(cls):
@@ -160,20 +160,11 @@ class Categoria(models.Model):
     @classmethod
     def categorias_com_produtos(cls):
         """Retorna categorias que possuem produtos."""
-        try:
-            from produtos.models import Produto
-            categorias_com_produtos = Produto.objects.filter(
-                publicado=True,
-                deleted=False
-            ).values_list('categoria_id', flat=True).distinct()
-            
-            return cls.objects.filter(
-                id__in=categorias_com_produtos,
-                ativo=True,
-                deletado=False
-            )
-        except (ImportError, AttributeError):
-            return cls.objects.none()
+        return cls.objects.filter(
+            total_produtos_publicados__gt=0,
+            ativo=True,
+            deletado=False
+        )
     
     def save(self, *args, **kwargs):
         """
@@ -190,4 +181,12 @@ class Categoria(models.Model):
         if self.cor and not self.cor.startswith('#'):
             self.cor = f'#{self.cor}'
         
+        # O contador é atualizado com F() pelos produtos: uma instância
+        # carregada antes dessas atualizações não pode sobrescrevê-lo
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total_produtos_publicados'
+            ]
+        
         super().save(*args, **kwargs)
\ No newline at end of file
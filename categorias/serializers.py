@@ -191,9 +191,8 @@ class CategoriaDetailSerializer(CategoriaSerializer):
     def get_produtos(self, obj):
         """Retorna os produtos desta categoria."""
         try:
-            from produtos.models import Produto
-            produtos = Produto.objects.filter(
-                categoria=obj,
+            # Pelo related manager, produto.categoria já aponta para obj (sem consultas)
+            produtos = obj.produtos.filter(
                 publicado=True,
                 deleted=False
             )[:10]  # Limita a 10 produtos
@@ -6,10 +6,13 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q, Sum
 from django.utils import timezone
 from produtos.models import Produto
-from produtos.serializers import ProdutoSerializer
+from produtos.serializers import ProdutoListSerializer
+from produtos.views import ProdutoPagination
+from produtos import cache_detalhe
+from produtos.condicional import RespostaCondicionalMixin
 
 from categorias.models import Categoria
 from categorias.serializers import (
@@ -31,7 +34,28 @@ class CategoriaPagination(PageNumberPagination):
     page_query_param = 'page'
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaCondicionalMixin(RespostaCondicionalMixin):
+    """
+    GET condicional para categorias.
+    quantidade_produtos vem do contador total_produtos_publicados, e a versão
+    da categoria (cache de detalhe) muda quando seus produtos entram ou saem,
+    sem JOIN com a tabela de produtos na listagem.
+    """
+    campo_modificacao = 'atualizado_em'
+    
+    def agregados_condicionais(self):
+        agregados = {'total_produtos': Sum('total_produtos_publicados')}
+        if self.action == 'retrieve':
+            # O detalhe exibe produtos da categoria: edições neles também contam
+            agregados['produtos_modificacao'] = Max('produtos__data_atualizacao')
+        return agregados
+    
+    def partes_condicionais(self, queryset):
+        ids = queryset.order_by().values_list('id', flat=True)
+        return sorted(cache_detalhe.versoes_categorias(ids).items())
+
+
+class CategoriaViewSet(CategoriaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento completo de categorias.
     """
@@ -230,12 +254,10 @@ class CategoriaViewSet(viewsets.ModelViewSet):
             # Categoria com mais produtos
             categoria_stats = Categoria.objects.filter(
                 deletado=False
-            ).annotate(
-                num_produtos=Count('produto')
-            ).order_by('-num_produtos').first()
+            ).order_by('-total_produtos_publicados').first()
             
             categoria_com_mais_produtos = categoria_stats.nome if categoria_stats else 'Nenhuma'
-            quantidade_na_categoria_mais_produtos = categoria_stats.num_produtos if categoria_stats else 0
+            quantidade_na_categoria_mais_produtos = categoria_stats.total_produtos_publicados if categoria_stats else 0
             
             # Média de produtos por categoria
             total_produtos = Produto.objects.filter(deleted=False).count()
@@ -266,7 +288,8 @@ class CategoriaViewSet(viewsets.ModelViewSet):
             )
 
 
-class CategoriaPublicViewSet(mixins.ListModelMixin,
+class CategoriaPublicViewSet(CategoriaCondicionalMixin,
+                            mixins.ListModelMixin,
                             mixins.RetrieveModelMixin,
                             viewsets.GenericViewSet):
     """
@@ -284,12 +307,34 @@ class CategoriaPublicViewSet(mixins.ListModelMixin,
         return super().get_serializer_class()
 
 
+class CategoriaProdutosPagination(ProdutoPagination):
+    """
+    Paginação dos produtos de uma categoria: páginas numeradas (um único COUNT)
+    ou, com ?cursor=, modo cursor sem COUNT, seguindo a ordenação de ?ordenar=.
+    """
+    page_size = 20
+    
+    def get_ordenacao_cursor(self, queryset, request):
+        ordenacao = CategoriaProdutosView.ORDENACOES.get(request.query_params.get('ordenar'))
+        if not ordenacao or ordenacao.lstrip('-') not in self.cursor_ordering_fields:
+            return self.cursor_ordering_padrao
+        return ordenacao
+
+
 class CategoriaProdutosView(APIView):
     """
     View para listar produtos de uma categoria específica.
     """
     
     permission_classes = [AllowAny]
+    pagination_class = CategoriaProdutosPagination
+    
+    ORDENACOES = {
+        'preco_asc': 'preco',
+        'preco_desc': '-preco',
+        'nome': 'nome',
+        'recentes': '-data_criacao',
+    }
     
     def get(self, request, pk=None):
         """
@@ -305,7 +350,7 @@ class CategoriaProdutosView(APIView):
             )
         
         # Filtra produtos da categoria
-        produtos = Produto.objects.filter(
+        produtos = Produto.objects.para_listagem().filter(
             categoria=categoria,
             publicado=True,
             deleted=False
@@ -330,40 +375,40 @@ class CategoriaProdutosView(APIView):
             except ValueError:
                 pass
         
-        # Ordenação
-        ordenacao = request.query_params.get('ordenar', None)
-        if ordenacao == 'preco_asc':
-            produtos = produtos.order_by('preco')
-        elif ordenacao == 'preco_desc':
-            produtos = produtos.order_by('-preco')
-        elif ordenacao == 'nome':
-            produtos = produtos.order_by('nome')
-        elif ordenacao == 'recentes':
-            produtos = produtos.order_by('-data_criacao')
-        
-        # Paginação simples
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 20))
-        start = (page - 1) * page_size
-        end = start + page_size
+        # Ordenação (o id desempata para a paginação ser estável)
+        ordenacao = self.ORDENACOES.get(request.query_params.get('ordenar'))
+        if ordenacao:
+            produtos = produtos.order_by(ordenacao, 'id')
         
-        produtos_paginados = produtos[start:end]
+        paginator = self.pagination_class()
+        pagina = paginator.paginate_queryset(produtos, request, view=self)
         
-        serializer = ProdutoSerializer(
-            produtos_paginados,
+        serializer = ProdutoListSerializer(
+            pagina,
             many=True,
             context={'request': request}
         )
         
-        return Response({
+        resposta = {
             'categoria': {
                 'id': str(categoria.id),
                 'nome': categoria.nome,
                 'descricao': categoria.descricao
             },
             'produtos': serializer.data,
-            'total': produtos.count(),
-            'page': page,
+        }
+        
+        if paginator.modo_cursor:
+            resposta['next'] = paginator.proximo_link
+            return Response(resposta)
+        
+        # Paginator do Django guarda o COUNT: total e total_pages usam a mesma consulta
+        total = paginator.page.paginator.count
+        page_size = paginator.get_page_size(request)
+        resposta.update({
+            'total': total,
+            'page': paginator.page.number,
             'page_size': page_size,
-            'total_pages': (produtos.count() + page_size - 1) // page_size
-        })
\ No newline at end of file
+            'total_pages': (total + page_size - 1) // page_size
+        })
+        return Response(resposta)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig, apps
+
+
+class MidiaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'midia'
+
+    def ready(self):
+        from midia import signals
+        signals.conectar(apps.get_models())
@@ -0,0 +1,148 @@
+"""
+Coleta de blobs sem referências e recontagem das referências.
+
+Blobs com referencias=0 há mais que a carência são apagados em lotes. Cada
+blob é removido com a linha travada (select_for_update): um upload
+concorrente do mesmo conteúdo espera a coleta e grava o arquivo de novo.
+
+coletar_orfaos() varre os arquivos sob blobs/ e apaga os que não têm linha
+em Blob (upload cuja transação foi desfeita) e são mais antigos que a carência.
+"""
+import logging
+import posixpath
+from collections import Counter
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from midia.models import Blob
+from midia.signals import campos_de_arquivo
+from midia.storage import PREFIXO_BLOBS, eh_blob, provedores_referencias
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+
+CARENCIA_HORAS = getattr(settings, 'MIDIA_BLOBS_CARENCIA_HORAS', 24)
+
+
+def contar_referencias():
+    """Referências atuais por nome de blob (FileFields + provedores registrados)"""
+    referencias = Counter()
+    for model in apps.get_models():
+        campos = [campo.attname for campo in campos_de_arquivo(model)]
+        if not campos:
+            continue
+        for nomes in model._base_manager.values_list(*campos).iterator():
+            referencias.update(nome for nome in nomes if eh_blob(nome))
+    for provedor in provedores_referencias():
+        referencias.update(nome for nome in provedor() if eh_blob(nome))
+    return referencias
+
+
+def recontar():
+    """Corrige a contagem de referências de todos os blobs; retorna quantos mudaram"""
+    referencias = contar_referencias()
+    agora = timezone.now()
+    alterados = []
+    for blob in Blob.objects.only('sha256', 'nome', 'referencias', 'liberado_em').iterator():
+        total = referencias.get(blob.nome, 0)
+        liberado_em = (blob.liberado_em or agora) if total == 0 else None
+        if (blob.referencias, blob.liberado_em) != (total, liberado_em):
+            blob.referencias = total
+            blob.liberado_em = liberado_em
+            alterados.append(blob)
+    Blob.objects.bulk_update(alterados, ['referencias', 'liberado_em'], batch_size=TAMANHO_LOTE)
+    logger.info(f'Referências recontadas: {len(alterados)} blobs corrigidos')
+    return len(alterados)
+
+
+def coletar(carencia, simular=False, storage=None):
+    """Apaga os blobs liberados há mais que a carência (timedelta); retorna (quantidade, bytes)"""
+    storage = storage or default_storage
+    limite = timezone.now() - carencia
+    candidatos = Blob.objects.filter(referencias__lte=0, liberado_em__lte=limite)
+    if simular:
+        return candidatos.count(), sum(candidatos.values_list('tamanho', flat=True))
+
+    apagados = 0
+    liberados = 0
+    ultimo = ''
+    while True:
+        lote = list(candidatos.filter(sha256__gt=ultimo).order_by('sha256').values_list('sha256', flat=True)[:TAMANHO_LOTE])
+        if not lote:
+            break
+        ultimo = lote[-1]
+        for sha256 in lote:
+            with transaction.atomic():
+                blob = candidatos.select_for_update().filter(sha256=sha256).first()
+                if blob is None:
+                    # Voltou a ser referenciado desde a seleção do lote
+                    continue
+                try:
+                    storage.apagar_blob(blob.nome)
+                except Exception as e:
+                    logger.warning(f'Erro ao apagar blob {blob.nome}: {str(e)}')
+                    continue
+                blob.delete()
+            apagados += 1
+            liberados += blob.tamanho
+    logger.info(f'Coleta de blobs: {apagados} apagados, {liberados} bytes liberados')
+    return apagados, liberados
+
+
+def arquivos_blobs(storage, diretorio=PREFIXO_BLOBS):
+    """Nomes de todos os arquivos sob blobs/ no storage"""
+    try:
+        subdiretorios, arquivos = storage.listdir(diretorio)
+    except FileNotFoundError:
+        return
+    for arquivo in arquivos:
+        yield posixpath.join(diretorio, arquivo)
+    for subdiretorio in subdiretorios:
+        yield from arquivos_blobs(storage, posixpath.join(diretorio, subdiretorio))
+
+
+def coletar_orfaos(carencia, simular=False, storage=None):
+    """
+    Apaga os arquivos sob blobs/ sem linha em Blob, modificados há mais que a
+    carência (timedelta); retorna (quantidade, bytes).
+    """
+    storage = storage or default_storage
+    limite = timezone.now() - carencia
+    apagados = 0
+    liberados = 0
+
+    def processar(nomes):
+        nonlocal apagados, liberados
+        registrados = set(Blob.objects.filter(nome__in=nomes).values_list('nome', flat=True))
+        for nome in nomes:
+            if nome in registrados:
+                continue
+            try:
+                if storage.get_modified_time(nome) > limite:
+                    # Upload recente: a linha pode estar em uma transação ainda aberta
+                    continue
+                tamanho = storage.size(nome)
+                if not simular:
+                    storage.apagar_blob(nome)
+            except Exception as e:
+                logger.warning(f'Erro ao apagar arquivo órfão {nome}: {str(e)}')
+                continue
+            apagados += 1
+            liberados += tamanho
+
+    lote = []
+    for nome in arquivos_blobs(storage):
+        lote.append(nome)
+        if len(lote) == TAMANHO_LOTE:
+            processar(lote)
+            lote = []
+    if lote:
+        processar(lote)
+
+    if not simular:
+        logger.info(f'Coleta de arquivos órfãos: {apagados} apagados, {liberados} bytes liberados')
+    return apagados, liberados
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from midia import coleta
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga do storage os blobs de mídia sem referências há mais que a carência '
+        'e os arquivos em blobs/ sem registro (uploads desfeitos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--carencia',
+            type=int,
+            default=coleta.CARENCIA_HORAS,
+            help=f'Horas desde a liberação antes de apagar (padrão: {coleta.CARENCIA_HORAS})'
+        )
+        parser.add_argument(
+            '--recontar',
+            action='store_true',
+            help='Recalcula as referências a partir dos models antes da coleta'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas informa o que seria apagado'
+        )
+
+    def handle(self, *args, **options):
+        if options['recontar']:
+            corrigidos = coleta.recontar()
+            self.stdout.write(f'Referências recontadas: {corrigidos} blobs corrigidos')
+
+        carencia = timedelta(hours=options['carencia'])
+        apagados, liberados = coleta.coletar(carencia, simular=options['dry_run'])
+        orfaos, liberados_orfaos = coleta.coletar_orfaos(carencia, simular=options['dry_run'])
+        verbo = 'seriam apagados' if options['dry_run'] else 'apagados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{apagados} blobs e {orfaos} arquivos órfãos {verbo} ({liberados + liberados_orfaos} bytes)'
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('nome', models.CharField(max_length=255, unique=True, verbose_name='Nome no Storage')),
+                ('tamanho', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('referencias', models.IntegerField(default=0, verbose_name='Referências')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('liberado_em', models.DateTimeField(blank=True, help_text='Quando as referências chegaram a zero (candidato à coleta)', null=True, verbose_name='Liberado em')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+                'db_table': 'midia_blobs',
+                'indexes': [models.Index(fields=['referencias', 'liberado_em'], name='midia_blobs_referen_afb967_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """Arquivo armazenado por conteúdo (SHA-256), com contagem de referências"""
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name='SHA-256')
+    nome = models.CharField(max_length=255, unique=True, verbose_name='Nome no Storage')
+    tamanho = models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')
+    referencias = models.IntegerField(default=0, verbose_name='Referências')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    liberado_em = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Liberado em',
+        help_text='Quando as referências chegaram a zero (candidato à coleta)'
+    )
+
+    class Meta:
+        db_table = 'midia_blobs'
+        verbose_name = 'Blob'
+        verbose_name_plural = 'Blobs'
+        indexes = [
+            models.Index(fields=['referencias', 'liberado_em']),
+        ]
+
+    def __str__(self):
+        return f'{self.nome} ({self.referencias} referências)'
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from midia.storage import ArmazenamentoConteudoMixin, eh_blob
+
+
+def campos_de_arquivo(model):
+    """FileFields do model que usam o storage endereçado por conteúdo"""
+    return [
+        campo for campo in model._meta.concrete_fields
+        if isinstance(campo, FileField) and isinstance(campo.storage, ArmazenamentoConteudoMixin)
+    ]
+
+
+def liberar(arquivos):
+    """Libera as referências dos blobs após o commit (em rollback nada é liberado)"""
+    arquivos = [(storage, nome) for storage, nome in arquivos if eh_blob(nome)]
+    if not arquivos:
+        return
+
+    def executar():
+        for storage, nome in arquivos:
+            storage.delete(nome)
+    transaction.on_commit(executar)
+
+
+def marcar_substituidos(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda os arquivos que este save vai substituir"""
+    campos = campos_de_arquivo(sender)
+    if update_fields is not None:
+        campos = [campo for campo in campos if campo.name in update_fields]
+    instance._midia_substituidos = []
+    if raw or instance._state.adding or not campos:
+        return
+    deferidos = instance.get_deferred_fields()
+    campos = [campo for campo in campos if campo.attname not in deferidos]
+    if not campos:
+        return
+
+    anteriores = sender._base_manager.filter(pk=instance.pk).values(*[campo.attname for campo in campos]).first()
+    if anteriores:
+        instance._midia_substituidos = [
+            (campo.storage, anteriores[campo.attname]) for campo in campos
+            if anteriores[campo.attname] and anteriores[campo.attname] != getattr(instance, campo.attname).name
+        ]
+
+
+def liberar_substituidos(sender, instance, **kwargs):
+    liberar(getattr(instance, '_midia_substituidos', []))
+    instance._midia_substituidos = []
+
+
+def liberar_removidos(sender, instance, **kwargs):
+    liberar([(campo.storage, getattr(instance, campo.attname).name) for campo in campos_de_arquivo(sender)])
+
+
+def conectar(models):
+    """Conecta os sinais de contagem de referências aos models com arquivos"""
+    for model in models:
+        if campos_de_arquivo(model):
+            uid = model._meta.label_lower
+            pre_save.connect(marcar_substituidos, sender=model, dispatch_uid=f'midia_substituidos_{uid}')
+            post_save.connect(liberar_substituidos, sender=model, dispatch_uid=f'midia_liberar_{uid}')
+            post_delete.connect(liberar_removidos, sender=model, dispatch_uid=f'midia_removidos_{uid}')
@@ -0,0 +1,122 @@
+"""
+Storage endereçado por conteúdo.
+
+Cada arquivo salvo é gravado uma única vez em blobs/<aa>/<bb>/<sha256>.<ext>,
+independente do nome gerado pelo upload_to. O mesmo conteúdo enviado várias
+vezes reaproveita o blob e incrementa sua contagem de referências; delete()
+apenas decrementa. Blobs sem referências são apagados pelo comando
+coletar_blobs, após um período de carência.
+
+A linha de Blob participa da transação de quem salva, mas o arquivo não: se
+ela for desfeita, sobra um arquivo sem linha. coletar_blobs também apaga
+esses órfãos (após a carência), e um novo upload do mesmo conteúdo grava o
+arquivo de novo.
+
+Como o nome depende só do conteúdo, as URLs são imutáveis e podem ser
+cacheadas indefinidamente.
+
+O mixin funciona com qualquer Storage do Django: ArmazenamentoLocal
+(FileSystemStorage) e midia.storage_s3.ArmazenamentoS3 (django-storages,
+também com endpoints compatíveis como MinIO via AWS_S3_ENDPOINT_URL).
+"""
+import hashlib
+import logging
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_BLOBS = 'blobs'
+
+# Cache-Control das URLs de blobs (conteúdo imutável)
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Funções que retornam nomes de arquivos referenciados fora de FileFields
+_provedores_referencias = []
+
+
+def registrar_referencias(funcao):
+    """Registra uma função que gera nomes de blobs referenciados (ex.: JSONFields)"""
+    _provedores_referencias.append(funcao)
+    return funcao
+
+
+def provedores_referencias():
+    return list(_provedores_referencias)
+
+
+def calcular_sha256(content):
+    """SHA-256 do arquivo (usa o calculado durante o upload, quando disponível)"""
+    sha256 = getattr(content, 'sha256', None)
+    if sha256:
+        return sha256
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def nome_blob(sha256, extensao):
+    return posixpath.join(PREFIXO_BLOBS, sha256[:2], sha256[2:4], f'{sha256}{extensao}')
+
+
+def eh_blob(nome):
+    return bool(nome) and nome.startswith(f'{PREFIXO_BLOBS}/')
+
+
+class ArmazenamentoConteudoMixin:
+    """Mixin de Storage que grava por conteúdo e conta referências"""
+
+    def _save(self, name, content):
+        from midia.models import Blob
+
+        sha256 = calcular_sha256(content)
+        extensao = os.path.splitext(name)[1].lower()
+
+        with transaction.atomic():
+            blob, criado = Blob.objects.select_for_update().get_or_create(
+                sha256=sha256,
+                defaults={'nome': nome_blob(sha256, extensao), 'tamanho': content.size or 0}
+            )
+            Blob.objects.filter(sha256=sha256).update(referencias=F('referencias') + 1, liberado_em=None)
+
+        if criado and self.exists(blob.nome):
+            # Órfão de uma transação desfeita: regravado para que a coleta não o
+            # apague (pela data de modificação) antes do commit desta linha
+            super().delete(blob.nome)
+        if not self.exists(blob.nome):
+            salvo = super()._save(blob.nome, content)
+            if salvo != blob.nome:
+                # Outro processo gravou o mesmo conteúdo ao mesmo tempo
+                super().delete(salvo)
+        return blob.nome
+
+    def delete(self, name):
+        """Libera uma referência do blob; arquivos fora de blobs/ são apagados de fato"""
+        from midia.models import Blob
+
+        if not eh_blob(name):
+            return super().delete(name)
+
+        Blob.objects.filter(nome=name, referencias__gt=0).update(referencias=F('referencias') - 1)
+        Blob.objects.filter(nome=name, referencias__lte=0, liberado_em__isnull=True).update(
+            liberado_em=timezone.now()
+        )
+
+    def apagar_blob(self, name):
+        """Remove o arquivo do storage (usado pela coleta)"""
+        super().delete(name)
+
+
+class ArmazenamentoLocal(ArmazenamentoConteudoMixin, FileSystemStorage):
+    pass
+
@@ -0,0 +1,14 @@
+from storages.backends.s3 import S3Storage
+
+from midia.storage import CACHE_CONTROL, ArmazenamentoConteudoMixin, eh_blob
+
+
+class ArmazenamentoS3(ArmazenamentoConteudoMixin, S3Storage):
+    """Blobs no S3 (ou compatível) com Cache-Control de conteúdo imutável"""
+    file_overwrite = True
+
+    def get_object_parameters(self, name):
+        parametros = super().get_object_parameters(name)
+        if eh_blob(name):
+            parametros.setdefault('CacheControl', CACHE_CONTROL)
+        return parametros
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from categorias.models import Categoria
+from midia import coleta
+from midia.models import Blob
+from produtos import imagens
+from produtos.models import Produto
+from produtos.views import ProdutoViewSet
+from usuarios.models import Usuario
+
+
+class MidiaTestCase(TestCase):
+    """Storage endereçado por conteúdo em um MEDIA_ROOT temporário"""
+
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def salvar(self, nome, conteudo):
+        return default_storage.save(nome, ContentFile(conteudo))
+
+
+class ArmazenamentoConteudoTests(MidiaTestCase):
+
+    def test_mesmo_conteudo_grava_um_blob(self):
+        primeiro = self.salvar('produtos/a.png', b'conteudo')
+        segundo = self.salvar('categorias/b.png', b'conteudo')
+        outro = self.salvar('produtos/c.png', b'outro conteudo')
+
+        self.assertEqual(primeiro, segundo)
+        self.assertNotEqual(primeiro, outro)
+        self.assertTrue(primeiro.startswith('blobs/') and primeiro.endswith('.png'))
+        self.assertEqual(Blob.objects.get(nome=primeiro).referencias, 2)
+        self.assertEqual(sorted(coleta.arquivos_blobs(default_storage)), sorted([primeiro, outro]))
+
+    def test_delete_decrementa_e_libera(self):
+        nome = self.salvar('a.png', b'conteudo')
+        self.salvar('b.png', b'conteudo')
+
+        default_storage.delete(nome)
+        blob = Blob.objects.get(nome=nome)
+        self.assertEqual((blob.referencias, blob.liberado_em), (1, None))
+
+        default_storage.delete(nome)
+        blob.refresh_from_db()
+        self.assertEqual(blob.referencias, 0)
+        self.assertIsNotNone(blob.liberado_em)
+        # O arquivo só sai na coleta
+        self.assertTrue(default_storage.exists(nome))
+
+    @mock.patch.object(imagens, 'agendar')
+    def test_substituir_e_remover_liberam_referencias(self, agendar):
+        categoria = Categoria.objects.create(nome='Categoria')
+        with self.captureOnCommitCallbacks(execute=True):
+            produto = Produto.objects.create(
+                nome='Produto', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=categoria, quantidade=1, imagem_principal=ContentFile(b'original', name='a.png')
+            )
+        original = produto.imagem_principal.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            produto.imagem_principal = ContentFile(b'nova', name='b.png')
+            produto.save()
+        nova = produto.imagem_principal.name
+        self.assertEqual(Blob.objects.get(nome=original).referencias, 0)
+        self.assertEqual(Blob.objects.get(nome=nova).referencias, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.filter(id=produto.id).delete()
+        self.assertEqual(Blob.objects.get(nome=nova).referencias, 0)
+
+    def test_coleta_apaga_blobs_liberados(self):
+        liberado = self.salvar('a.png', b'liberado')
+        em_uso = self.salvar('b.png', b'em uso')
+        default_storage.delete(liberado)
+
+        self.assertEqual(coleta.coletar(timedelta(hours=1)), (0, 0))
+        self.assertEqual(coleta.coletar(timedelta(0)), (1, len(b'liberado')))
+        self.assertFalse(default_storage.exists(liberado))
+        self.assertFalse(Blob.objects.filter(nome=liberado).exists())
+        self.assertTrue(default_storage.exists(em_uso))
+
+    def test_coleta_apaga_arquivo_de_transacao_desfeita(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            nome = self.salvar('a.png', b'desfeito')
+            raise RuntimeError('Falha na transação')
+        em_uso = self.salvar('b.png', b'em uso')
+
+        self.assertFalse(Blob.objects.filter(nome=nome).exists())
+        self.assertTrue(default_storage.exists(nome))
+        # Dentro da carência o arquivo pode pertencer a uma transação em andamento
+        self.assertEqual(coleta.coletar_orfaos(timedelta(hours=1)), (0, 0))
+        self.assertEqual(coleta.coletar_orfaos(timedelta(0), simular=True), (1, len(b'desfeito')))
+        self.assertEqual(coleta.coletar_orfaos(timedelta(0)), (1, len(b'desfeito')))
+        self.assertFalse(default_storage.exists(nome))
+        self.assertTrue(default_storage.exists(em_uso))
+
+    def test_novo_upload_regrava_arquivo_orfao(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            nome = self.salvar('a.png', b'conteudo')
+            raise RuntimeError('Falha na transação')
+
+        self.assertEqual(self.salvar('b.png', b'conteudo'), nome)
+        self.assertEqual(Blob.objects.get(nome=nome).referencias, 1)
+        with default_storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.read(), b'conteudo')
+
+
+def imagem_png(largura=8, altura=8):
+    buffer = io.BytesIO()
+    Image.new('RGB', (largura, altura), (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@mock.patch.object(imagens, 'agendar')
+class ImagemUploadHandlerTests(MidiaTestCase):
+    """Upload em streaming: magic bytes, limite de tamanho e SHA-256 calculado na recepção"""
+
+    def setUp(self):
+        super().setUp()
+        self.temporarios = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temporarios, ignore_errors=True)
+        configuracao = override_settings(FILE_UPLOAD_TEMP_DIR=self.temporarios)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        categoria = Categoria.objects.create(nome='Categoria')
+        self.produto = Produto.objects.create(
+            nome='Produto', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+            categoria=categoria, quantidade=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Usuario.objects.create_user(email='upload@teste.com', nome='Teste', senha='Senha@123')
+        )
+        self.url = f'/api/produtos/produtos/{self.produto.id}/upload-imagem/'
+
+    def enviar(self, conteudo, nome='imagem.png', content_type='image/png'):
+        return self.client.post(
+            self.url, {'imagem': SimpleUploadedFile(nome, conteudo, content_type=content_type)}, format='multipart'
+        )
+
+    def assertNadaGravado(self):
+        self.produto.refresh_from_db()
+        self.assertFalse(self.produto.imagem_principal)
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(list(coleta.arquivos_blobs(default_storage)), [])
+        self.assertEqual(os.listdir(self.temporarios), [])
+
+    def test_imagem_valida_com_hash_do_conteudo(self, agendar):
+        conteudo = imagem_png()
+        # Nome e content type enganosos: o formato vem dos magic bytes
+        response = self.enviar(conteudo, nome='foto.jpg', content_type='image/jpeg')
+
+        self.assertEqual(response.status_code, 200)
+        self.produto.refresh_from_db()
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        self.assertEqual(Blob.objects.get().sha256, sha256)
+        self.assertIn(sha256, self.produto.imagem_principal.name)
+        self.assertEqual(os.listdir(self.temporarios), [])
+
+    def test_magic_bytes_invalidos(self, agendar):
+        response = self.enviar(b'<?php echo "nao sou um png"; ?>' * 10)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Formato de imagem inválido', response.data['erro'])
+        self.assertNadaGravado()
+
+    def test_arquivo_acima_do_limite(self, agendar):
+        conteudo = imagem_png(256, 256) + b'\0' * 8192
+        with mock.patch.object(ProdutoViewSet, 'tamanho_maximo_upload', 4096):
+            response = self.enviar(conteudo)
+        self.assertEqual(response.status_code, 413)
+        self.assertNadaGravado()
+
+    def test_corpo_declarado_acima_do_limite(self, agendar):
+        conteudo = imagem_png() + b'\0' * (200 * 1024)
+        with mock.patch.object(ProdutoViewSet, 'tamanho_maximo_upload', 1024):
+            response = self.enviar(conteudo)
+        self.assertEqual(response.status_code, 413)
+        self.assertNadaGravado()
@@ -0,0 +1,151 @@
+"""
+Recepção de uploads de imagem em streaming.
+
+O ImagemUploadHandler grava o corpo em chunks direto em arquivo temporário
+(memória limitada ao tamanho do chunk), identifica o formato pelos magic bytes
+do primeiro chunk, calcula o SHA-256 durante a recepção e interrompe o upload
+assim que o limite de tamanho é ultrapassado. O motivo da recusa fica em
+request.upload_erro.
+
+Setting: MIDIA_UPLOAD_TAMANHO_MAXIMO (bytes, padrão: 10MB).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+TAMANHO_MAXIMO = getattr(settings, 'MIDIA_UPLOAD_TAMANHO_MAXIMO', 10 * 1024 * 1024)
+
+# Folga para os cabeçalhos multipart e campos de texto que acompanham o arquivo
+FOLGA_MULTIPART = 64 * 1024
+
+# Assinaturas (offset, bytes) -> (formato, content type)
+ASSINATURAS = (
+    ((0, b'\xff\xd8\xff'), ('jpeg', 'image/jpeg')),
+    ((0, b'\x89PNG\r\n\x1a\n'), ('png', 'image/png')),
+    ((0, b'GIF87a'), ('gif', 'image/gif')),
+    ((0, b'GIF89a'), ('gif', 'image/gif')),
+)
+
+TAMANHO_CABECALHO = 12
+
+
+def identificar_formato(cabecalho):
+    """Formato e content type da imagem pelos magic bytes (None se não reconhecido)"""
+    if cabecalho[:4] == b'RIFF' and cabecalho[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    for (offset, assinatura), formato in ASSINATURAS:
+        if cabecalho[offset:offset + len(assinatura)] == assinatura:
+            return formato
+    return None
+
+
+class UploadRejeitado(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Arquivo enviado inválido.'
+    default_code = 'upload_rejeitado'
+
+    def __init__(self, mensagem):
+        super().__init__({'erro': mensagem})
+
+
+class ArquivoMuitoGrande(UploadRejeitado):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'arquivo_muito_grande'
+
+
+class ImagemUploadHandler(FileUploadHandler):
+    """Upload handler que aceita apenas imagens até o tamanho máximo, gravando em disco"""
+
+    def __init__(self, request=None, tamanho_maximo=TAMANHO_MAXIMO):
+        super().__init__(request)
+        self.tamanho_maximo = tamanho_maximo
+
+    def rejeitar(self, erro):
+        self.request.upload_erro = erro
+        self.upload_interrupted()
+        # Não lê o restante do corpo
+        raise StopUpload(connection_reset=True)
+
+    def mensagem_tamanho(self):
+        return f'Imagem muito grande. Tamanho máximo: {self.tamanho_maximo // (1024 * 1024)}MB'
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Corpo declarado maior que o permitido: recusa sem ler nada
+        if content_length and content_length > self.tamanho_maximo + FOLGA_MULTIPART:
+            self.request.upload_erro = ArquivoMuitoGrande(self.mensagem_tamanho())
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > self.tamanho_maximo:
+            self.rejeitar(ArquivoMuitoGrande(self.mensagem_tamanho()))
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.cabecalho = b''
+        self.formato = None
+        self.hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.tamanho_maximo:
+            self.rejeitar(ArquivoMuitoGrande(self.mensagem_tamanho()))
+
+        if self.formato is None and len(self.cabecalho) < TAMANHO_CABECALHO:
+            self.cabecalho += raw_data[:TAMANHO_CABECALHO - len(self.cabecalho)]
+            if len(self.cabecalho) >= TAMANHO_CABECALHO:
+                self.verificar_formato()
+
+        self.hash.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def verificar_formato(self):
+        self.formato = identificar_formato(self.cabecalho)
+        if self.formato is None:
+            self.rejeitar(UploadRejeitado('Formato de imagem inválido. Use: JPEG, PNG, GIF ou WebP'))
+
+    def file_complete(self, file_size):
+        if self.formato is None:
+            self.verificar_formato()
+        self.file.seek(0)
+        self.file.size = file_size
+        # Content type e hash confiáveis, derivados do conteúdo recebido
+        self.file.content_type = self.formato[1]
+        self.file.formato = self.formato[0]
+        self.file.sha256 = self.hash.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        arquivo = getattr(self, 'file', None)
+        if arquivo is not None and not arquivo.closed:
+            # NamedTemporaryFile é removido ao fechar
+            arquivo.close()
+
+
+class UploadImagemMixin:
+    """
+    Instala o ImagemUploadHandler nas ações listadas em acoes_upload_imagem
+    e transforma uploads recusados em respostas de erro antes da view.
+    """
+    acoes_upload_imagem = ()
+    tamanho_maximo_upload = TAMANHO_MAXIMO
+
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if getattr(self, 'action', None) in self.acoes_upload_imagem:
+            request.upload_handlers = [ImagemUploadHandler(request, self.tamanho_maximo_upload)]
+        return drf_request
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.acoes_upload_imagem and request.content_type.startswith('multipart/'):
+            # Autenticação e permissões já passaram: processa o corpo agora
+            request.data
+            erro = getattr(request._request, 'upload_erro', None)
+            if erro is not None:
+                raise erro
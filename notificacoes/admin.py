@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('assunto', 'tipo', 'status', 'tentativas', 'proxima_tentativa', 'criado_em', 'enviado_em')
+    list_filter = ('status', 'tipo', 'criado_em')
+    search_fields = ('assunto', 'destinatarios')
+    readonly_fields = [campo.name for campo in EmailOutbox._meta.fields]
+    actions = ['reenfileirar']
+
+    def has_add_permission(self, request):
+        return False
+
+    def reenfileirar(self, request, queryset):
+        # Enviados não guardam mais o corpo da mensagem
+        total = queryset.exclude(status__in=[EmailOutbox.ENVIANDO, EmailOutbox.ENVIADO]).update(
+            status=EmailOutbox.PENDENTE, tentativas=0, proxima_tentativa=timezone.now(), ultimo_erro=''
+        )
+        self.message_user(request, f'{total} e-mails reenfileirados')
+    reenfileirar.short_description = 'Reenfileirar e-mails selecionados'
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notificacoes import outbox
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails pendentes da outbox (uma vez, ou continuamente com --continuo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=outbox.TAMANHO_LOTE,
+            help=f'E-mails reservados por vez (padrão: {outbox.TAMANHO_LOTE})'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Continua verificando a fila até ser interrompido (worker)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos entre verificações no modo contínuo (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['continuo']:
+            enviados, falhas = outbox.processar(tamanho_lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(f'Outbox processada: {enviados} enviados, {falhas} falhas'))
+            return
+
+        self.stdout.write(f'Processando a outbox a cada {options["intervalo"]}s (Ctrl+C para parar)')
+        try:
+            while True:
+                outbox.processar(tamanho_lote=options['lote'])
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker da outbox encerrado')
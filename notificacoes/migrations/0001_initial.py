@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-17 03:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(blank=True, default='', help_text='Origem do e-mail (ex.: recuperacao_senha, promocao)', max_length=50, verbose_name='Tipo')),
+                ('assunto', models.CharField(max_length=255, verbose_name='Assunto')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('mensagem_html', models.TextField(blank=True, default='', verbose_name='Mensagem HTML')),
+                ('remetente', models.CharField(max_length=254, verbose_name='Remetente')),
+                ('destinatarios', models.JSONField(verbose_name='Destinatários')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou')], default='pendente', max_length=10, verbose_name='Status')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now, help_text='Pendentes: quando pode ser enviado. Enviando: fim da reserva do worker.', verbose_name='Próxima tentativa')),
+                ('ultimo_erro', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'E-mail da fila',
+                'verbose_name_plural': 'E-mails da fila',
+                'db_table': 'notificacoes_email_outbox',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='notificacoe_status_cdca67_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils import timezone
+
+
+class EmailOutbox(models.Model):
+    """E-mail enfileirado na transação da requisição e enviado pelo comando processar_outbox"""
+
+    PENDENTE = 'pendente'
+    ENVIANDO = 'enviando'
+    ENVIADO = 'enviado'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (ENVIANDO, 'Enviando'),
+        (ENVIADO, 'Enviado'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        verbose_name='Tipo',
+        help_text='Origem do e-mail (ex.: recuperacao_senha, promocao)'
+    )
+    assunto = models.CharField(max_length=255, verbose_name='Assunto')
+    mensagem = models.TextField(verbose_name='Mensagem')
+    mensagem_html = models.TextField(blank=True, default='', verbose_name='Mensagem HTML')
+    remetente = models.CharField(max_length=254, verbose_name='Remetente')
+    destinatarios = models.JSONField(verbose_name='Destinatários')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDENTE, verbose_name='Status')
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+    proxima_tentativa = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Próxima tentativa',
+        help_text='Pendentes: quando pode ser enviado. Enviando: fim da reserva do worker.'
+    )
+    ultimo_erro = models.TextField(blank=True, default='', verbose_name='Último erro')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    enviado_em = models.DateTimeField(null=True, blank=True, verbose_name='Enviado em')
+
+    class Meta:
+        db_table = 'notificacoes_email_outbox'
+        verbose_name = 'E-mail da fila'
+        verbose_name_plural = 'E-mails da fila'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa']),
+        ]
+
+    def __str__(self):
+        return f'{self.assunto} -> {", ".join(self.destinatarios)} ({self.status})'
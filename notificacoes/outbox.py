@@ -0,0 +1,184 @@
+"""
+Fila transacional de e-mails (outbox).
+
+enfileirar_email() grava o e-mail na mesma transação da alteração que o
+originou: se ela for desfeita, nada é enviado; se for confirmada, o e-mail
+não se perde com o SMTP lento ou fora do ar, e a requisição não espera por ele.
+
+O comando processar_outbox faz o envio:
+- reserva um lote (status enviando, com prazo da reserva em proxima_tentativa;
+  no PostgreSQL com SKIP LOCKED, para vários workers em paralelo);
+- envia todos os lotes por uma única conexão do EMAIL_BACKEND;
+- em caso de falha, reagenda com backoff exponencial até MAX_TENTATIVAS e
+  depois marca como falhou.
+
+Uma reserva vencida (worker interrompido) volta a ser elegível, então cada
+e-mail é entregue pelo menos uma vez.
+
+O corpo pode conter segredos (ex.: link de redefinição de senha): ao ser
+enviado, o e-mail fica só com assunto, destinatários e datas, e as linhas
+enviadas ou que falharam são apagadas após o período de retenção.
+
+Settings:
+- NOTIFICACOES_OUTBOX_MAX_TENTATIVAS: padrão 5
+- NOTIFICACOES_OUTBOX_BACKOFF: segundos antes da 2ª tentativa, padrão 60
+  (dobra a cada tentativa, até 6 horas)
+- NOTIFICACOES_OUTBOX_RETENCAO_DIAS: padrão 30
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notificacoes.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 100
+MAX_TENTATIVAS = getattr(settings, 'NOTIFICACOES_OUTBOX_MAX_TENTATIVAS', 5)
+BACKOFF = getattr(settings, 'NOTIFICACOES_OUTBOX_BACKOFF', 60)
+BACKOFF_MAXIMO = 6 * 60 * 60
+RETENCAO = timedelta(days=getattr(settings, 'NOTIFICACOES_OUTBOX_RETENCAO_DIAS', 30))
+
+# Prazo para o worker enviar um lote reservado antes que outro possa pegá-lo
+PRAZO_RESERVA = timedelta(minutes=10)
+
+
+def enfileirar_email(assunto, mensagem, destinatarios, remetente=None, mensagem_html='', tipo=''):
+    """Grava o e-mail na fila (dentro da transação em andamento, se houver)"""
+    return EmailOutbox.objects.create(
+        tipo=tipo,
+        assunto=assunto,
+        mensagem=mensagem,
+        mensagem_html=mensagem_html,
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios)
+    )
+
+
+def atraso(tentativas):
+    """Espera após a tentativa de número `tentativas` (com até 10% de variação)"""
+    segundos = min(BACKOFF * 2 ** (tentativas - 1), BACKOFF_MAXIMO)
+    return timedelta(seconds=segundos * random.uniform(1, 1.1))
+
+
+def reservar(tamanho_lote=TAMANHO_LOTE):
+    """Reserva até tamanho_lote e-mails prontos para envio e conta a tentativa"""
+    agora = timezone.now()
+    prazo = agora + PRAZO_RESERVA
+    prontos = EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.PENDENTE, EmailOutbox.ENVIANDO],
+        proxima_tentativa__lte=agora
+    )
+    with transaction.atomic():
+        # Reserva vencida na última tentativa: o worker caiu durante o envio
+        prontos.filter(status=EmailOutbox.ENVIANDO, tentativas__gte=MAX_TENTATIVAS).update(
+            status=EmailOutbox.FALHOU, ultimo_erro='Reserva expirada na última tentativa'
+        )
+        ids = list(
+            prontos.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            .order_by('proxima_tentativa')
+            .values_list('id', flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            return []
+        # O filtro repetido no UPDATE descarta o que outro worker reservou
+        # entre a leitura e a escrita (bancos sem SELECT ... FOR UPDATE)
+        prontos.filter(id__in=ids).update(
+            status=EmailOutbox.ENVIANDO,
+            proxima_tentativa=prazo,
+            tentativas=F('tentativas') + 1
+        )
+    return list(
+        EmailOutbox.objects.filter(id__in=ids, status=EmailOutbox.ENVIANDO, proxima_tentativa=prazo).order_by('id')
+    )
+
+
+def _mensagem(email, conexao):
+    mensagem = EmailMultiAlternatives(
+        subject=email.assunto,
+        body=email.mensagem,
+        from_email=email.remetente,
+        to=email.destinatarios,
+        connection=conexao
+    )
+    if email.mensagem_html:
+        mensagem.attach_alternative(email.mensagem_html, 'text/html')
+    return mensagem
+
+
+def enviar_lote(emails, conexao):
+    """Envia os e-mails reservados pela conexão e registra o resultado. Retorna (enviados, falhas)."""
+    enviados = []
+    falhas = []
+    for posicao, email in enumerate(emails):
+        try:
+            # Sem efeito se a conexão já estiver aberta
+            conexao.open()
+        except Exception as e:
+            # Servidor inacessível: o restante do lote fica para a próxima tentativa
+            falhas.extend((pendente, e) for pendente in emails[posicao:])
+            break
+        try:
+            _mensagem(email, conexao).send()
+        except Exception as e:
+            falhas.append((email, e))
+            # A próxima mensagem abre uma conexão nova
+            conexao.close()
+        else:
+            enviados.append(email.id)
+
+    agora = timezone.now()
+    if enviados:
+        EmailOutbox.objects.filter(id__in=enviados).update(
+            status=EmailOutbox.ENVIADO, enviado_em=agora, ultimo_erro='', mensagem='', mensagem_html=''
+        )
+    for email, erro in falhas:
+        esgotado = email.tentativas >= MAX_TENTATIVAS
+        logger.warning(f'Falha ao enviar e-mail {email.id} (tentativa {email.tentativas}): {erro}')
+        EmailOutbox.objects.filter(id=email.id).update(
+            status=EmailOutbox.FALHOU if esgotado else EmailOutbox.PENDENTE,
+            proxima_tentativa=agora if esgotado else agora + atraso(email.tentativas),
+            ultimo_erro=f'{type(erro).__name__}: {erro}'
+        )
+    return len(enviados), len(falhas)
+
+
+def purgar():
+    """Apaga os e-mails enviados ou que falharam há mais que o período de retenção"""
+    apagados, _ = EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.ENVIADO, EmailOutbox.FALHOU],
+        criado_em__lt=timezone.now() - RETENCAO
+    ).delete()
+    return apagados
+
+
+def processar(tamanho_lote=TAMANHO_LOTE, conexao=None):
+    """
+    Esvazia a fila (o que estiver pronto agora) em lotes, por uma única
+    conexão de e-mail. Retorna (enviados, falhas).
+    """
+    conexao = conexao or get_connection()
+    total_enviados = total_falhas = 0
+    try:
+        while True:
+            emails = reservar(tamanho_lote)
+            if not emails:
+                break
+            enviados, falhas = enviar_lote(emails, conexao)
+            total_enviados += enviados
+            total_falhas += falhas
+    finally:
+        conexao.close()
+
+    apagados = purgar()
+    if apagados:
+        logger.info(f'Outbox: {apagados} e-mails antigos apagados')
+    if total_enviados or total_falhas:
+        logger.info(f'Outbox processada: {total_enviados} enviados, {total_falhas} falhas')
+    return total_enviados, total_falhas
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notificacoes import outbox
+from notificacoes.models import EmailOutbox
+from notificacoes.outbox import enfileirar_email
+from usuarios.models import Usuario
+
+
+class ConexaoForaDoAr(EmailBackend):
+    """Backend cujo servidor nunca aceita conexão"""
+
+    def open(self):
+        raise ConnectionRefusedError('Conexão recusada')
+
+
+class OutboxTests(TestCase):
+    """Fila de e-mails com o backend locmem do Django"""
+
+    def enfileirar(self, quantidade=1):
+        return [
+            enfileirar_email(f'Assunto {i}', f'Mensagem {i}', [f'cliente{i}@teste.com'])
+            for i in range(quantidade)
+        ]
+
+    def liberar(self):
+        """Antecipa as retentativas agendadas (backoff) para agora"""
+        EmailOutbox.objects.filter(status=EmailOutbox.PENDENTE).update(proxima_tentativa=timezone.now())
+
+    def test_recuperar_senha_enfileira_sem_enviar(self):
+        Usuario.objects.create_user(email='senha@teste.com', nome='Teste', senha='Senha@123')
+        response = APIClient().post('/api/usuarios/recuperar-senha/', {'email': 'senha@teste.com'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.destinatarios, ['senha@teste.com'])
+        self.assertEqual(email.tipo, 'recuperacao_senha')
+        self.assertEqual(email.status, EmailOutbox.PENDENTE)
+        self.assertEqual(mail.outbox, [])
+
+    def test_rollback_descarta_o_email(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.enfileirar()
+            raise RuntimeError('Falha na transação')
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_processar_esvazia_a_fila_com_uma_conexao(self):
+        self.enfileirar(5)
+        with mock.patch.object(outbox, 'get_connection', wraps=get_connection) as conexoes:
+            self.assertEqual(outbox.processar(tamanho_lote=2), (5, 0))
+
+        conexoes.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.ENVIADO).exists())
+        # O corpo (ex.: link de redefinição de senha) não fica guardado após o envio
+        self.assertFalse(EmailOutbox.objects.exclude(mensagem='').exists())
+        self.assertEqual(outbox.processar(), (0, 0))
+
+    def test_falha_reagenda_com_backoff_e_desiste(self):
+        email, = self.enfileirar()
+        antes = timezone.now()
+        self.assertEqual(outbox.processar(conexao=ConexaoForaDoAr()), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.PENDENTE)
+        self.assertEqual(email.tentativas, 1)
+        self.assertGreaterEqual(email.proxima_tentativa, antes + timedelta(seconds=outbox.BACKOFF))
+        self.assertIn('ConnectionRefusedError', email.ultimo_erro)
+        # Ainda no backoff: nada a enviar
+        self.assertEqual(outbox.processar(conexao=ConexaoForaDoAr()), (0, 0))
+
+        for _ in range(outbox.MAX_TENTATIVAS - 1):
+            self.liberar()
+            outbox.processar(conexao=ConexaoForaDoAr())
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.FALHOU)
+        self.assertEqual(email.tentativas, outbox.MAX_TENTATIVAS)
+        self.assertEqual(mail.outbox, [])
+
+    def test_purga_apos_a_retencao(self):
+        antigo, recente, pendente = self.enfileirar(3)
+        EmailOutbox.objects.filter(id__in=[antigo.id, recente.id]).update(status=EmailOutbox.ENVIADO)
+        EmailOutbox.objects.filter(id__in=[antigo.id, pendente.id]).update(
+            criado_em=timezone.now() - outbox.RETENCAO - timedelta(days=1)
+        )
+        self.assertEqual(outbox.purgar(), 1)
+        self.assertEqual(set(EmailOutbox.objects.values_list('id', flat=True)), {recente.id, pendente.id})
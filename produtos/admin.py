@@ -2,11 +2,15 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.http import urlencode
-from .models import Produto, Favorito, ProdutoHistoricoPreco
+from import_export.admin import ImportMixin
+from .models import Produto, Favorito, ProdutoHistoricoPreco, Avaliacao
+from .lote import atualizar_em_lote
+from .resources import ProdutoResource
 
 
 @admin.register(Produto)
-class ProdutoAdmin(admin.ModelAdmin):
+class ProdutoAdmin(ImportMixin, admin.ModelAdmin):
+    resource_classes = [ProdutoResource]
     list_display = (
         'nome', 'marca', 'categoria', 'preco_atual', 
         'quantidade', 'disponivel', 'publicado', 'destaque', 
@@ -95,29 +99,25 @@ class ProdutoAdmin(admin.ModelAdmin):
         return format_html('<a href="{}">{} favoritos</a>', url, count)
     view_favoritos_link.short_description = "Favoritos"
     
-    # Actions personalizadas
+    # Actions personalizadas (UPDATE em massa, com histórico e índices atualizados)
+    def _atualizar_em_lote(self, request, queryset, acao, mensagem):
+        total = atualizar_em_lote(list(queryset.values_list('id', flat=True)), acao, usuario=request.user)
+        self.message_user(request, f"{total} produtos {mensagem}.")
+
     def publicar_selecionados(self, request, queryset):
-        queryset.update(publicado=True)
-        self.message_user(request, f"{queryset.count()} produtos publicados.")
+        self._atualizar_em_lote(request, queryset, 'publicar', 'publicados')
     publicar_selecionados.short_description = "Publicar produtos selecionados"
     
     def ocultar_selecionados(self, request, queryset):
-        queryset.update(publicado=False)
-        self.message_user(request, f"{queryset.count()} produtos ocultados.")
+        self._atualizar_em_lote(request, queryset, 'ocultar', 'ocultados')
     ocultar_selecionados.short_description = "Ocultar produtos selecionados"
     
     def destacar_selecionados(self, request, queryset):
-        queryset.update(destaque=True)
-        self.message_user(request, f"{queryset.count()} produtos destacados.")
+        self._atualizar_em_lote(request, queryset, 'destacar', 'destacados')
     destacar_selecionados.short_description = "Destacar produtos selecionados"
     
     def ativar_promocao_selecionados(self, request, queryset):
-        for produto in queryset:
-            if not produto.preco_promocional:
-                produto.preco_promocional = produto.preco * 0.9
-                produto.em_promocao = True
-                produto.save()
-        self.message_user(request, f"{queryset.count()} produtos com promoção ativada.")
+        self._atualizar_em_lote(request, queryset, 'ativar_promocao', 'com promoção ativada')
     ativar_promocao_selecionados.short_description = "Ativar promoção nos produtos selecionados"
 
 
@@ -135,6 +135,24 @@ class FavoritoAdmin(admin.ModelAdmin):
         return qs.select_related('usuario', 'produto')
 
 
+@admin.register(Avaliacao)
+class AvaliacaoAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'usuario', 'nota', 'data_criacao')
+    list_filter = ('nota', 'data_criacao')
+    search_fields = ('usuario__email', 'produto__nome', 'comentario')
+    readonly_fields = ('id', 'produto', 'usuario', 'nota', 'data_criacao', 'data_atualizacao')
+    list_per_page = 20
+    
+    def get_queryset(self, request):
+        """Personalizar queryset"""
+        qs = super().get_queryset(request)
+        return qs.select_related('usuario', 'produto')
+    
+    def has_add_permission(self, request):
+        # Avaliações entram pela API, que mantém os agregados do produto
+        return False
+
+
 @admin.register(ProdutoHistoricoPreco)
 class ProdutoHistoricoPrecoAdmin(admin.ModelAdmin):
     list_display = ('produto', 'preco_antigo', 'preco_novo', 'data_alteracao', 'alterado_por')
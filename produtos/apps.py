@@ -3,4 +3,10 @@ from django.apps import AppConfig
 
 class ProdutosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'produtos'
\ No newline at end of file
+    name = 'produtos'
+
+    def ready(self):
+        from midia.storage import registrar_referencias
+        from produtos import imagens, signals  # noqa: F401
+
+        registrar_referencias(imagens.nomes_variantes)
@@ -0,0 +1,132 @@
+"""
+Avaliações de produtos e os agregados materializados em Produto.
+
+Produto guarda soma_avaliacoes e total_avaliacoes; cada avaliação nova,
+alterada ou removida aplica só a diferença com um UPDATE atômico via F(), e
+avaliacao_media é recalculada no mesmo UPDATE a partir desses valores. Assim
+avaliações concorrentes não perdem atualizações e a ordenação por
+avaliacao_media continua usando o índice (avaliacao_media, id).
+
+recalcular() reconstrói os agregados a partir das avaliações (reparo de divergências).
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.utils import timezone
+
+from produtos.models import Avaliacao, Produto
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+
+CAMPOS_AGREGADOS = {'soma_avaliacoes', 'total_avaliacoes', 'avaliacao_media', 'data_atualizacao'}
+
+
+def media(soma, total):
+    """Expressão da média (0 sem avaliações), com a precisão de Produto.avaliacao_media"""
+    # O CAST para decimal não arredonda no SQLite: sem o ROUND seria gravado
+    # 3.3333..., que não bate com o valor lido (3.33) nem com o cursor de paginação
+    return Cast(
+        Round(Coalesce(Cast(soma, FloatField()) / NullIf(total, 0), Value(0.0)), 2),
+        DecimalField(max_digits=3, decimal_places=2)
+    )
+
+
+def _notificar(produto_ids):
+    from produtos.signals import produtos_atualizados_em_lote
+
+    produtos_atualizados_em_lote.send(sender=Produto, produto_ids=list(produto_ids), campos=CAMPOS_AGREGADOS)
+
+
+def ajustar_agregados(produto_id, delta_soma, delta_total=0):
+    """Aplica o delta à soma e à quantidade de avaliações do produto"""
+    if not delta_soma and not delta_total:
+        return
+    soma = F('soma_avaliacoes') + delta_soma
+    total = F('total_avaliacoes') + delta_total
+    Produto.objects.filter(id=produto_id).update(
+        soma_avaliacoes=soma,
+        total_avaliacoes=total,
+        avaliacao_media=media(soma, total),
+        data_atualizacao=timezone.now()
+    )
+    _notificar([produto_id])
+
+
+def avaliar(produto_id, usuario, nota, comentario=''):
+    """
+    Cria ou atualiza a avaliação do usuário para o produto.
+    Retorna (avaliacao, criada).
+    """
+    with transaction.atomic():
+        avaliacao = Avaliacao.objects.select_for_update().filter(produto_id=produto_id, usuario=usuario).first()
+        if avaliacao is None:
+            try:
+                with transaction.atomic():
+                    avaliacao = Avaliacao.objects.create(
+                        produto_id=produto_id, usuario=usuario, nota=nota, comentario=comentario
+                    )
+            except IntegrityError:
+                # Envio concorrente do mesmo usuário: segue como atualização
+                avaliacao = Avaliacao.objects.select_for_update().get(produto_id=produto_id, usuario=usuario)
+            else:
+                ajustar_agregados(produto_id, nota, 1)
+                return avaliacao, True
+
+        delta = nota - avaliacao.nota
+        avaliacao.nota = nota
+        avaliacao.comentario = comentario
+        avaliacao.save(update_fields=['nota', 'comentario', 'data_atualizacao'])
+        ajustar_agregados(produto_id, delta)
+    return avaliacao, False
+
+
+def recalcular(tamanho_lote=TAMANHO_LOTE):
+    """
+    Reconstrói os agregados de todos os produtos a partir das avaliações, em
+    lotes de produtos. Retorna a quantidade de produtos corrigidos.
+    """
+    avaliacoes = Avaliacao.objects.filter(produto=OuterRef('pk')).order_by().values('produto')
+    soma = Coalesce(Subquery(avaliacoes.annotate(soma=Sum('nota')).values('soma')), 0)
+    total = Coalesce(Subquery(avaliacoes.annotate(total=Count('id')).values('total')), 0)
+
+    corrigidos = 0
+    ultimo = None
+    while True:
+        produtos = Produto.objects.order_by('id')
+        if ultimo is not None:
+            produtos = produtos.filter(id__gt=ultimo)
+        lote = list(produtos.values_list('id', 'soma_avaliacoes', 'total_avaliacoes')[:tamanho_lote])
+        if not lote:
+            break
+        ultimo = lote[-1][0]
+
+        reais = {
+            linha['produto_id']: (linha['soma'], linha['total'])
+            for linha in Avaliacao.objects.filter(produto_id__in=[linha[0] for linha in lote]).order_by().values(
+                'produto_id'
+            ).annotate(soma=Sum('nota'), total=Count('id'))
+        }
+        divergentes = [
+            produto_id for produto_id, soma_atual, total_atual in lote
+            if reais.get(produto_id, (0, 0)) != (soma_atual, total_atual)
+        ]
+        if not divergentes:
+            continue
+
+        with transaction.atomic():
+            # As subconsultas leem as avaliações no momento do UPDATE, não as do lote acima
+            Produto.objects.filter(id__in=divergentes).update(
+                soma_avaliacoes=soma,
+                total_avaliacoes=total,
+                avaliacao_media=media(soma, total),
+                data_atualizacao=timezone.now()
+            )
+            _notificar(divergentes)
+        corrigidos += len(divergentes)
+
+    logger.info(f'Agregados de avaliações recalculados: {corrigidos} produtos corrigidos')
+    return corrigidos
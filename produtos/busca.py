@@ -0,0 +1,354 @@
+"""
+Motor de busca textual de produtos.
+
+Os backends mantêm um índice auxiliar (tabela ``produtos_busca``) sincronizado
+pelos sinais de Produto e respondem buscas com ranking de relevância:
+
+- SQLite: tabela virtual FTS5 com texto normalizado (sem acentos e com stemming leve)
+- PostgreSQL: coluna tsvector com índice GIN, unaccent e dicionário 'portuguese'
+- Demais bancos: fallback com icontains
+
+A busca entra no próprio queryset (junção ou subconsulta no índice), então os
+demais filtros, a ordenação por relevância e a paginação rodam na mesma
+consulta SQL. Prefixos de SKU também são encontrados ("ABC-12" acha "ABC-123").
+
+O backend pode ser forçado pela setting PRODUTOS_BUSCA_BACKEND (caminho pontuado da classe).
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TABELA_BUSCA = 'produtos_busca'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Regras de redução de plural (aplicadas sobre texto sem acentos)
+_PLURAIS = (
+    ('oes', 'ao'),
+    ('aes', 'ao'),
+    ('ais', 'al'),
+    ('eis', 'el'),
+    ('ois', 'ol'),
+    ('ns', 'm'),
+    ('les', 'l'),
+    ('res', 'r'),
+    ('zes', 'z'),
+    ('ses', 's'),
+)
+
+
+def remover_acentos(texto):
+    """Remove acentos e converte para minúsculas"""
+    normalizado = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in normalizado if not unicodedata.combining(c)).lower()
+
+
+def radical(token):
+    """
+    Stemming leve para português: reduz plural e gênero.
+    'Eletrônicos', 'eletronica' e 'eletronico' resultam todos em 'eletronic'.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+
+    for sufixo, substituto in _PLURAIS:
+        if token.endswith(sufixo) and len(token) - len(sufixo) >= 2:
+            token = token[:-len(sufixo)] + substituto
+            break
+    else:
+        if token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+
+    if len(token) > 3 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def tokenizar(texto, stemming=True):
+    """Quebra o texto em tokens normalizados"""
+    tokens = _TOKEN_RE.findall(remover_acentos(texto))
+    if stemming:
+        return [radical(token) for token in tokens]
+    return tokens
+
+
+def sku_compacto(sku):
+    """SKU só com letras e números, para busca por prefixo ('ABC-12' -> 'abc12')"""
+    return ''.join(_TOKEN_RE.findall(remover_acentos(sku))).replace('_', '')
+
+
+class BuscaBackend:
+    """Interface dos backends de busca"""
+
+    def indexar(self, produto):
+        self.indexar_em_lote([produto])
+
+    def indexar_em_lote(self, produtos):
+        raise NotImplementedError
+
+    def remover(self, produto_ids):
+        raise NotImplementedError
+
+    def limpar(self):
+        raise NotImplementedError
+
+    def filtrar(self, queryset, termo):
+        """Aplica a busca a um queryset de produtos, ordenando por relevância"""
+        raise NotImplementedError
+
+
+class BuscaSimplesBackend(BuscaBackend):
+    """Fallback sem índice: icontains nos campos principais"""
+
+    def indexar_em_lote(self, produtos):
+        pass
+
+    def remover(self, produto_ids):
+        pass
+
+    def limpar(self):
+        pass
+
+    def filtrar(self, queryset, termo):
+        return queryset.filter(
+            Q(nome__icontains=termo) |
+            Q(descricao__icontains=termo) |
+            Q(marca__icontains=termo) |
+            Q(sku__icontains=termo)
+        )
+
+
+class SQLiteFTSBackend(BuscaBackend):
+    """
+    Busca com FTS5 e ranking bm25 (pesos: nome > sku > marca > descrição).
+    O índice é unido à tabela de produtos: o FTS5 só resolve MATCH/bm25 nessa
+    forma, e uma subconsulta correlacionada refaria a busca para cada linha.
+    """
+
+    PESOS = '0, 10.0, 5.0, 8.0, 1.0, 8.0'
+
+    def _documento(self, produto):
+        return (
+            produto.id.hex,
+            ' '.join(tokenizar(produto.nome)),
+            ' '.join(tokenizar(produto.marca)),
+            ' '.join(tokenizar(produto.sku, stemming=False)),
+            ' '.join(tokenizar(produto.descricao)),
+            sku_compacto(produto.sku),
+        )
+
+    def indexar_em_lote(self, produtos):
+        produtos = list(produtos)
+        removidos = [produto.id for produto in produtos if produto.deleted]
+        ativos = [produto for produto in produtos if not produto.deleted]
+
+        # Uma transação para o lote (fora dela cada INSERT faz o próprio commit)
+        with transaction.atomic():
+            self.remover([produto.id for produto in ativos] + removidos)
+            if ativos:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {TABELA_BUSCA} (produto_id, nome, marca, sku, descricao, sku_compacto) '
+                        f'VALUES (%s, %s, %s, %s, %s, %s)',
+                        [self._documento(produto) for produto in ativos]
+                    )
+
+    def remover(self, produto_ids):
+        ids = [produto_id.hex for produto_id in produto_ids]
+        with connection.cursor() as cursor:
+            for inicio in range(0, len(ids), 500):
+                lote = ids[inicio:inicio + 500]
+                marcadores = ', '.join(['%s'] * len(lote))
+                cursor.execute(
+                    f'DELETE FROM {TABELA_BUSCA} WHERE produto_id IN ({marcadores})',
+                    lote
+                )
+
+    def limpar(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABELA_BUSCA}')
+
+    def montar_consulta(self, termo):
+        """
+        Converte o termo em uma consulta FTS5: E entre tokens, prefixo no
+        último, ou prefixo do SKU compacto
+        """
+        tokens = tokenizar(termo)
+        if not tokens:
+            return None
+        termos = [f'"{token}"' for token in tokens]
+        termos[-1] += '*'
+        consulta = ' AND '.join(termos)
+        sku = sku_compacto(termo)
+        if sku:
+            consulta = f'({consulta}) OR sku_compacto : "{sku}"*'
+        return consulta
+
+    def filtrar(self, queryset, termo):
+        consulta = self.montar_consulta(termo)
+        if not consulta:
+            return queryset.none()
+        tabela = queryset.model._meta.db_table
+        return queryset.extra(
+            select={'relevancia': f'bm25({TABELA_BUSCA}, {self.PESOS})'},
+            tables=[TABELA_BUSCA],
+            where=[f'{TABELA_BUSCA}.produto_id = {tabela}.id', f'{TABELA_BUSCA} MATCH %s'],
+            params=[consulta]
+        ).order_by('relevancia', 'id')
+
+
+class PostgresBackend(BuscaBackend):
+    """Busca com tsvector/GIN, unaccent e stemming do dicionário 'portuguese'"""
+
+    DOCUMENTO = (
+        "setweight(to_tsvector('portuguese', unaccent(%s)), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('portuguese', unaccent(%s)), 'B') || "
+        "setweight(to_tsvector('portuguese', unaccent(%s)), 'C')"
+    )
+
+    def indexar_em_lote(self, produtos):
+        produtos = list(produtos)
+        removidos = [produto.id for produto in produtos if produto.deleted]
+        ativos = [produto for produto in produtos if not produto.deleted]
+
+        with transaction.atomic():
+            if removidos:
+                self.remover(removidos)
+            if ativos:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {TABELA_BUSCA} (produto_id, documento) '
+                        f'VALUES (%s, {self.DOCUMENTO}) '
+                        f'ON CONFLICT (produto_id) DO UPDATE SET documento = EXCLUDED.documento',
+                        [
+                            (produto.id, produto.nome, produto.sku or '', produto.marca, produto.descricao)
+                            for produto in ativos
+                        ]
+                    )
+
+    def remover(self, produto_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABELA_BUSCA} WHERE produto_id = ANY(%s)',
+                [list(produto_ids)]
+            )
+
+    def limpar(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABELA_BUSCA}')
+
+    def filtrar(self, queryset, termo):
+        """
+        Correspondência no índice GIN ou prefixo do SKU; o ts_rank vem de uma
+        subconsulta pela chave primária do índice (prefixos de SKU primeiro)
+        """
+        tokens = tokenizar(termo, stemming=False)
+        if not tokens:
+            return queryset.none()
+        consulta = ' & '.join(f'{token}:*' for token in tokens)
+        tabela = queryset.model._meta.db_table
+        encontrados = RawSQL(
+            f"SELECT produto_id FROM {TABELA_BUSCA} WHERE documento @@ to_tsquery('portuguese', %s)",
+            [consulta]
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(documento, to_tsquery('portuguese', %s)) FROM {TABELA_BUSCA} "
+            f'WHERE produto_id = {tabela}.id',
+            [consulta],
+            output_field=FloatField()
+        )
+        prefixo_sku = Case(When(sku__istartswith=termo, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        return queryset.filter(
+            Q(id__in=encontrados) | Q(sku__istartswith=termo)
+        ).annotate(
+            relevancia=prefixo_sku + Coalesce(rank, Value(0.0))
+        ).order_by('-relevancia', 'id')
+
+
+BACKENDS_POR_BANCO = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresBackend,
+}
+
+_backend = None
+
+
+def indice_disponivel():
+    """Verifica se a tabela de índice foi criada pela migração"""
+    try:
+        return TABELA_BUSCA in connection.introspection.table_names()
+    except DatabaseError:
+        return False
+
+
+def obter_backend():
+    """Retorna o backend de busca configurado para o banco atual"""
+    global _backend
+    if _backend is None:
+        caminho = getattr(settings, 'PRODUTOS_BUSCA_BACKEND', None)
+        if caminho:
+            _backend = import_string(caminho)()
+        elif connection.vendor in BACKENDS_POR_BANCO and indice_disponivel():
+            _backend = BACKENDS_POR_BANCO[connection.vendor]()
+        else:
+            logger.warning('Índice de busca indisponível, usando busca simples (icontains)')
+            _backend = BuscaSimplesBackend()
+    return _backend
+
+
+def filtrar_por_parametros(produtos, parametros):
+    """
+    Filtros da busca avançada: q, categoria_id, min_preco, max_preco, marca,
+    estado, destaque e em_promocao (valores inválidos de preço são ignorados).
+    """
+    query = (parametros.get('q') or '').strip()
+    categoria_id = parametros.get('categoria_id')
+    min_preco = parametros.get('min_preco')
+    max_preco = parametros.get('max_preco')
+    marca = parametros.get('marca')
+    estado = parametros.get('estado')
+    destaque = parametros.get('destaque')
+    em_promocao = parametros.get('em_promocao')
+
+    # Busca textual com ranking de relevância
+    if query:
+        produtos = obter_backend().filtrar(produtos, query)
+
+    if categoria_id:
+        produtos = produtos.filter(categoria_id=categoria_id)
+
+    if min_preco:
+        try:
+            produtos = produtos.filter(preco__gte=float(min_preco))
+        except ValueError:
+            pass
+
+    if max_preco:
+        try:
+            produtos = produtos.filter(preco__lte=float(max_preco))
+        except ValueError:
+            pass
+
+    if marca:
+        produtos = produtos.filter(marca__iexact=marca)
+
+    if estado:
+        produtos = produtos.filter(estado=estado)
+
+    if destaque is not None:
+        produtos = produtos.filter(destaque=destaque.lower() == 'true')
+
+    if em_promocao is not None:
+        produtos = produtos.filter(em_promocao=em_promocao.lower() == 'true')
+
+    return produtos
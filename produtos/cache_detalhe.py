@@ -0,0 +1,104 @@
+"""
+Cache read-through do payload de detalhe de produto.
+
+Guarda a parte do ProdutoSerializer que não depende do usuário, com chave
+formada pelo ID do produto e por uma versão. Escritas em Produto e Categoria
+trocam a versão (após o commit), de modo que entradas antigas nunca mais são
+lidas. Cada entrada registra também a versão da categoria com que foi montada.
+
+O que depende da requisição (is_favorito e URLs absolutas) é aplicado sobre
+o payload a cada leitura.
+
+Setting: PRODUTOS_CACHE_DETALHE_TIMEOUT (segundos, padrão: 1 hora).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHAVE_VERSAO_PRODUTO = 'produtos:detalhe:versao:{}'
+CHAVE_VERSAO_CATEGORIA = 'categorias:versao:{}'
+CHAVE_PAYLOAD = 'produtos:detalhe:{}:{}'
+
+TIMEOUT = getattr(settings, 'PRODUTOS_CACHE_DETALHE_TIMEOUT', 60 * 60)
+
+# Campos com URLs relativas no payload, convertidas para absolutas na resposta
+CAMPOS_URL = ('imagem_principal', 'imagem_principal_url', 'imagem_secundaria', 'imagem_secundaria_url')
+
+
+def versao_atual(chave):
+    """Versão guardada na chave; inicializada com um valor único quando ausente"""
+    versao = cache.get(chave)
+    if versao is None:
+        versao = uuid.uuid4().hex
+        if not cache.add(chave, versao, None):
+            versao = cache.get(chave) or versao
+    return versao
+
+
+def versao_produto(produto_id):
+    return versao_atual(CHAVE_VERSAO_PRODUTO.format(produto_id))
+
+
+def versao_categoria(categoria_id):
+    return versao_atual(CHAVE_VERSAO_CATEGORIA.format(categoria_id)) if categoria_id else None
+
+
+def versoes_categorias(categoria_ids):
+    """Versões de várias categorias com uma leitura do cache: {categoria_id: versao}"""
+    chaves = {categoria_id: CHAVE_VERSAO_CATEGORIA.format(categoria_id) for categoria_id in categoria_ids}
+    encontradas = cache.get_many(list(chaves.values()))
+    return {categoria_id: encontradas.get(chave) or versao_atual(chave) for categoria_id, chave in chaves.items()}
+
+
+def invalidar_produtos(produto_ids):
+    cache.set_many({CHAVE_VERSAO_PRODUTO.format(produto_id): uuid.uuid4().hex for produto_id in produto_ids}, None)
+
+
+def invalidar_categorias(categoria_ids):
+    cache.set_many({
+        CHAVE_VERSAO_CATEGORIA.format(categoria_id): uuid.uuid4().hex
+        for categoria_id in categoria_ids if categoria_id
+    }, None)
+
+
+def obter_payload(produto_id):
+    """
+    Payload de detalhe do produto (não deletado), sem dados do usuário.
+    Sem consultas ao banco quando a entrada do cache está válida.
+    """
+    from django.shortcuts import get_object_or_404
+    from produtos.models import Produto
+    from produtos.serializers import ProdutoSerializer
+
+    versao = versao_produto(produto_id)
+    entrada = cache.get(CHAVE_PAYLOAD.format(produto_id, versao))
+    if entrada is not None:
+        categoria_id, versao_da_categoria, dados = entrada
+        if versao_categoria(categoria_id) == versao_da_categoria:
+            return dados
+
+    # As versões são lidas antes do produto: uma escrita concorrente troca a versão
+    # depois do commit e torna a entrada gravada aqui inalcançável
+    categoria_id = Produto.objects.filter(id=produto_id).values_list('categoria_id', flat=True).first()
+    versao_da_categoria = versao_categoria(categoria_id)
+    produto = get_object_or_404(Produto.objects.para_listagem(), id=produto_id, deleted=False)
+
+    # Sem request no contexto: is_favorito=False e URLs relativas
+    dados = dict(ProdutoSerializer(produto).data)
+    cache.set(
+        CHAVE_PAYLOAD.format(produto_id, versao),
+        (produto.categoria_id, versao_da_categoria, dados),
+        TIMEOUT
+    )
+    return dados
+
+
+def aplicar_requisicao(dados, request, is_favorito):
+    """Cópia do payload com URLs absolutas e is_favorito do usuário"""
+    resposta = dict(dados)
+    for campo in CAMPOS_URL:
+        if resposta.get(campo):
+            resposta[campo] = request.build_absolute_uri(resposta[campo])
+    resposta['is_favorito'] = is_favorito
+    return resposta
@@ -0,0 +1,117 @@
+"""
+GET condicional (ETag / Last-Modified) para as views da API.
+
+Os validadores saem de uma agregação barata sobre o conjunto filtrado
+(MAX do timestamp de atualização e COUNT) e são comparados com
+If-None-Match / If-Modified-Since antes de qualquer serialização.
+
+O ETag inclui os parâmetros da requisição (ordenação, página, filtros): o
+mesmo conjunto em outra página ou ordem é outra representação. Ordenações
+por campos que mudam sem tocar no timestamp (ex.: visualizações) não usam
+GET condicional.
+"""
+import hashlib
+from calendar import timegm
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def gerar_etag(*partes):
+    return quote_etag(hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest())
+
+
+def timestamp(*datas):
+    """Timestamp (segundos) da data mais recente, ignorando valores vazios"""
+    datas = [data for data in datas if data is not None]
+    return timegm(max(datas).utctimetuple()) if datas else None
+
+
+class RespostaCondicionalMixin:
+    """
+    Suporte a GET condicional em list e retrieve de ViewSets.
+    O corpo depende do usuário (is_favorito, visibilidade), então o ETag também.
+    """
+    campo_modificacao = 'data_atualizacao'
+    # Campos de ordenação que mudam sem alterar campo_modificacao
+    ordenacoes_sem_condicional = ()
+
+    def agregados_condicionais(self):
+        """Agregados extras dos validadores (ex.: timestamps de relacionamentos)"""
+        return {}
+
+    def partes_condicionais(self, queryset):
+        """Partes extras do ETag que não saem da agregação (ex.: versões em cache)"""
+        return ()
+
+    def usa_condicional(self, request):
+        ordenacao = request.query_params.get('ordering', '')
+        campos = {campo.strip().lstrip('-') for campo in ordenacao.split(',')}
+        return not campos.intersection(self.ordenacoes_sem_condicional)
+
+    def partes_usuario(self, request):
+        from produtos.models import Favorito
+
+        if not request.user.is_authenticated:
+            return None
+        favoritos = Favorito.objects.filter(usuario=request.user).aggregate(
+            total=Count('id'),
+            ultimo=Max('data_criacao')
+        )
+        return request.user.pk, request.user.is_staff, favoritos['total'], favoritos['ultimo']
+
+    def validadores(self, queryset):
+        """ETag e Last-Modified do conjunto, com uma única consulta de agregação"""
+        agregados = queryset.order_by().aggregate(
+            modificacao=Max(self.campo_modificacao),
+            total=Count('pk', distinct=True),
+            **self.agregados_condicionais()
+        )
+        partes_usuario = self.partes_usuario(self.request)
+        etag = gerar_etag(
+            sorted(agregados.items()),
+            partes_usuario,
+            sorted(self.request.GET.lists()),
+            self.partes_condicionais(queryset)
+        )
+        datas = [valor for valor in agregados.values() if isinstance(valor, datetime)]
+        if partes_usuario:
+            datas.append(partes_usuario[-1])
+        return etag, timestamp(*datas)
+
+    def responder_condicional(self, request, etag, ultima_modificacao, gerar_resposta):
+        """304 quando os validadores batem; senão gera a resposta e anexa ETag/Last-Modified"""
+        response = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+        if response is None:
+            response = gerar_resposta()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if ultima_modificacao is not None:
+                response['Last-Modified'] = http_date(ultima_modificacao)
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.usa_condicional(request):
+            return super().list(request, *args, **kwargs)
+        etag, ultima_modificacao = self.validadores(self.filter_queryset(self.get_queryset()))
+        return self.responder_condicional(
+            request, etag, ultima_modificacao,
+            lambda: super(RespostaCondicionalMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup]})
+            etag, ultima_modificacao = self.validadores(queryset)
+        except (ValueError, DjangoValidationError):
+            # Identificador malformado: a view original responde 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.responder_condicional(
+            request, etag, ultima_modificacao,
+            lambda: super(RespostaCondicionalMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,151 @@
+"""
+Manutenção das estatísticas materializadas do catálogo.
+
+Cada produto contribui para os totais conforme seu estado (deletado, publicado,
+em promoção, estoque, preço, categoria). Ao salvar um produto, aplica-se apenas
+a diferença entre a contribuição do estado original e a do novo estado, com
+UPDATEs atômicos via F(). recalcular() refaz tudo com um único GROUP BY.
+
+A quantidade de produtos ativos (publicados e não deletados) de cada categoria
+fica em Categoria.total_produtos_publicados, atualizada pelo mesmo delta.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from categorias.models import Categoria
+from produtos.models import Produto, ProdutoEstatisticas
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_TOTAIS = (
+    'total_produtos', 'produtos_ativos', 'produtos_em_promocao',
+    'produtos_sem_estoque', 'valor_total_estoque'
+)
+
+
+def contribuicao(estado):
+    """Contribuição de um produto para os totais e a categoria em que conta como ativo"""
+    totais = dict.fromkeys(CAMPOS_TOTAIS, 0)
+    if estado is None or estado['deleted']:
+        return totais, None
+
+    totais['total_produtos'] = 1
+    if not estado['publicado']:
+        return totais, None
+
+    totais['produtos_ativos'] = 1
+    totais['produtos_em_promocao'] = int(bool(estado['em_promocao']))
+    totais['produtos_sem_estoque'] = int(estado['quantidade'] == 0)
+    totais['valor_total_estoque'] = Decimal(str(estado['preco'])) * estado['quantidade']
+    return totais, estado['categoria_id']
+
+
+def estado_completo(estado):
+    return all(
+        estado[campo] is not None for campo in Produto.CAMPOS_RASTREADOS if campo != 'categoria_id'
+    )
+
+
+def aplicar_delta(antigo, novo):
+    """Aplica às estatísticas a diferença entre dois estados de um produto"""
+    if any(estado is not None and not estado_completo(estado) for estado in (antigo, novo)):
+        # Instância carregada com only()/defer(): sem estado confiável para o delta
+        recalcular()
+        return
+
+    totais_antigos, categoria_antiga = contribuicao(antigo)
+    totais_novos, categoria_nova = contribuicao(novo)
+
+    delta = {
+        campo: F(campo) + (totais_novos[campo] - totais_antigos[campo])
+        for campo in CAMPOS_TOTAIS
+        if totais_novos[campo] != totais_antigos[campo]
+    }
+    with transaction.atomic():
+        if delta and not ProdutoEstatisticas.objects.filter(pk=1).update(**delta):
+            recalcular()
+            return
+
+        if categoria_antiga != categoria_nova:
+            if categoria_antiga:
+                Categoria.objects.filter(id=categoria_antiga).update(
+                    total_produtos_publicados=F('total_produtos_publicados') - 1
+                )
+            if categoria_nova:
+                Categoria.objects.filter(id=categoria_nova).update(
+                    total_produtos_publicados=F('total_produtos_publicados') + 1
+                )
+
+
+def recalcular():
+    """Recalcula todas as estatísticas com um único GROUP BY (reparo de divergências)"""
+    valor_estoque = ExpressionWrapper(
+        F('preco') * F('quantidade'),
+        output_field=DecimalField(max_digits=16, decimal_places=2)
+    )
+    grupos = Produto.objects.filter(deleted=False).order_by().values('publicado').annotate(
+        total=Count('id'),
+        em_promocao=Count('id', filter=Q(em_promocao=True)),
+        sem_estoque=Count('id', filter=Q(quantidade=0)),
+        valor=Sum(valor_estoque)
+    )
+
+    totais = dict.fromkeys(CAMPOS_TOTAIS, 0)
+    for grupo in grupos:
+        totais['total_produtos'] += grupo['total']
+        if not grupo['publicado']:
+            continue
+        totais['produtos_ativos'] += grupo['total']
+        totais['produtos_em_promocao'] += grupo['em_promocao']
+        totais['produtos_sem_estoque'] += grupo['sem_estoque']
+        totais['valor_total_estoque'] += grupo['valor'] or 0
+
+    with transaction.atomic():
+        ProdutoEstatisticas.objects.update_or_create(pk=1, defaults=totais)
+        recalcular_categorias()
+
+    logger.info(f'Estatísticas de produtos recalculadas: {totais["total_produtos"]} produtos')
+    return totais
+
+
+def recalcular_categorias():
+    """
+    Corrige Categoria.total_produtos_publicados a partir dos produtos.
+    Grava apenas as categorias divergentes; retorna a quantidade corrigida.
+    """
+    publicados = Coalesce(Subquery(
+        Produto.objects.filter(categoria=OuterRef('pk'), publicado=True, deleted=False).order_by().values(
+            'categoria'
+        ).annotate(total=Count('id')).values('total')
+    ), 0)
+    with transaction.atomic():
+        divergentes = list(
+            Categoria.objects.annotate(real=publicados).exclude(
+                total_produtos_publicados=F('real')
+            ).values_list('id', flat=True)
+        )
+        if divergentes:
+            Categoria.objects.filter(id__in=divergentes).update(total_produtos_publicados=publicados)
+    if divergentes:
+        logger.info(f'Contadores de produtos corrigidos em {len(divergentes)} categorias')
+    return len(divergentes)
+
+
+def ler():
+    """Estatísticas no formato de ProdutoEstatisticasSerializer (duas consultas)"""
+    estatisticas = ProdutoEstatisticas.objects.filter(pk=1).values(*CAMPOS_TOTAIS).first()
+    if estatisticas is None:
+        estatisticas = recalcular()
+
+    estatisticas['produtos_por_categoria'] = dict(
+        Categoria.objects.filter(
+            total_produtos_publicados__gt=0,
+            ativo=True,
+            deletado=False
+        ).order_by('ordem', 'nome').values_list('nome', 'total_produtos_publicados')
+    )
+    return estatisticas
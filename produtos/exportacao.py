@@ -0,0 +1,129 @@
+"""
+Exportação do catálogo em fluxo (CSV, NDJSON ou XLSX).
+
+As linhas saem de values_list() com QuerySet.iterator(chunk_size=...), sem
+instanciar models, e são convertidas em blocos de bytes à medida que são lidas:
+a memória não depende da quantidade de produtos exportados.
+
+As colunas seguem as da importação (produtos.importacao), de modo que um
+arquivo exportado pode ser importado de volta.
+"""
+import csv
+import io
+import json
+import tempfile
+import uuid
+from datetime import datetime
+
+from django.utils import timezone
+
+from produtos.importacao import COLUNAS as COLUNAS_IMPORTACAO
+
+TAMANHO_LOTE = 2000
+
+# Coluna exportada -> campo consultado
+CAMPOS = dict(
+    [('id', 'id')]
+    + [(coluna, coluna) for coluna in COLUNAS_IMPORTACAO]
+    + [
+        ('categoria', 'categoria__nome'),
+        ('slug', 'slug'),
+        ('em_promocao', 'em_promocao'),
+        ('data_criacao', 'data_criacao'),
+        ('data_atualizacao', 'data_atualizacao'),
+    ]
+)
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def linhas(queryset):
+    """Tuplas na ordem de CAMPOS, lidas em blocos do banco"""
+    return queryset.order_by('data_criacao', 'id').values_list(*CAMPOS.values()).iterator(chunk_size=TAMANHO_LOTE)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'sim' if valor else 'nao'
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+def gerar_csv(linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para o Excel reconhecer UTF-8
+    buffer.write('﻿')
+    escritor.writerow(CAMPOS)
+    for numero, linha in enumerate(linhas, start=1):
+        escritor.writerow([_texto(valor) for valor in linha])
+        if numero % TAMANHO_LOTE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _json(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+
+def gerar_ndjson(linhas):
+    colunas = list(CAMPOS)
+    bloco = []
+    for linha in linhas:
+        bloco.append(json.dumps(dict(zip(colunas, linha)), default=_json, ensure_ascii=False))
+        if len(bloco) == TAMANHO_LOTE:
+            yield ('\n'.join(bloco) + '\n').encode()
+            bloco = []
+    if bloco:
+        yield ('\n'.join(bloco) + '\n').encode()
+
+
+def _celula(valor):
+    """Valor aceito pelo openpyxl (sem UUID nem datetime com fuso)"""
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).replace(tzinfo=None) if timezone.is_aware(valor) else valor
+    return valor
+
+
+def gerar_xlsx(linhas):
+    """
+    Planilha gravada com openpyxl em modo write-only (linhas vão direto para
+    um arquivo temporário) e enviada em blocos depois de fechada: o XLSX é um
+    zip, então o envio só começa quando a planilha está completa.
+    """
+    from openpyxl import Workbook
+
+    with tempfile.TemporaryFile() as arquivo:
+        planilha = Workbook(write_only=True)
+        aba = planilha.create_sheet('produtos')
+        aba.append(list(CAMPOS))
+        for linha in linhas:
+            aba.append([_celula(valor) for valor in linha])
+        planilha.save(arquivo)
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(64 * 1024)
+            if not bloco:
+                break
+            yield bloco
+
+
+GERADORES = {'csv': gerar_csv, 'ndjson': gerar_ndjson, 'xlsx': gerar_xlsx}
+
+
+def exportar(queryset, formato):
+    """Gerador de blocos de bytes do catálogo no formato pedido"""
+    if formato not in GERADORES:
+        raise ValueError(f'Formato inválido: {formato}. Opções: {", ".join(GERADORES)}')
+    return GERADORES[formato](linhas(queryset))
@@ -0,0 +1,438 @@
+"""
+Índice de facetas baseado em bitmaps.
+
+Cada produto visível (publicado e não deletado) ocupa uma posição de bit.
+Para cada valor de faceta (categoria, marca, estado, destaque, em_promocao)
+e para cada faixa de preço é mantido um bitmap (int do Python) com os produtos
+que possuem aquele valor. As contagens de qualquer combinação de filtros saem
+de ANDs e popcounts, sem consultar o banco.
+
+No cache, cada bitmap é uma entrada própria (as faixas de preço levam junto
+os preços dos seus produtos) e a posição de cada produto fica em um de
+BLOCOS_POSICOES blocos. Uma entrada de metadados guarda a versão de cada
+bitmap. Uma escrita lê e grava só os bitmaps e o bloco dos produtos alterados;
+uma leitura busca só os bitmaps cuja versão mudou e monta um índice novo,
+sem alterar o que outras threads estão lendo. Se o índice (ou parte dele)
+não estiver no cache, é reconstruído com uma única consulta.
+
+As escritas são serializadas por um lock no cache (cache.add). O lock e o
+próprio índice só são compartilhados entre processos com um backend de cache
+compartilhado (Redis, Memcached, banco); com LocMem cada processo mantém o seu
+índice e não vê as escritas feitas pelos demais.
+
+Setting: PRODUTOS_FACETAS_FAIXAS_PRECO (limites das faixas do histograma de preço).
+"""
+import bisect
+import logging
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CHAVE_META = 'produtos:facetas:meta'
+CHAVE_ENTRADA = 'produtos:facetas:entrada:{}'
+CHAVE_POSICOES = 'produtos:facetas:posicoes:{}'
+CHAVE_LOCK = 'produtos:facetas:lock'
+
+BLOCOS_POSICOES = 64
+
+CAMPOS_FACETA = ('categoria', 'marca', 'estado', 'destaque', 'em_promocao')
+
+FAIXAS_PRECO = [
+    Decimal(str(limite)) for limite in getattr(
+        settings, 'PRODUTOS_FACETAS_FAIXAS_PRECO',
+        [50, 100, 250, 500, 1000, 2500, 5000]
+    )
+]
+
+VISIVEIS = 'visiveis'
+
+
+def iterar_bits(bitmap):
+    """Posições dos bits ligados do bitmap"""
+    while bitmap:
+        menor = bitmap & -bitmap
+        yield menor.bit_length() - 1
+        bitmap ^= menor
+
+
+def valor_faceta(campo, valor):
+    """Representação textual de um valor de faceta"""
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if campo == 'categoria':
+        return str(valor) if valor else None
+    return valor
+
+
+def nome_faixa(indice):
+    return f'faixa:{indice}'
+
+
+def nomes_entradas(valores, preco):
+    """Entradas (bitmaps) em que o produto aparece e o índice da sua faixa de preço"""
+    nomes = [VISIVEIS]
+    for campo, valor in valores.items():
+        chave = valor_faceta(campo, valor)
+        if chave is not None:
+            nomes.append(f'{campo}={chave}')
+    return nomes, bisect.bisect_right(FAIXAS_PRECO, preco)
+
+
+def _bloco(produto_id):
+    return produto_id.int % BLOCOS_POSICOES
+
+
+class IndiceFacetas:
+    """
+    Bitmaps de produtos por valor de faceta e por faixa de preço.
+    Imutável depois de montado: atualizações geram um índice novo.
+    """
+
+    def __init__(self, entradas):
+        self.entradas = entradas
+        self.visiveis = entradas.get(VISIVEIS, 0)
+        self.bitmaps = {campo: {} for campo in CAMPOS_FACETA}
+        # (bitmap, {posição: preço}) por faixa
+        self.faixas = [entradas.get(nome_faixa(indice), (0, {})) for indice in range(len(FAIXAS_PRECO) + 1)]
+        for nome, bitmap in entradas.items():
+            if '=' in nome:
+                campo, chave = nome.split('=', 1)
+                self.bitmaps[campo][chave] = bitmap
+
+    def _mascara_preco(self, preco_min, preco_max):
+        """Bitmap dos produtos na faixa de preço: faixas inteiras + refinamento nas bordas"""
+        primeira = bisect.bisect_right(FAIXAS_PRECO, preco_min) if preco_min is not None else 0
+        ultima = bisect.bisect_right(FAIXAS_PRECO, preco_max) if preco_max is not None else len(self.faixas) - 1
+
+        mascara = 0
+        for indice in range(primeira, ultima + 1):
+            bitmap, precos = self.faixas[indice]
+            if indice in (primeira, ultima):
+                for posicao in iterar_bits(bitmap):
+                    preco = precos[posicao]
+                    if (preco_min is None or preco >= preco_min) and (preco_max is None or preco <= preco_max):
+                        mascara |= 1 << posicao
+            else:
+                mascara |= bitmap
+        return mascara
+
+    def _mascara_campo(self, campo, valores):
+        valores = {str(valor).lower() for valor in valores}
+        mascara = 0
+        for chave, bitmap in self.bitmaps[campo].items():
+            if chave.lower() in valores:
+                mascara |= bitmap
+        return mascara
+
+    def facetar(self, filtros, preco_min=None, preco_max=None):
+        """
+        Contagens por valor de cada faceta para o conjunto de filtros.
+        A contagem de uma faceta ignora os filtros dela mesma (facetas disjuntivas).
+        """
+        mascaras = {campo: self._mascara_campo(campo, valores)
+                    for campo, valores in filtros.items() if valores}
+        mascara_preco = None
+        if preco_min is not None or preco_max is not None:
+            mascara_preco = self._mascara_preco(preco_min, preco_max)
+
+        def base(exceto=None):
+            resultado = self.visiveis
+            for campo, mascara in mascaras.items():
+                if campo != exceto:
+                    resultado &= mascara
+            if mascara_preco is not None and exceto != 'preco':
+                resultado &= mascara_preco
+            return resultado
+
+        facetas = {}
+        for campo in CAMPOS_FACETA:
+            conjunto = base(exceto=campo)
+            contagens = {chave: (conjunto & bitmap).bit_count() for chave, bitmap in self.bitmaps[campo].items()}
+            facetas[campo] = sorted(
+                ({'valor': chave, 'quantidade': quantidade} for chave, quantidade in contagens.items() if quantidade),
+                key=lambda item: (-item['quantidade'], item['valor'])
+            )
+
+        conjunto = base(exceto='preco')
+        limites = [None] + FAIXAS_PRECO + [None]
+        faixas_preco = [
+            {'min': limites[indice], 'max': limites[indice + 1], 'quantidade': (conjunto & bitmap).bit_count()}
+            for indice, (bitmap, _) in enumerate(self.faixas)
+        ]
+
+        resultado = base()
+        return {
+            'total': resultado.bit_count(),
+            'facetas': facetas,
+            'faixas_preco': faixas_preco,
+            'faixa_preco': self._extremos_preco(resultado),
+        }
+
+    def _extremos_preco(self, conjunto):
+        """Menor e maior preço do conjunto, olhando apenas as faixas das pontas"""
+        ocupadas = [(conjunto & bitmap, precos) for bitmap, precos in self.faixas if conjunto & bitmap]
+        if not ocupadas:
+            return {'min_preco': None, 'max_preco': None}
+        return {
+            'min_preco': min(ocupadas[0][1][posicao] for posicao in iterar_bits(ocupadas[0][0])),
+            'max_preco': max(ocupadas[-1][1][posicao] for posicao in iterar_bits(ocupadas[-1][0])),
+        }
+
+
+def construir():
+    """
+    Monta o índice completo com uma única consulta.
+    Retorna (metadados, entradas, blocos de posições).
+    """
+    from produtos.models import Produto
+
+    entradas = {VISIVEIS: 0}
+    precos_faixas = [{} for _ in range(len(FAIXAS_PRECO) + 1)]
+    blocos = [{} for _ in range(BLOCOS_POSICOES)]
+    posicao = -1
+    produtos = Produto.objects.filter(publicado=True, deleted=False).order_by().values_list(
+        'id', 'categoria_id', 'marca', 'estado', 'destaque', 'em_promocao', 'preco'
+    )
+    for posicao, (produto_id, *valores, preco) in enumerate(produtos.iterator(chunk_size=5000)):
+        nomes, faixa = nomes_entradas(dict(zip(CAMPOS_FACETA, valores)), preco)
+        bit = 1 << posicao
+        for nome in nomes:
+            entradas[nome] = entradas.get(nome, 0) | bit
+        precos_faixas[faixa][posicao] = preco
+        blocos[_bloco(produto_id)][produto_id] = (posicao, nomes, faixa)
+
+    for indice, precos in enumerate(precos_faixas):
+        bitmap = 0
+        for posicao_preco in precos:
+            bitmap |= 1 << posicao_preco
+        entradas[nome_faixa(indice)] = (bitmap, precos)
+
+    versao = uuid.uuid4().hex
+    meta = {
+        'versao': versao,
+        'proxima_posicao': posicao + 1,
+        'livres': [],
+        'entradas': {nome: versao for nome in entradas},
+    }
+    return meta, entradas, blocos
+
+
+# (metadados, índice) da cópia local; substituído por inteiro, nunca alterado
+_local = (None, None)
+
+
+def _reconstruir():
+    global _local
+    meta, entradas, blocos = construir()
+
+    def salvar():
+        # Outro processo pode ter reconstruído enquanto esta consulta rodava
+        if cache.get(CHAVE_META) is None:
+            valores = {CHAVE_ENTRADA.format(nome): valor for nome, valor in entradas.items()}
+            valores.update({CHAVE_POSICOES.format(numero): bloco for numero, bloco in enumerate(blocos)})
+            cache.set_many(valores, None)
+            cache.set(CHAVE_META, meta, None)
+
+    _com_lock(salvar, ao_falhar=None)
+    indice = IndiceFacetas(entradas)
+    _local = (meta, indice)
+    return indice
+
+
+def obter_indice():
+    """Retorna o índice atual, buscando no cache só os bitmaps alterados"""
+    global _local
+    meta = cache.get(CHAVE_META)
+    if meta is None:
+        return _reconstruir()
+
+    meta_local, indice_local = _local
+    if meta_local is not None and meta_local['versao'] == meta['versao']:
+        return indice_local
+
+    versoes_locais = meta_local['entradas'] if meta_local else {}
+    alteradas = {nome for nome, versao in meta['entradas'].items() if versoes_locais.get(nome) != versao}
+    obtidas = cache.get_many([CHAVE_ENTRADA.format(nome) for nome in alteradas])
+    if len(obtidas) != len(alteradas):
+        logger.info('Índice de facetas incompleto no cache, reconstruindo')
+        invalidar()
+        return _reconstruir()
+
+    entradas = {
+        nome: obtidas[CHAVE_ENTRADA.format(nome)] if nome in alteradas else indice_local.entradas[nome]
+        for nome in meta['entradas']
+    }
+    indice = IndiceFacetas(entradas)
+    _local = (meta, indice)
+    return indice
+
+
+def invalidar():
+    """Descarta o índice; a próxima leitura o reconstrói com uma única consulta"""
+    global _local
+    cache.delete(CHAVE_META)
+    _local = (None, None)
+
+
+def _com_lock(funcao, ao_falhar=invalidar):
+    """Executa uma atualização do índice sob um lock no cache"""
+    for _ in range(50):
+        if cache.add(CHAVE_LOCK, 1, 10):
+            try:
+                return funcao()
+            finally:
+                cache.delete(CHAVE_LOCK)
+        time.sleep(0.02)
+    # Sem o lock não é seguro aplicar o delta: descarta o índice para reconstrução
+    logger.warning('Lock do índice de facetas indisponível')
+    if ao_falhar is not None:
+        ao_falhar()
+
+
+def _aplicar(alteracoes):
+    """
+    Aplica {produto_id: (valores, preço) ou None (fora do índice)} às entradas
+    do cache, lendo e gravando só os blocos e bitmaps envolvidos
+    """
+    meta = cache.get(CHAVE_META)
+    if meta is None:
+        return
+
+    numeros = {_bloco(produto_id) for produto_id in alteracoes}
+    lidos = cache.get_many([CHAVE_POSICOES.format(numero) for numero in numeros])
+    if len(lidos) != len(numeros):
+        invalidar()
+        return
+    blocos = {numero: dict(lidos[CHAVE_POSICOES.format(numero)]) for numero in numeros}
+
+    proxima_posicao = meta['proxima_posicao']
+    livres = list(meta['livres'])
+    remocoes = []
+    adicoes = []
+    for produto_id, novo in alteracoes.items():
+        bloco = blocos[_bloco(produto_id)]
+        antigo = bloco.pop(produto_id, None)
+        if antigo is not None:
+            remocoes.append(antigo)
+            livres.append(antigo[0])
+        if novo is not None:
+            if livres:
+                posicao = livres.pop()
+            else:
+                posicao = proxima_posicao
+                proxima_posicao += 1
+            valores, preco = novo
+            nomes, faixa = nomes_entradas(valores, preco)
+            bloco[produto_id] = (posicao, nomes, faixa)
+            adicoes.append((posicao, nomes, faixa, preco))
+
+    afetadas = set()
+    for posicao, nomes, faixa, *_ in remocoes + adicoes:
+        afetadas.update(nomes)
+        afetadas.add(nome_faixa(faixa))
+    # Só as entradas listadas nos metadados valem; as demais são restos de índices anteriores
+    existentes = [nome for nome in afetadas if nome in meta['entradas']]
+    atuais = cache.get_many([CHAVE_ENTRADA.format(nome) for nome in existentes])
+    if len(atuais) != len(existentes):
+        invalidar()
+        return
+
+    entradas = {}
+    for nome in afetadas:
+        vazio = (0, {}) if nome.startswith('faixa:') else 0
+        valor = atuais.get(CHAVE_ENTRADA.format(nome), vazio)
+        # Faixas: cópia dos preços (a versão do cache continua válida até o set)
+        entradas[nome] = (valor[0], dict(valor[1])) if nome.startswith('faixa:') else valor
+
+    for posicao, nomes, faixa in remocoes:
+        mascara = ~(1 << posicao)
+        for nome in nomes:
+            entradas[nome] &= mascara
+        bitmap, precos = entradas[nome_faixa(faixa)]
+        precos.pop(posicao, None)
+        entradas[nome_faixa(faixa)] = (bitmap & mascara, precos)
+
+    for posicao, nomes, faixa, preco in adicoes:
+        bit = 1 << posicao
+        for nome in nomes:
+            entradas[nome] |= bit
+        bitmap, precos = entradas[nome_faixa(faixa)]
+        precos[posicao] = preco
+        entradas[nome_faixa(faixa)] = (bitmap | bit, precos)
+
+    versao = uuid.uuid4().hex
+    versoes = dict(meta['entradas'])
+    gravar = {CHAVE_POSICOES.format(numero): bloco for numero, bloco in blocos.items()}
+    vazias = []
+    for nome, valor in entradas.items():
+        if '=' in nome and not valor:
+            # Valor de faceta sem produtos some das contagens
+            versoes.pop(nome, None)
+            vazias.append(CHAVE_ENTRADA.format(nome))
+        else:
+            versoes[nome] = versao
+            gravar[CHAVE_ENTRADA.format(nome)] = valor
+
+    cache.set_many(gravar, None)
+    if vazias:
+        cache.delete_many(vazias)
+    # Metadados por último: leitores só passam a buscar as entradas novas depois deste set
+    cache.set(CHAVE_META, {
+        'versao': versao,
+        'proxima_posicao': proxima_posicao,
+        'livres': livres,
+        'entradas': versoes,
+    }, None)
+
+
+def atualizar_produtos(produtos):
+    """Aplica ao índice o estado atual dos produtos informados"""
+    alteracoes = {}
+    for produto in produtos:
+        if produto.publicado and not produto.deleted:
+            valores = {campo: getattr(produto, f'{campo}_id' if campo == 'categoria' else campo)
+                       for campo in CAMPOS_FACETA}
+            alteracoes[produto.id] = (valores, produto.preco)
+        else:
+            alteracoes[produto.id] = None
+    if alteracoes:
+        _com_lock(lambda: _aplicar(alteracoes))
+
+
+def remover_produtos(produto_ids):
+    alteracoes = {produto_id: None for produto_id in produto_ids}
+    if alteracoes:
+        _com_lock(lambda: _aplicar(alteracoes))
+
+
+def ler_filtros(params):
+    """Extrai os filtros de faceta da query string (valores múltiplos separados por vírgula)"""
+    nomes = {
+        'categoria': 'categoria_id',
+        'marca': 'marca',
+        'estado': 'estado',
+        'destaque': 'destaque',
+        'em_promocao': 'em_promocao',
+    }
+    filtros = {}
+    for campo, parametro in nomes.items():
+        valores = []
+        for valor in params.getlist(parametro):
+            valores.extend(item.strip() for item in valor.split(',') if item.strip())
+        if valores:
+            filtros[campo] = valores
+
+    precos = []
+    for parametro in ('min_preco', 'max_preco'):
+        try:
+            valor = Decimal(params[parametro]) if params.get(parametro) else None
+        except InvalidOperation:
+            valor = None
+        # NaN/Infinity não são comparáveis com as faixas de preço: ignorados
+        precos.append(valor if valor is not None and valor.is_finite() else None)
+    return filtros, precos[0], precos[1]
@@ -0,0 +1,228 @@
+"""
+Série temporal do histórico de preços.
+
+Resoluções da consulta:
+- bruto: alterações individuais, paginadas por cursor (data_alteracao, id)
+- diario / semanal: OHLC (abertura, máxima, mínima, fechamento) por período
+
+As séries agregadas vêm da tabela ProdutoPrecoDiario, consolidada pelo comando
+consolidar_historico_precos apenas para dias completos; os dias posteriores à
+última consolidação são agregados na hora a partir do histórico bruto (poucas
+linhas, pelo índice (produto, data_alteracao, id)).
+
+Os dias seguem o fuso local (TIME_ZONE). A linha de cadastro do produto tem
+preco_antigo=0 e não conta como preço de abertura.
+"""
+import base64
+import json
+import logging
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from produtos.models import ProdutoHistoricoPreco, ProdutoPrecoDiario
+
+logger = logging.getLogger(__name__)
+
+RESOLUCOES = ('bruto', 'diario', 'semanal')
+
+TAMANHO_PAGINA = 100
+TAMANHO_PAGINA_MAXIMO = 1000
+
+TAMANHO_LOTE = 2000
+
+
+def inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def agregar_por_dia(linhas):
+    """
+    Agrupa linhas (produto_id, data_alteracao, preco_antigo, preco_novo),
+    ordenadas por produto e data, em tuplas
+    (produto_id, dia, abertura, maxima, minima, fechamento, alteracoes).
+    """
+    atual = None
+    for produto_id, data, preco_antigo, preco_novo in linhas:
+        dia = timezone.localdate(data)
+        # Preço 0/None (ex.: preco_antigo da linha de cadastro) não entra na série
+        precos = [preco for preco in (preco_antigo, preco_novo) if preco]
+        if not precos:
+            continue
+        if atual is None or (atual[0], atual[1]) != (produto_id, dia):
+            if atual is not None:
+                yield tuple(atual)
+            atual = [produto_id, dia, precos[0], max(precos), min(precos), precos[-1], 0]
+        atual[3] = max(atual[3], *precos)
+        atual[4] = min(atual[4], *precos)
+        atual[5] = precos[-1]
+        atual[6] += 1
+    if atual is not None:
+        yield tuple(atual)
+
+
+def ultimo_dia_consolidado():
+    return ProdutoPrecoDiario.objects.aggregate(ultimo=Max('dia'))['ultimo']
+
+
+def consolidar(completo=False):
+    """
+    Consolida os dias completos ainda não consolidados (ou todos, com completo=True).
+    Retorna a quantidade de linhas diárias gravadas.
+    """
+    hoje = inicio_do_dia(timezone.localdate())
+    historico = ProdutoHistoricoPreco.objects.filter(data_alteracao__lt=hoje)
+
+    with transaction.atomic():
+        if completo:
+            ProdutoPrecoDiario.objects.all().delete()
+        else:
+            ultimo = ultimo_dia_consolidado()
+            if ultimo is not None:
+                historico = historico.filter(data_alteracao__gte=inicio_do_dia(ultimo + timedelta(days=1)))
+
+        linhas = historico.order_by('produto_id', 'data_alteracao', 'id').values_list(
+            'produto_id', 'data_alteracao', 'preco_antigo', 'preco_novo'
+        ).iterator(chunk_size=TAMANHO_LOTE)
+
+        total = 0
+        lote = []
+        for produto_id, dia, abertura, maxima, minima, fechamento, alteracoes in agregar_por_dia(linhas):
+            lote.append(ProdutoPrecoDiario(
+                produto_id=produto_id, dia=dia, abertura=abertura, maxima=maxima,
+                minima=minima, fechamento=fechamento, alteracoes=alteracoes
+            ))
+            if len(lote) == TAMANHO_LOTE:
+                total += _gravar_diarios(lote)
+                lote = []
+        total += _gravar_diarios(lote)
+
+    logger.info(f'Histórico de preços consolidado: {total} dias')
+    return total
+
+
+def _gravar_diarios(lote):
+    ProdutoPrecoDiario.objects.bulk_create(
+        lote,
+        update_conflicts=True,
+        unique_fields=['produto', 'dia'],
+        update_fields=['abertura', 'maxima', 'minima', 'fechamento', 'alteracoes']
+    )
+    return len(lote)
+
+
+def _ponto(dia, abertura, maxima, minima, fechamento, alteracoes):
+    return {
+        'periodo': dia.isoformat(),
+        'abertura': str(abertura),
+        'maxima': str(maxima),
+        'minima': str(minima),
+        'fechamento': str(fechamento),
+        'alteracoes': alteracoes,
+    }
+
+
+def serie_diaria(produto_id, inicio=None, fim=None):
+    """Pontos diários (dia, abertura, maxima, minima, fechamento, alteracoes) no intervalo"""
+    ultimo = ultimo_dia_consolidado()
+    pontos = []
+
+    if ultimo is not None and (inicio is None or timezone.localdate(inicio) <= ultimo):
+        diarios = ProdutoPrecoDiario.objects.filter(produto_id=produto_id, dia__lte=ultimo)
+        if inicio is not None:
+            diarios = diarios.filter(dia__gte=timezone.localdate(inicio))
+        if fim is not None:
+            diarios = diarios.filter(dia__lte=timezone.localdate(fim))
+        pontos.extend(diarios.order_by('dia').values_list(
+            'dia', 'abertura', 'maxima', 'minima', 'fechamento', 'alteracoes'
+        ))
+
+    # Dias ainda não consolidados: agregados a partir do histórico bruto
+    recentes = ProdutoHistoricoPreco.objects.filter(produto_id=produto_id)
+    if ultimo is not None:
+        recentes = recentes.filter(data_alteracao__gte=inicio_do_dia(ultimo + timedelta(days=1)))
+    if inicio is not None:
+        recentes = recentes.filter(data_alteracao__gte=inicio)
+    if fim is not None:
+        recentes = recentes.filter(data_alteracao__lte=fim)
+    linhas = recentes.order_by('data_alteracao', 'id').values_list(
+        'produto_id', 'data_alteracao', 'preco_antigo', 'preco_novo'
+    )
+    pontos.extend(ponto[1:] for ponto in agregar_por_dia(linhas))
+    return pontos
+
+
+def serie_semanal(pontos_diarios):
+    """Agrupa pontos diários em semanas (segunda a domingo)"""
+    semanas = []
+    for dia, abertura, maxima, minima, fechamento, alteracoes in pontos_diarios:
+        semana = dia - timedelta(days=dia.weekday())
+        if semanas and semanas[-1][0] == semana:
+            anterior = semanas[-1]
+            semanas[-1] = (
+                semana, anterior[1], max(anterior[2], maxima), min(anterior[3], minima),
+                fechamento, anterior[5] + alteracoes
+            )
+        else:
+            semanas.append((semana, abertura, maxima, minima, fechamento, alteracoes))
+    return semanas
+
+
+def serie(produto_id, resolucao, inicio=None, fim=None):
+    pontos = serie_diaria(produto_id, inicio, fim)
+    if resolucao == 'semanal':
+        pontos = serie_semanal(pontos)
+    return [_ponto(*ponto) for ponto in pontos]
+
+
+def codificar_cursor(data, pk):
+    dados = {'d': data.isoformat(), 'id': str(pk)}
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """(data_alteracao, id) do cursor; levanta ValueError se inválido"""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return datetime.fromisoformat(dados['d']), uuid.UUID(dados['id'])
+    except (TypeError, KeyError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Cursor inválido: {e}')
+
+
+def pagina_bruta(produto_id, inicio=None, fim=None, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Alterações mais recentes primeiro, a partir do cursor.
+    Retorna (itens, cursor da próxima página ou None).
+    """
+    historico = ProdutoHistoricoPreco.objects.filter(produto_id=produto_id)
+    if inicio is not None:
+        historico = historico.filter(data_alteracao__gte=inicio)
+    if fim is not None:
+        historico = historico.filter(data_alteracao__lte=fim)
+    if cursor:
+        data, pk = decodificar_cursor(cursor)
+        historico = historico.filter(Q(data_alteracao__lt=data) | Q(data_alteracao=data, id__lt=pk))
+
+    linhas = list(historico.order_by('-data_alteracao', '-id').values(
+        'id', 'preco_antigo', 'preco_novo', 'data_alteracao', 'alterado_por__nome'
+    )[:tamanho + 1])
+
+    proximo = None
+    if len(linhas) > tamanho:
+        linhas = linhas[:tamanho]
+        proximo = codificar_cursor(linhas[-1]['data_alteracao'], linhas[-1]['id'])
+
+    itens = [
+        {
+            'id': str(linha['id']),
+            'preco_antigo': str(linha['preco_antigo']),
+            'preco_novo': str(linha['preco_novo']),
+            'data_alteracao': linha['data_alteracao'].isoformat(),
+            'alterado_por_nome': linha['alterado_por__nome'],
+        }
+        for linha in linhas
+    ]
+    return itens, proximo
@@ -0,0 +1,228 @@
+"""
+Imagens derivadas dos produtos (miniaturas em WebP e JPEG).
+
+Após o upload de imagem_principal/imagem_secundaria, as variantes são geradas
+fora da thread da requisição, em um pool de threads, e registradas em
+Produto.imagens_derivadas:
+
+    {'principal': {'origem': <nome do original>,
+                   'variantes': [{'largura': 320, 'formato': 'webp', 'nome': ...}, ...]}}
+
+A entrada só é gravada se o original ainda for o mesmo; variantes obsoletas
+são apagadas do storage.
+
+Uma tarefa que falha (ex.: "database table is locked" no SQLite) é repetida
+com backoff exponencial. Esgotadas as tentativas, a imagem continua pendente
+(pendentes()) e é reagendada no próximo save do produto ou pelo comando
+gerar_imagens_derivadas.
+
+Settings:
+- PRODUTOS_IMAGENS_LARGURAS: larguras das variantes (padrão: 160, 320, 640, 1024)
+- PRODUTOS_IMAGENS_WORKERS: threads do pool (padrão: 2; 1 no SQLite, que só
+  aceita um escritor por vez)
+- PRODUTOS_IMAGENS_TENTATIVAS: tentativas por tarefa (padrão: 4)
+- PRODUTOS_IMAGENS_BACKOFF: segundos antes da 2ª tentativa (padrão: 2; dobra a cada tentativa)
+"""
+import io
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_IMAGEM = {'principal': 'imagem_principal', 'secundaria': 'imagem_secundaria'}
+
+LARGURAS = getattr(settings, 'PRODUTOS_IMAGENS_LARGURAS', [160, 320, 640, 1024])
+TENTATIVAS = getattr(settings, 'PRODUTOS_IMAGENS_TENTATIVAS', 4)
+BACKOFF = getattr(settings, 'PRODUTOS_IMAGENS_BACKOFF', 2)
+
+# Formato do Pillow, extensão e opções de gravação
+FORMATOS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def nome_variante(origem, largura, extensao):
+    """produtos/<id>/abc.png -> produtos/<id>/derivadas/abc-320.webp"""
+    diretorio, arquivo = posixpath.split(origem)
+    base = os.path.splitext(arquivo)[0]
+    return posixpath.join(diretorio, 'derivadas', f'{base}-{largura}.{extensao}')
+
+
+def redimensionar(imagem, largura):
+    altura = max(1, round(imagem.height * largura / imagem.width))
+    return imagem.resize((largura, altura), Image.LANCZOS)
+
+
+def gerar_variantes(arquivo, origem, storage):
+    """Gera e grava as variantes de um original; retorna a lista registrada no produto"""
+    with Image.open(arquivo) as original:
+        # Decodifica JPEGs já reduzidos quando a maior variante é bem menor que o original
+        original.draft('RGB', (max(LARGURAS), max(LARGURAS)))
+        imagem = ImageOps.exif_transpose(original)
+        imagem.load()
+
+    possui_alfa = imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+    imagem = imagem.convert('RGBA' if possui_alfa else 'RGB')
+
+    # Nunca amplia: larguras acima do original viram uma única variante no tamanho original
+    larguras = sorted({min(largura, imagem.width) for largura in LARGURAS})
+
+    variantes = []
+    for largura in larguras:
+        reduzida = redimensionar(imagem, largura) if largura < imagem.width else imagem
+        for formato, (formato_pil, extensao, opcoes) in FORMATOS.items():
+            quadro = reduzida
+            if formato_pil == 'JPEG' and quadro.mode == 'RGBA':
+                # JPEG não tem transparência: aplica sobre fundo branco
+                fundo = Image.new('RGB', quadro.size, (255, 255, 255))
+                fundo.paste(quadro, mask=quadro.getchannel('A'))
+                quadro = fundo
+            buffer = io.BytesIO()
+            quadro.save(buffer, formato_pil, **opcoes)
+            nome = storage.save(nome_variante(origem, largura, extensao), ContentFile(buffer.getvalue()))
+            variantes.append({'largura': largura, 'formato': formato, 'nome': nome})
+    return variantes
+
+
+def apagar_variantes(entrada, storage):
+    for variante in (entrada or {}).get('variantes', []):
+        try:
+            storage.delete(variante['nome'])
+        except Exception as e:
+            logger.warning(f'Erro ao apagar variante {variante["nome"]}: {str(e)}')
+
+
+def processar(produto_id, tipo, refazer=False):
+    """Gera (ou remove) as variantes de uma imagem do produto conforme o original atual"""
+    from produtos.models import Produto
+    from produtos.signals import produtos_atualizados_em_lote
+
+    campo = CAMPOS_IMAGEM[tipo]
+    produto = Produto.objects.only('id', campo, 'imagens_derivadas').filter(id=produto_id).first()
+    if produto is None:
+        return
+    arquivo = getattr(produto, campo)
+    storage = arquivo.storage
+    origem = arquivo.name or None
+    if not refazer and origem and (produto.imagens_derivadas.get(tipo) or {}).get('origem') == origem:
+        return
+
+    variantes = []
+    if origem:
+        with arquivo.open('rb'):
+            variantes = gerar_variantes(arquivo, origem, storage)
+
+    with transaction.atomic():
+        atual = Produto.objects.select_for_update().only('id', campo, 'imagens_derivadas').filter(id=produto_id).first()
+        if atual is None or (getattr(atual, campo).name or None) != origem:
+            # O original mudou (ou o produto sumiu) durante o processamento
+            apagar_variantes({'variantes': variantes}, storage)
+            return
+        derivadas = dict(atual.imagens_derivadas)
+        anterior = derivadas.pop(tipo, None)
+        if origem:
+            derivadas[tipo] = {'origem': origem, 'variantes': variantes}
+        Produto.objects.filter(id=produto_id).update(imagens_derivadas=derivadas, data_atualizacao=timezone.now())
+        produtos_atualizados_em_lote.send(
+            sender=Produto,
+            produto_ids=[produto_id],
+            campos={'imagens_derivadas', 'data_atualizacao'}
+        )
+
+    apagar_variantes(anterior, storage)
+    logger.info(f'Imagem {tipo} do produto {produto_id}: {len(variantes)} variantes geradas')
+
+
+def nomes_variantes():
+    """Nomes de todas as variantes registradas (referências fora dos FileFields)"""
+    from produtos.models import Produto
+
+    for derivadas in Produto._base_manager.values_list('imagens_derivadas', flat=True).iterator():
+        for entrada in (derivadas or {}).values():
+            for variante in (entrada or {}).get('variantes', []):
+                yield variante['nome']
+
+
+def pendentes(produto):
+    """Tipos de imagem do produto cujas variantes não correspondem ao original atual"""
+    return [
+        tipo for tipo, campo in CAMPOS_IMAGEM.items()
+        if (getattr(produto, campo).name or None) != (produto.imagens_derivadas.get(tipo) or {}).get('origem')
+    ]
+
+
+_pool = {'pid': None, 'executor': None}
+_pool_lock = threading.Lock()
+
+# Tarefas agendadas ou em retentativa: um save repetido não duplica o trabalho
+_agendadas = set()
+
+
+def _workers():
+    padrao = 1 if connection.vendor == 'sqlite' else 2
+    return getattr(settings, 'PRODUTOS_IMAGENS_WORKERS', padrao)
+
+
+def _executor():
+    with _pool_lock:
+        # Após um fork o processo filho não herda as threads do pool
+        if _pool['pid'] != os.getpid():
+            _pool['pid'] = os.getpid()
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=_workers(),
+                thread_name_prefix='imagens-produto'
+            )
+            _agendadas.clear()
+        return _pool['executor']
+
+
+def _submeter(produto_id, tipo, tentativa):
+    _executor().submit(_tarefa, produto_id, tipo, tentativa)
+
+
+def _tarefa(produto_id, tipo, tentativa=1):
+    try:
+        processar(produto_id, tipo)
+    except Exception as e:
+        if tentativa < TENTATIVAS:
+            espera = BACKOFF * 2 ** (tentativa - 1)
+            logger.warning(
+                f'Erro ao gerar variantes da imagem {tipo} do produto {produto_id} '
+                f'(tentativa {tentativa}, nova tentativa em {espera}s): {str(e)}'
+            )
+            temporizador = threading.Timer(espera, _submeter, (produto_id, tipo, tentativa + 1))
+            temporizador.daemon = True
+            temporizador.start()
+            return
+        logger.error(
+            f'Erro ao gerar variantes da imagem {tipo} do produto {produto_id} '
+            f'após {tentativa} tentativas: {str(e)}'
+        )
+    finally:
+        close_old_connections()
+    with _pool_lock:
+        _agendadas.discard((produto_id, tipo))
+
+
+def agendar(produto_id, tipos):
+    """Agenda a geração das variantes para depois do commit da transação atual"""
+    def submeter(tipo):
+        executor = _executor()
+        with _pool_lock:
+            if (produto_id, tipo) in _agendadas:
+                return
+            _agendadas.add((produto_id, tipo))
+        executor.submit(_tarefa, produto_id, tipo, 1)
+
+    for tipo in tipos:
+        transaction.on_commit(lambda tipo=tipo: submeter(tipo))
@@ -0,0 +1,367 @@
+"""
+Importação de catálogo em massa (CSV / XLSX).
+
+As linhas são lidas em fluxo (setup.planilhas: csv / openpyxl em modo read-only),
+validadas em lotes por um pool de processos e gravadas no processo principal
+com bulk_create / bulk_update, fazendo upsert pelo SKU. A memória fica limitada
+ao tamanho do lote vezes o número de lotes em andamento.
+
+Colunas reconhecidas (cabeçalho da primeira linha): os campos de COLUNAS e
+``categoria`` (nome da categoria). Só as colunas presentes no arquivo são
+alteradas em produtos já existentes; ``sku`` é obrigatório.
+
+A validação não acessa o banco nem importa models, para poder rodar em
+processos filhos; categorias, SKUs existentes e slugs são resolvidos por lote
+no processo principal.
+"""
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from setup.planilhas import ler_linhas
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 2000
+
+# Mensagens de erro guardadas no resultado (as demais só são contadas)
+LIMITE_ERROS = 100
+
+COLUNAS = (
+    'sku', 'nome', 'descricao', 'descricao_curta', 'marca', 'preco', 'preco_promocional',
+    'quantidade', 'codigo_barras', 'estado', 'peso', 'dimensoes', 'meta_titulo',
+    'meta_descricao', 'publicado', 'destaque',
+)
+
+OBRIGATORIOS_NOVOS = ('nome', 'descricao', 'marca', 'preco')
+
+VERDADEIROS = {'1', 'true', 'sim', 's', 'x', 'yes', 'y', 'verdadeiro'}
+FALSOS = {'0', 'false', 'nao', 'não', 'n', 'no', '', 'falso'}
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.lidas = 0
+        self.criados = 0
+        self.atualizados = 0
+        self.invalidas = 0
+        self.erros = []
+
+    def registrar_erro(self, numero, mensagem):
+        self.invalidas += 1
+        if len(self.erros) < LIMITE_ERROS:
+            self.erros.append(f'Linha {numero}: {mensagem}')
+
+
+def esquema_produto():
+    """Tipo, tamanho máximo e opções de cada coluna, extraídos do model"""
+    from django.db import models
+    from produtos.models import Produto
+
+    esquema = {}
+    for coluna in COLUNAS:
+        campo = Produto._meta.get_field(coluna)
+        if isinstance(campo, models.DecimalField):
+            tipo = 'decimal'
+        elif isinstance(campo, models.IntegerField):
+            tipo = 'inteiro'
+        elif isinstance(campo, models.BooleanField):
+            tipo = 'booleano'
+        else:
+            tipo = 'texto'
+        esquema[coluna] = {
+            'tipo': tipo,
+            'max_length': campo.max_length,
+            'decimal_places': getattr(campo, 'decimal_places', None),
+            'max_digits': getattr(campo, 'max_digits', None),
+            'choices': [valor for valor, _ in campo.choices] if campo.choices else None,
+            'null': campo.null,
+        }
+    esquema['categoria'] = {'tipo': 'texto', 'max_length': 100, 'choices': None, 'null': True}
+    return esquema
+
+
+def _decimal(valor, regras):
+    texto = str(valor).strip().replace('R$', '').replace(' ', '')
+    if texto.rfind(',') > texto.rfind('.'):
+        # Formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '')
+    numero = Decimal(texto)
+    if not numero.is_finite():
+        raise InvalidOperation
+    numero = numero.quantize(Decimal(1).scaleb(-regras['decimal_places']))
+    if len(numero.as_tuple().digits) > regras['max_digits']:
+        raise ValueError('valor fora do limite')
+    return numero
+
+
+def converter(coluna, valor, regras):
+    """Converte o valor bruto da célula; levanta ValueError com a mensagem do erro"""
+    if isinstance(valor, str):
+        valor = valor.strip()
+    if valor is None or valor == '':
+        if regras['tipo'] == 'booleano':
+            return None
+        if not regras['null'] and regras['tipo'] != 'texto':
+            raise ValueError(f'{coluna} é obrigatório')
+        return None
+
+    tipo = regras['tipo']
+    try:
+        if tipo == 'decimal':
+            valor = _decimal(valor, regras)
+            if valor <= 0:
+                raise ValueError
+        elif tipo == 'inteiro':
+            valor = int(Decimal(str(valor)))
+            if valor < 0:
+                raise ValueError
+        elif tipo == 'booleano':
+            texto = str(valor).strip().lower()
+            if texto not in VERDADEIROS | FALSOS:
+                raise ValueError
+            valor = texto in VERDADEIROS
+        else:
+            valor = str(valor)
+    except (ValueError, InvalidOperation, ArithmeticError):
+        raise ValueError(f'valor inválido para {coluna}: {valor!r}')
+
+    if tipo == 'texto':
+        if regras['max_length'] and len(valor) > regras['max_length']:
+            raise ValueError(f'{coluna} excede {regras["max_length"]} caracteres')
+        if regras['choices'] and valor not in regras['choices']:
+            raise ValueError(f'{coluna} deve ser um de: {", ".join(regras["choices"])}')
+    return valor
+
+
+def validar_linhas(linhas, esquema):
+    """
+    Valida um lote de linhas [(numero, {coluna: valor})].
+    Retorna [(numero, dados, erro)] com dados=None nas linhas inválidas.
+    Executada nos processos do pool.
+    """
+    resultado = []
+    for numero, linha in linhas:
+        dados = {}
+        erro = None
+        for coluna, valor in linha.items():
+            if coluna not in esquema:
+                continue
+            try:
+                dados[coluna] = converter(coluna, valor, esquema[coluna])
+            except ValueError as e:
+                erro = str(e)
+                break
+        if erro is None and not dados.get('sku'):
+            erro = 'sku é obrigatório'
+        if erro is None and dados.get('preco') and dados.get('preco_promocional'):
+            if dados['preco_promocional'] >= dados['preco']:
+                erro = 'preco_promocional deve ser menor que o preco'
+        resultado.append((numero, None if erro else dados, erro))
+    return resultado
+
+
+def _em_lotes(linhas, tamanho):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _lotes_validados(linhas, esquema, workers, tamanho):
+    """Lotes validados na ordem do arquivo, com no máximo 2 lotes por worker em andamento"""
+    lotes = _em_lotes(linhas, tamanho)
+    if workers <= 1:
+        for lote in lotes:
+            yield validar_linhas(lote, esquema)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(pool.submit(validar_linhas, lote, esquema))
+            if len(pendentes) >= workers * 2:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+class _Categorias:
+    """Resolve nomes de categoria para IDs, consultando só os nomes ainda não vistos"""
+
+    def __init__(self, criar):
+        self.criar = criar
+        self.ids = {}
+
+    def resolver(self, nomes):
+        from categorias.models import Categoria
+
+        novos = {nome for nome in nomes if nome and nome not in self.ids}
+        if not novos:
+            return
+        self.ids.update(Categoria.objects.filter(nome__in=novos).values_list('nome', 'id'))
+        faltando = novos - set(self.ids)
+        if faltando and self.criar:
+            Categoria.objects.bulk_create([Categoria(nome=nome) for nome in faltando], ignore_conflicts=True)
+            self.ids.update(Categoria.objects.filter(nome__in=faltando).values_list('nome', 'id'))
+
+
+def _gravar_lote(validos, colunas, categorias, usuario, resultado):
+    """Upsert de um lote de linhas válidas; retorna os IDs dos produtos gravados"""
+    from django.utils import timezone
+    from produtos import slugs
+    from produtos.models import Produto, ProdutoHistoricoPreco
+
+    # SKU repetido no mesmo lote: vale a última linha
+    por_sku = {}
+    for numero, dados in validos:
+        por_sku[dados['sku']] = (numero, dados)
+
+    categorias.resolver(dados.get('categoria') for _, dados in por_sku.values())
+    existentes = {
+        produto.sku: produto
+        for produto in Produto.objects.filter(sku__in=list(por_sku)).only('id', 'sku', 'preco', 'preco_promocional')
+    }
+
+    agora = timezone.now()
+    campos_atualizados = [coluna for coluna in colunas if coluna in COLUNAS and coluna != 'sku']
+    if 'categoria' in colunas:
+        campos_atualizados.append('categoria')
+    if {'preco', 'preco_promocional'}.intersection(colunas):
+        campos_atualizados.append('em_promocao')
+    campos_atualizados.append('data_atualizacao')
+
+    novos = []
+    atualizados = []
+    historico = []
+    for sku, (numero, dados) in por_sku.items():
+        nome_categoria = dados.pop('categoria', None)
+        if nome_categoria:
+            if nome_categoria not in categorias.ids:
+                resultado.registrar_erro(numero, f'categoria não encontrada: {nome_categoria}')
+                continue
+            dados['categoria_id'] = categorias.ids[nome_categoria]
+        elif 'categoria' in colunas:
+            dados['categoria_id'] = None
+
+        produto = existentes.get(sku)
+        if produto is None:
+            faltando = [campo for campo in OBRIGATORIOS_NOVOS if dados.get(campo) in (None, '')]
+            if faltando:
+                resultado.registrar_erro(numero, f'campos obrigatórios para produto novo: {", ".join(faltando)}')
+                continue
+            dados = {campo: valor for campo, valor in dados.items() if valor is not None}
+            produto = Produto(**dados)
+            if not produto.descricao_curta:
+                produto.descricao_curta = produto.descricao[:247] + '...' if len(produto.descricao) > 250 else produto.descricao
+            produto.em_promocao = bool(produto.preco_promocional and produto.preco_promocional < produto.preco)
+            novos.append(produto)
+            historico.append(ProdutoHistoricoPreco(
+                produto_id=produto.id, preco_antigo=0, preco_novo=produto.preco, alterado_por=usuario
+            ))
+            continue
+
+        preco_anterior = produto.preco
+        for campo, valor in dados.items():
+            # Célula vazia não apaga campos obrigatórios
+            if valor is None and not Produto._meta.get_field(campo).null:
+                continue
+            setattr(produto, campo, valor)
+        produto.em_promocao = bool(produto.preco_promocional and produto.preco_promocional < produto.preco)
+        produto.data_atualizacao = agora
+        atualizados.append(produto)
+        if produto.preco != preco_anterior:
+            historico.append(ProdutoHistoricoPreco(
+                produto_id=produto.id, preco_antigo=preco_anterior, preco_novo=produto.preco, alterado_por=usuario
+            ))
+
+    slugs.atribuir_slugs(novos)
+    Produto.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+    if atualizados:
+        Produto.objects.bulk_update(atualizados, campos_atualizados, batch_size=TAMANHO_LOTE)
+    ProdutoHistoricoPreco.objects.bulk_create(historico, batch_size=TAMANHO_LOTE)
+
+    resultado.criados += len(novos)
+    resultado.atualizados += len(atualizados)
+    return [produto.id for produto in novos + atualizados]
+
+
+def _atualizar_indices_do_lote(produto_ids, colunas):
+    """Índice de busca e cache de detalhe dos produtos gravados (após o commit)"""
+    from django.db import transaction
+    from produtos import cache_detalhe
+    from produtos.busca import obter_backend
+    from produtos.signals import CAMPOS_BUSCA, _produtos_em_lotes
+
+    def aplicar():
+        if CAMPOS_BUSCA.intersection(colunas):
+            obter_backend().indexar_em_lote(
+                _produtos_em_lotes(produto_ids, ['id', 'nome', 'descricao', 'marca', 'sku', 'deleted'])
+            )
+        cache_detalhe.invalidar_produtos(produto_ids)
+    transaction.on_commit(aplicar)
+
+
+def _atualizar_agregados(categoria_ids):
+    """Índices agregados, recalculados uma única vez ao final da importação"""
+    from produtos import cache_detalhe, estatisticas, facetas
+
+    facetas.invalidar()
+    estatisticas.recalcular()
+    cache_detalhe.invalidar_categorias(categoria_ids)
+
+
+def importar(caminho, workers=None, tamanho_lote=TAMANHO_LOTE, usuario=None, criar_categorias=False, simular=False):
+    """
+    Importa o arquivo, gravando um lote por transação.
+    Em modo simulação cada lote é desfeito ao final (os erros são os mesmos da gravação).
+    """
+    from django.db import transaction
+
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+
+    resultado = ResultadoImportacao()
+    esquema = esquema_produto()
+    categorias = _Categorias(criar_categorias)
+    colunas = None
+
+    def contar(linhas):
+        for linha in linhas:
+            resultado.lidas += 1
+            yield linha
+
+    for lote in _lotes_validados(contar(ler_linhas(caminho)), esquema, workers, tamanho_lote):
+        validos = []
+        for numero, dados, erro in lote:
+            if erro:
+                resultado.registrar_erro(numero, erro)
+            else:
+                validos.append((numero, dados))
+                if colunas is None:
+                    colunas = set(dados)
+        if not validos:
+            continue
+        with transaction.atomic():
+            produto_ids = _gravar_lote(validos, colunas, categorias, usuario, resultado)
+            if simular:
+                transaction.set_rollback(True)
+            else:
+                _atualizar_indices_do_lote(produto_ids, colunas)
+
+    if not simular and (resultado.criados or resultado.atualizados):
+        _atualizar_agregados(set(categorias.ids.values()))
+
+    logger.info(
+        f'Importação de {caminho}: {resultado.lidas} linhas, {resultado.criados} criados, '
+        f'{resultado.atualizados} atualizados, {resultado.invalidas} inválidas'
+    )
+    return resultado
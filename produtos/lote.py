@@ -0,0 +1,125 @@
+"""
+Atualização de produtos em massa.
+
+As ações são aplicadas com UPDATEs por conjunto (``WHERE id IN (...)``) em lotes,
+sem passar por Produto.save(). Alterações de preço efetivo (ativar/desativar
+promoção) geram linhas de histórico com bulk_create, e os índices derivados
+(busca, facetas, estatísticas) são atualizados uma única vez pelo sinal
+produtos_atualizados_em_lote.
+"""
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from produtos.models import Produto, ProdutoHistoricoPreco
+from produtos.signals import produtos_atualizados_em_lote
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+
+# Desconto aplicado quando a promoção é ativada em produtos sem preço promocional
+DESCONTO_PROMOCAO = Decimal('0.9')
+
+ACOES = {
+    'publicar': {'publicado': True},
+    'ocultar': {'publicado': False},
+    'destacar': {'destaque': True},
+    'remover_destaque': {'destaque': False},
+    'ativar_promocao': {'em_promocao': True},
+    'desativar_promocao': {'em_promocao': False, 'preco_promocional': None},
+}
+
+
+def preco_com_desconto(preco):
+    return (preco * DESCONTO_PROMOCAO).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _sem_promocao_valida():
+    """Produtos sem preço promocional (ou com um que não fica abaixo do preço)"""
+    return Q(preco_promocional__isnull=True) | Q(preco_promocional__gte=F('preco'))
+
+
+def _ativar_promocao(produtos, agora, usuario):
+    # O preço promocional é calculado uma vez em Python e usado tanto no
+    # UPDATE quanto no histórico (o arredondamento do banco pode divergir)
+    promocoes = [
+        (produto_id, preco, preco_com_desconto(preco))
+        for produto_id, preco in produtos.filter(_sem_promocao_valida()).select_for_update().values_list('id', 'preco')
+    ]
+    historico = [
+        ProdutoHistoricoPreco(
+            produto_id=produto_id,
+            preco_antigo=preco,
+            preco_novo=preco_promocional,
+            alterado_por=usuario
+        )
+        for produto_id, preco, preco_promocional in promocoes
+    ]
+    Produto.objects.bulk_update(
+        [
+            Produto(id=produto_id, preco_promocional=preco_promocional)
+            for produto_id, _, preco_promocional in promocoes
+        ],
+        ['preco_promocional'],
+        batch_size=TAMANHO_LOTE
+    )
+    total = produtos.update(em_promocao=True, data_atualizacao=agora)
+    return total, historico
+
+
+def _desativar_promocao(produtos, agora, usuario):
+    historico = [
+        ProdutoHistoricoPreco(
+            produto_id=produto_id,
+            preco_antigo=preco_promocional,
+            preco_novo=preco,
+            alterado_por=usuario
+        )
+        for produto_id, preco, preco_promocional in produtos.exclude(
+            _sem_promocao_valida()
+        ).values_list('id', 'preco', 'preco_promocional')
+    ]
+    total = produtos.update(data_atualizacao=agora, **ACOES['desativar_promocao'])
+    return total, historico
+
+
+def atualizar_em_lote(produto_ids, acao, usuario=None):
+    """
+    Aplica a ação aos produtos não deletados informados.
+    Retorna a quantidade de produtos atualizados.
+    """
+    if acao not in ACOES:
+        raise ValueError(f'Ação inválida: {acao}')
+
+    produto_ids = list(dict.fromkeys(produto_ids))
+    agora = timezone.now()
+    total = 0
+    historico = []
+
+    with transaction.atomic():
+        for inicio in range(0, len(produto_ids), TAMANHO_LOTE):
+            produtos = Produto.objects.filter(
+                id__in=produto_ids[inicio:inicio + TAMANHO_LOTE],
+                deleted=False
+            )
+            if acao == 'ativar_promocao':
+                atualizados, linhas = _ativar_promocao(produtos, agora, usuario)
+                historico.extend(linhas)
+            elif acao == 'desativar_promocao':
+                atualizados, linhas = _desativar_promocao(produtos, agora, usuario)
+                historico.extend(linhas)
+            else:
+                atualizados = produtos.update(data_atualizacao=agora, **ACOES[acao])
+            total += atualizados
+
+        ProdutoHistoricoPreco.objects.bulk_create(historico, batch_size=TAMANHO_LOTE)
+
+        campos = set(ACOES[acao]) | {'data_atualizacao'}
+        produtos_atualizados_em_lote.send(sender=Produto, produto_ids=produto_ids, campos=campos)
+
+    logger.info(f'Atualização em lote "{acao}": {total} produtos, {len(historico)} registros de histórico')
+    return total
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from produtos import historico
+
+
+class Command(BaseCommand):
+    help = 'Consolida o histórico de preços em séries diárias (executar periodicamente, ex.: cron diário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Descarta e reconstrói toda a consolidação'
+        )
+
+    def handle(self, *args, **options):
+        total = historico.consolidar(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f'Histórico de preços consolidado: {total} dias gravados'))
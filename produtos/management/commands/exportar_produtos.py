@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos import exportacao
+from produtos.busca import filtrar_por_parametros
+from produtos.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Exporta o catálogo de produtos em CSV, NDJSON ou XLSX (memória constante)'
+
+    FILTROS = ('q', 'categoria_id', 'min_preco', 'max_preco', 'marca', 'estado', 'destaque', 'em_promocao')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--formato',
+            choices=list(exportacao.FORMATOS),
+            default='csv',
+            help='Formato do arquivo (padrão: csv)'
+        )
+        parser.add_argument(
+            '--saida',
+            default='-',
+            help='Arquivo de saída (padrão: saída padrão)'
+        )
+        for filtro in self.FILTROS:
+            parser.add_argument(f'--{filtro.replace("_", "-")}', dest=filtro, help=f'Filtro {filtro} da busca avançada')
+
+    def handle(self, *args, **options):
+        parametros = {filtro: options[filtro] for filtro in self.FILTROS if options[filtro] is not None}
+        produtos = filtrar_por_parametros(Produto.objects.filter(deleted=False), parametros)
+
+        if options['saida'] == '-':
+            if options['formato'] == 'xlsx':
+                raise CommandError('Informe --saida para exportar em XLSX')
+            destino = sys.stdout.buffer
+        else:
+            try:
+                destino = open(options['saida'], 'wb')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        total = 0
+        try:
+            for bloco in exportacao.exportar(produtos, options['formato']):
+                destino.write(bloco)
+                total += len(bloco)
+        finally:
+            if destino is not sys.stdout.buffer:
+                destino.close()
+
+        if options['saida'] != '-':
+            self.stdout.write(self.style.SUCCESS(f'Exportação concluída: {options["saida"]} ({total} bytes)'))
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+
+from produtos import imagens
+from produtos.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (miniaturas WebP/JPEG) das imagens de produtos já existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Quantidade de threads de processamento (padrão: 4)'
+        )
+        parser.add_argument(
+            '--refazer',
+            action='store_true',
+            help='Regera as variantes mesmo das imagens já processadas'
+        )
+
+    def handle(self, *args, **options):
+        produtos = Produto.objects.filter(
+            ~Q(imagem_principal='') & Q(imagem_principal__isnull=False) |
+            ~Q(imagem_secundaria='') & Q(imagem_secundaria__isnull=False)
+        ).only('id', 'imagem_principal', 'imagem_secundaria', 'imagens_derivadas').order_by()
+
+        tarefas = []
+        for produto in produtos.iterator(chunk_size=2000):
+            if options['refazer']:
+                tipos = [tipo for tipo, campo in imagens.CAMPOS_IMAGEM.items() if getattr(produto, campo)]
+            else:
+                tipos = imagens.pendentes(produto)
+            tarefas.extend((produto.id, tipo) for tipo in tipos)
+
+        erros = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futuros = [
+                executor.submit(self.processar, produto_id, tipo, options['refazer'])
+                for produto_id, tipo in tarefas
+            ]
+            for futuro in futuros:
+                erro = futuro.result()
+                if erro:
+                    erros += 1
+                    self.stderr.write(erro)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Variantes geradas para {len(tarefas) - erros} imagens ({erros} erros)'
+        ))
+
+    def processar(self, produto_id, tipo, refazer):
+        try:
+            imagens.processar(produto_id, tipo, refazer=refazer)
+        except Exception as e:
+            return f'Produto {produto_id} ({tipo}): {str(e)}'
+        finally:
+            close_old_connections()
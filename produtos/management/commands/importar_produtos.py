@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos import importacao
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Importa produtos de um arquivo CSV ou XLSX (upsert pelo SKU)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .xlsx')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processos de validação (padrão: até 4; 1 valida no próprio processo)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=importacao.TAMANHO_LOTE,
+            help=f'Linhas por lote/transação (padrão: {importacao.TAMANHO_LOTE})'
+        )
+        parser.add_argument(
+            '--criar-categorias',
+            action='store_true',
+            help='Cria as categorias informadas que ainda não existem'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='E-mail do usuário registrado no histórico de preços'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida e simula a gravação sem salvar nada'
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        try:
+            resultado = importacao.importar(
+                options['arquivo'],
+                workers=options['workers'],
+                tamanho_lote=options['lote'],
+                usuario=usuario,
+                criar_categorias=options['criar_categorias'],
+                simular=options['dry_run']
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for erro in resultado.erros:
+            self.stdout.write(self.style.WARNING(erro))
+        if resultado.invalidas > len(resultado.erros):
+            self.stdout.write(self.style.WARNING(f'... e mais {resultado.invalidas - len(resultado.erros)} linhas inválidas'))
+
+        prefixo = 'Simulação concluída' if options['dry_run'] else 'Importação concluída'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefixo}: {resultado.lidas} linhas, {resultado.criados} criados, '
+            f'{resultado.atualizados} atualizados, {resultado.invalidas} inválidas'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from produtos.busca import obter_backend
+from produtos.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual de produtos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Quantidade de produtos indexados por lote (padrão: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        backend = obter_backend()
+        tamanho_lote = options['lote']
+        produtos = Produto.objects.filter(deleted=False).only(
+            'id', 'nome', 'descricao', 'marca', 'sku', 'deleted'
+        ).order_by().iterator(chunk_size=tamanho_lote)
+
+        total = 0
+        with transaction.atomic():
+            backend.limpar()
+            lote = []
+            for produto in produtos:
+                lote.append(produto)
+                if len(lote) >= tamanho_lote:
+                    backend.indexar_em_lote(lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                backend.indexar_em_lote(lote)
+                total += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de busca reconstruído com {backend.__class__.__name__}: {total} produtos indexados'
+        ))
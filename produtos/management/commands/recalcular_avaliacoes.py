@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from produtos import avaliacoes
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói soma, total e média das avaliações dos produtos a partir das avaliações registradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=avaliacoes.TAMANHO_LOTE,
+            help=f'Produtos por lote (padrão: {avaliacoes.TAMANHO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        corrigidos = avaliacoes.recalcular(tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Avaliações recalculadas: {corrigidos} produtos corrigidos'))
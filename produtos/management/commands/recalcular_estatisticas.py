@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from produtos import estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as estatísticas materializadas de produtos (reparo de divergências)'
+
+    def handle(self, *args, **options):
+        totais = estatisticas.recalcular()
+        self.stdout.write(self.style.SUCCESS(
+            f'Estatísticas recalculadas: {totais["total_produtos"]} produtos, '
+            f'{totais["produtos_ativos"]} ativos'
+        ))
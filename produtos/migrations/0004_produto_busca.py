@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def criar_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5("
+            "produto_id UNINDEXED, nome, marca, sku, descricao, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS produtos_busca ('
+            'produto_id uuid PRIMARY KEY REFERENCES produtos(id) ON DELETE CASCADE, '
+            'documento tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS produtos_busca_documento_gin '
+            'ON produtos_busca USING GIN (documento)'
+        )
+
+
+def remover_indice_busca(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS produtos_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0003_alter_produto_imagem_principal_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
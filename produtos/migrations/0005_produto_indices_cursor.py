@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categorias', '0001_initial'),
+        ('produtos', '0004_produto_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['data_criacao', 'id'], name='produtos_data_cr_5d20ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['avaliacao_media', 'id'], name='produtos_avaliac_6c7e8b_idx'),
+        ),
+    ]
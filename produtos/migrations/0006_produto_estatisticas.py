@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 03:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categorias', '0001_initial'),
+        ('produtos', '0005_produto_indices_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoEstatisticas',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, editable=False, primary_key=True, serialize=False)),
+                ('total_produtos', models.IntegerField(default=0, verbose_name='Total de Produtos')),
+                ('produtos_ativos', models.IntegerField(default=0, verbose_name='Produtos Ativos')),
+                ('produtos_em_promocao', models.IntegerField(default=0, verbose_name='Produtos em Promoção')),
+                ('produtos_sem_estoque', models.IntegerField(default=0, verbose_name='Produtos sem Estoque')),
+                ('valor_total_estoque', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Total do Estoque')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estatísticas de Produtos',
+                'verbose_name_plural': 'Estatísticas de Produtos',
+                'db_table': 'produto_estatisticas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProdutoEstatisticasCategoria',
+            fields=[
+                ('categoria', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estatisticas_produtos', serialize=False, to='categorias.categoria', verbose_name='Categoria')),
+                ('produtos_ativos', models.IntegerField(default=0, verbose_name='Produtos Ativos')),
+            ],
+            options={
+                'verbose_name': 'Estatísticas de Produtos por Categoria',
+                'verbose_name_plural': 'Estatísticas de Produtos por Categoria',
+                'db_table': 'produto_estatisticas_categoria',
+            },
+        ),
+    ]
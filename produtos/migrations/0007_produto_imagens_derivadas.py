@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0006_produto_estatisticas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='imagens_derivadas',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Variantes redimensionadas geradas a partir das imagens (ver produtos.imagens)', verbose_name='Imagens Derivadas'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-17 03:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0007_produto_imagens_derivadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoPrecoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('abertura', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Abertura')),
+                ('maxima', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Máxima')),
+                ('minima', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Mínima')),
+                ('fechamento', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Fechamento')),
+                ('alteracoes', models.PositiveIntegerField(default=0, verbose_name='Alterações')),
+            ],
+            options={
+                'verbose_name': 'Preço Diário',
+                'verbose_name_plural': 'Preços Diários',
+                'db_table': 'produto_preco_diario',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='produtohistoricopreco',
+            index=models.Index(fields=['produto', 'data_alteracao', 'id'], name='produto_his_produto_cd8cb2_idx'),
+        ),
+        migrations.AddField(
+            model_name='produtoprecodiario',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precos_diarios', to='produtos.produto', verbose_name='Produto'),
+        ),
+        migrations.AddIndex(
+            model_name='produtoprecodiario',
+            index=models.Index(fields=['dia'], name='produto_pre_dia_0d6618_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='produtoprecodiario',
+            constraint=models.UniqueConstraint(fields=('produto', 'dia'), name='produto_preco_diario_unico'),
+        ),
+    ]
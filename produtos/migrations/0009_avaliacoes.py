@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-17 03:38
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def preencher_soma_avaliacoes(apps, schema_editor):
+    # Médias gravadas antes das avaliações individuais: mantém a média atual
+    Produto = apps.get_model('produtos', 'Produto')
+    Produto.objects.filter(total_avaliacoes__gt=0).update(
+        soma_avaliacoes=Round(F('avaliacao_media') * F('total_avaliacoes'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0008_historico_precos_serie'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='soma_avaliacoes',
+            field=models.IntegerField(default=0, verbose_name='Soma das Avaliações'),
+        ),
+        migrations.RunPython(preencher_soma_avaliacoes, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Avaliacao',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nota', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)], verbose_name='Nota')),
+                ('comentario', models.TextField(blank=True, default='', verbose_name='Comentário')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avaliacoes', to='produtos.produto', verbose_name='Produto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avaliacoes', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Avaliação',
+                'verbose_name_plural': 'Avaliações',
+                'db_table': 'produto_avaliacoes',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['produto', 'data_criacao'], name='produto_ava_produto_8ad147_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'usuario'), name='avaliacao_unica_por_usuario')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 03:40
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Categoria = apps.get_model('categorias', 'Categoria')
+    Produto = apps.get_model('produtos', 'Produto')
+    publicados = Produto.objects.filter(
+        categoria=OuterRef('pk'), publicado=True, deleted=False
+    ).order_by().values('categoria').annotate(total=Count('id')).values('total')
+    Categoria.objects.update(total_produtos_publicados=Coalesce(Subquery(publicados), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0009_avaliacoes'),
+        ('categorias', '0002_categoria_total_produtos_publicados'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ProdutoEstatisticasCategoria',
+        ),
+    ]
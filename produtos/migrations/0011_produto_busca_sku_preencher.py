@@ -0,0 +1,137 @@
+# Generated by Django 6.0 on 2026-10-17 05:10
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Cópia congelada da normalização de produtos.busca nesta migração: mudanças
+# futuras nos backends de busca não alteram o que ela grava. A reindexação com
+# o código atual é feita pelo comando rebuild_search_index.
+TOKEN_RE = re.compile(r'\w+')
+
+PLURAIS = (
+    ('oes', 'ao'),
+    ('aes', 'ao'),
+    ('ais', 'al'),
+    ('eis', 'el'),
+    ('ois', 'ol'),
+    ('ns', 'm'),
+    ('les', 'l'),
+    ('res', 'r'),
+    ('zes', 'z'),
+    ('ses', 's'),
+)
+
+TAMANHO_LOTE = 2000
+
+
+def remover_acentos(texto):
+    normalizado = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in normalizado if not unicodedata.combining(c)).lower()
+
+
+def radical(token):
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for sufixo, substituto in PLURAIS:
+        if token.endswith(sufixo) and len(token) - len(sufixo) >= 2:
+            token = token[:-len(sufixo)] + substituto
+            break
+    else:
+        if token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+    if len(token) > 3 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def tokenizar(texto, stemming=True):
+    tokens = TOKEN_RE.findall(remover_acentos(texto))
+    return ' '.join(radical(token) for token in tokens) if stemming else ' '.join(tokens)
+
+
+def sku_compacto(sku):
+    return ''.join(TOKEN_RE.findall(remover_acentos(sku))).replace('_', '')
+
+
+def preencher_sqlite(apps, schema_editor):
+    # FTS5 não aceita ADD COLUMN: recria a tabela com a coluna do SKU compacto
+    schema_editor.execute('DROP TABLE IF EXISTS produtos_busca')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE produtos_busca USING fts5("
+        "produto_id UNINDEXED, nome, marca, sku, descricao, sku_compacto, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+    Produto = apps.get_model('produtos', 'Produto')
+    produtos = Produto.objects.filter(deleted=False).values_list(
+        'id', 'nome', 'marca', 'sku', 'descricao'
+    ).order_by().iterator(chunk_size=TAMANHO_LOTE)
+
+    def gravar(lote):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO produtos_busca (produto_id, nome, marca, sku, descricao, sku_compacto) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                lote
+            )
+
+    lote = []
+    for produto_id, nome, marca, sku, descricao in produtos:
+        lote.append((
+            produto_id.hex,
+            tokenizar(nome),
+            tokenizar(marca),
+            tokenizar(sku, stemming=False),
+            tokenizar(descricao),
+            sku_compacto(sku),
+        ))
+        if len(lote) == TAMANHO_LOTE:
+            gravar(lote)
+            lote = []
+    if lote:
+        gravar(lote)
+
+
+def preencher_postgresql(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO produtos_busca (produto_id, documento) "
+        "SELECT id, "
+        "setweight(to_tsvector('portuguese', unaccent(nome)), 'A') || "
+        "setweight(to_tsvector('simple', COALESCE(sku, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', unaccent(marca)), 'B') || "
+        "setweight(to_tsvector('portuguese', unaccent(descricao)), 'C') "
+        "FROM produtos WHERE NOT deleted "
+        "ON CONFLICT (produto_id) DO UPDATE SET documento = EXCLUDED.documento"
+    )
+
+
+def recriar_e_preencher_indice(apps, schema_editor):
+    # Produtos existentes entram no índice (antes dependiam de rebuild_search_index)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        preencher_sqlite(apps, schema_editor)
+    elif vendor == 'postgresql':
+        preencher_postgresql(apps, schema_editor)
+
+
+def recriar_indice_anterior(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS produtos_busca')
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE produtos_busca USING fts5("
+            "produto_id UNINDEXED, nome, marca, sku, descricao, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0010_categoria_contador_produtos'),
+    ]
+
+    operations = [
+        migrations.RunPython(recriar_e_preencher_indice, recriar_indice_anterior),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-17 18:20
+
+from django.db import migrations
+from django.db.models import DecimalField, F
+from django.db.models.functions import Cast, Round
+
+
+def arredondar_medias(apps, schema_editor):
+    # No SQLite a média era gravada sem arredondar (ex.: 3.3333333333333335)
+    Produto = apps.get_model('produtos', 'Produto')
+    Produto.objects.update(
+        avaliacao_media=Cast(Round(F('avaliacao_media'), 2), DecimalField(max_digits=3, decimal_places=2))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0011_produto_busca_sku_preencher'),
+    ]
+
+    operations = [
+        migrations.RunPython(arredondar_medias, migrations.RunPython.noop),
+    ]
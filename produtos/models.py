@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 import uuid
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -13,6 +13,18 @@ def produto_imagem_path(instance, filename):
     return f'produtos/{instance.id}/{filename}'
 
 
+class ProdutoQuerySet(models.QuerySet):
+    """QuerySet com consultas otimizadas para produtos"""
+
+    def para_listagem(self):
+        """
+        Carrega a categoria no mesmo SELECT (JOIN); a quantidade de produtos
+        da categoria é um contador mantido na própria linha, de modo que
+        listagens tenham um número constante de consultas.
+        """
+        return self.select_related('categoria')
+
+
 class Produto(models.Model):
     ESTADO_CHOICES = [
         ('novo', 'Novo'),
@@ -138,6 +150,14 @@ class Produto(models.Model):
         blank=True
     )
     
+    imagens_derivadas = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Imagens Derivadas',
+        help_text='Variantes redimensionadas geradas a partir das imagens (ver produtos.imagens)'
+    )
+    
     # Campos de SEO
     slug = models.SlugField(
         max_length=255,
@@ -185,6 +205,9 @@ class Produto(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     total_avaliacoes = models.IntegerField(default=0, verbose_name='Total de Avaliações')
+    soma_avaliacoes = models.IntegerField(default=0, verbose_name='Soma das Avaliações')
+
+    objects = ProdutoQuerySet.as_manager()
 
     class Meta:
         db_table = 'produtos'
@@ -201,30 +224,61 @@ class Produto(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['sku']),
             models.Index(fields=['publicado', 'deleted']),
+            # Paginação por cursor (keyset) em (campo, id)
+            models.Index(fields=['data_criacao', 'id']),
+            models.Index(fields=['avaliacao_media', 'id']),
         ]
 
+    # Campos cujo valor original é guardado para calcular deltas após o save
+    CAMPOS_RASTREADOS = ('categoria_id', 'publicado', 'deleted', 'em_promocao', 'quantidade', 'preco')
+
+    # Tentativas de gravação quando o slug gerado colide com um cadastro concorrente
+    TENTATIVAS_SLUG = 5
+
     def __str__(self):
         return f'{self.nome} - {self.marca}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = instance.estado_rastreado()
+        return instance
+
+    def estado_rastreado(self):
+        """Valores atuais dos campos rastreados (None para campos não carregados)"""
+        return {campo: self.__dict__.get(campo) for campo in self.CAMPOS_RASTREADOS}
+
     def save(self, *args, **kwargs):
         # Auto-gerar descrição curta se não fornecida
         if not self.descricao_curta and self.descricao:
             self.descricao_curta = self.descricao[:247] + '...' if len(self.descricao) > 250 else self.descricao
         
         # Auto-gerar slug se não fornecido
-        if not self.slug and self.nome:
-            from django.utils.text import slugify
-            base_slug = slugify(self.nome)
-            self.slug = base_slug
-            counter = 1
-            while Produto.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{base_slug}-{counter}"
-                counter += 1
+        gerar_slug = not self.slug and self.nome
+        if gerar_slug:
+            from produtos.slugs import alocar_slug
+            self.slug = alocar_slug(self.nome, excluir_id=self.id)
         
         # Atualizar campo em_promocao baseado no preço_promocional
         self.em_promocao = bool(self.preco_promocional and self.preco_promocional < self.preco)
         
-        super().save(*args, **kwargs)
+        if not gerar_slug:
+            # Os contadores da categoria (sinais) são gravados na mesma transação
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+            return
+
+        for tentativa in range(1, self.TENTATIVAS_SLUG + 1):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Outro cadastro ocupou o slug entre a alocação e o INSERT
+                conflito = Produto.objects.filter(slug=self.slug).exclude(id=self.id).exists()
+                if not conflito or tentativa == self.TENTATIVAS_SLUG:
+                    raise
+                self.slug = alocar_slug(self.nome, excluir_id=self.id)
 
     def soft_delete(self):
         """Soft delete do produto"""
@@ -277,17 +331,40 @@ class Produto(models.Model):
         return bool(self.imagem_principal or self.imagem_secundaria)
 
     def incrementar_visualizacoes(self):
-        """Incrementa o contador de visualizações"""
+        """
+        Incrementa o contador de visualizações.
+        A gravação é agrupada em segundo plano (ver produtos.visualizacoes).
+        """
+        from produtos.visualizacoes import registrar_visualizacao
+        registrar_visualizacao(self.id)
         self.visualizacoes += 1
-        self.save(update_fields=['visualizacoes'])
 
-    def atualizar_avaliacao(self, nova_avaliacao):
-        """Atualiza a avaliação média do produto"""
-        if 0 <= nova_avaliacao <= 5:
-            total_pontos = (self.avaliacao_media * self.total_avaliacoes) + nova_avaliacao
-            self.total_avaliacoes += 1
-            self.avaliacao_media = total_pontos / self.total_avaliacoes
-            self.save(update_fields=['avaliacao_media', 'total_avaliacoes'])
+
+class ProdutoEstatisticas(models.Model):
+    """
+    Estatísticas gerais do catálogo materializadas em uma única linha.
+    Mantidas por deltas nos sinais de Produto (ver produtos.estatisticas).
+    """
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1, editable=False)
+    total_produtos = models.IntegerField(default=0, verbose_name='Total de Produtos')
+    produtos_ativos = models.IntegerField(default=0, verbose_name='Produtos Ativos')
+    produtos_em_promocao = models.IntegerField(default=0, verbose_name='Produtos em Promoção')
+    produtos_sem_estoque = models.IntegerField(default=0, verbose_name='Produtos sem Estoque')
+    valor_total_estoque = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor Total do Estoque'
+    )
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        db_table = 'produto_estatisticas'
+        verbose_name = 'Estatísticas de Produtos'
+        verbose_name_plural = 'Estatísticas de Produtos'
+
+    def __str__(self):
+        return f'Estatísticas: {self.total_produtos} produtos'
 
 
 class Favorito(models.Model):
@@ -329,6 +406,45 @@ class Favorito(models.Model):
         return f'{self.usuario.email} favoritou {self.produto.nome}'
 
 
+class Avaliacao(models.Model):
+    """Avaliação de um produto por um usuário (uma por usuário/produto)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='avaliacoes',
+        verbose_name='Produto'
+    )
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='avaliacoes',
+        verbose_name='Usuário'
+    )
+    nota = models.PositiveSmallIntegerField(
+        verbose_name='Nota',
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
+    comentario = models.TextField(blank=True, default='', verbose_name='Comentário')
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Última Atualização')
+
+    class Meta:
+        db_table = 'produto_avaliacoes'
+        verbose_name = 'Avaliação'
+        verbose_name_plural = 'Avaliações'
+        ordering = ['-data_criacao']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'usuario'], name='avaliacao_unica_por_usuario'),
+        ]
+        indexes = [
+            models.Index(fields=['produto', 'data_criacao']),
+        ]
+
+    def __str__(self):
+        return f'{self.produto_id}: {self.nota} por {self.usuario_id}'
+
+
 class ProdutoHistoricoPreco(models.Model):
     """Histórico de preços do produto"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -354,10 +470,44 @@ class ProdutoHistoricoPreco(models.Model):
         verbose_name = 'Histórico de Preço'
         verbose_name_plural = 'Históricos de Preço'
         ordering = ['-data_alteracao']
+        indexes = [
+            # Consultas por produto e intervalo de datas (ver produtos.historico)
+            models.Index(fields=['produto', 'data_alteracao', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.produto.nome}: R${self.preco_antigo} → R${self.preco_novo}'
 
+
+class ProdutoPrecoDiario(models.Model):
+    """Preços de um produto consolidados por dia (OHLC), gerados a partir do histórico"""
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='precos_diarios',
+        verbose_name='Produto'
+    )
+    dia = models.DateField(verbose_name='Dia')
+    abertura = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Abertura')
+    maxima = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Máxima')
+    minima = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Mínima')
+    fechamento = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Fechamento')
+    alteracoes = models.PositiveIntegerField(default=0, verbose_name='Alterações')
+
+    class Meta:
+        db_table = 'produto_preco_diario'
+        verbose_name = 'Preço Diário'
+        verbose_name_plural = 'Preços Diários'
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'dia'], name='produto_preco_diario_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['dia']),
+        ]
+
+    def __str__(self):
+        return f'{self.produto_id} {self.dia}: R${self.fechamento}'
+
         # Adicione esta função no início do arquivo (após os imports)
 def produto_imagem_path(instance, filename):
     """Função para determinar o caminho de upload das imagens do produto"""
@@ -0,0 +1,92 @@
+"""
+Recursos do django-import-export para o admin de produtos.
+
+A importação usa o modo em lote do import-export (bulk_create/bulk_update a
+cada TAMANHO_LOTE linhas), com os produtos existentes carregados em uma única
+consulta pelo SKU e categorias resolvidas por nome com cache. Arquivos muito
+grandes devem usar o comando importar_produtos.
+"""
+from django.utils import timezone
+from import_export import fields, resources, widgets
+from import_export.instance_loaders import CachedInstanceLoader
+
+from categorias.models import Categoria
+from produtos import slugs
+from produtos.importacao import COLUNAS
+from produtos.models import Produto, ProdutoHistoricoPreco
+from produtos.signals import produtos_atualizados_em_lote
+
+TAMANHO_LOTE = 1000
+
+
+class CategoriaPorNomeWidget(widgets.ForeignKeyWidget):
+    """Categoria pelo nome, com uma consulta por nome distinto"""
+
+    def __init__(self):
+        super().__init__(Categoria, field='nome')
+        self._cache = {}
+
+    def clean(self, value, row=None, *args, **kwargs):
+        if not value:
+            return None
+        if value not in self._cache:
+            self._cache[value] = super().clean(value, row, *args, **kwargs)
+        return self._cache[value]
+
+
+class ProdutoResource(resources.ModelResource):
+    categoria = fields.Field(
+        column_name='categoria',
+        attribute='categoria',
+        widget=CategoriaPorNomeWidget()
+    )
+
+    class Meta:
+        model = Produto
+        fields = COLUNAS + ('categoria',)
+        import_id_fields = ('sku',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        batch_size = TAMANHO_LOTE
+        skip_diff = True
+
+    def before_import(self, dataset, *args, **kwargs):
+        super().before_import(dataset, *args, **kwargs)
+        self._produto_ids = []
+        self._historico = []
+        self._usuario = kwargs.get('user')
+
+    def before_save_instance(self, instance, *args, **kwargs):
+        """Campos calculados em Produto.save(), que o modo em lote não chama"""
+        super().before_save_instance(instance, *args, **kwargs)
+        if not instance.descricao_curta and instance.descricao:
+            instance.descricao_curta = instance.descricao[:247] + '...' if len(instance.descricao) > 250 else instance.descricao
+        instance.em_promocao = bool(instance.preco_promocional and instance.preco_promocional < instance.preco)
+        instance.data_atualizacao = timezone.now()
+
+        preco_anterior = 0 if instance._state.adding else getattr(instance, '_estado_original', {}).get('preco')
+        if preco_anterior is not None and preco_anterior != instance.preco:
+            self._historico.append(ProdutoHistoricoPreco(
+                produto_id=instance.id,
+                preco_antigo=preco_anterior,
+                preco_novo=instance.preco,
+                alterado_por=self._usuario
+            ))
+        self._produto_ids.append(instance.id)
+
+    def bulk_create(self, *args, **kwargs):
+        slugs.atribuir_slugs(self.create_instances)
+        return super().bulk_create(*args, **kwargs)
+
+    def get_bulk_update_fields(self):
+        return super().get_bulk_update_fields() + ['descricao_curta', 'em_promocao', 'data_atualizacao']
+
+    def after_import(self, dataset, result, *args, **kwargs):
+        super().after_import(dataset, result, *args, **kwargs)
+        ProdutoHistoricoPreco.objects.bulk_create(self._historico, batch_size=TAMANHO_LOTE)
+        if self._produto_ids:
+            produtos_atualizados_em_lote.send(
+                sender=Produto,
+                produto_ids=self._produto_ids,
+                campos=set(self.get_bulk_update_fields()) | {'sku'}
+            )
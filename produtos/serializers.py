@@ -1,11 +1,56 @@
 from rest_framework import serializers
+from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.utils.text import slugify
-from produtos.models import Produto, Favorito, ProdutoHistoricoPreco
+from produtos.models import Produto, Favorito, ProdutoHistoricoPreco, Avaliacao
 from categorias.serializers import CategoriaSerializer
 from categorias.models import Categoria
 
 
+def carregar_favoritos(context, produtos):
+    """
+    Resolve em uma única consulta quais produtos da página são favoritos
+    do usuário da requisição e guarda o resultado no contexto do serializer.
+    """
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return
+
+    resolvidos = context.setdefault('favoritos', {})
+    pendentes = [produto.id for produto in produtos if produto.id not in resolvidos]
+    if not pendentes:
+        return
+
+    favoritos = set(
+        Favorito.objects.filter(
+            usuario=request.user,
+            produto_id__in=pendentes
+        ).values_list('produto_id', flat=True)
+    )
+    for produto_id in pendentes:
+        resolvidos[produto_id] = produto_id in favoritos
+
+
+def resolver_is_favorito(context, produto):
+    """Lê is_favorito do contexto, consultando o banco apenas se o produto ainda não foi resolvido"""
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return False
+
+    if produto.id not in context.get('favoritos', {}):
+        carregar_favoritos(context, [produto])
+    return context['favoritos'][produto.id]
+
+
+class ProdutoListSerializerBase(serializers.ListSerializer):
+    """ListSerializer que resolve is_favorito da página inteira antes de serializar"""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        produtos = list(iterable)
+        carregar_favoritos(self.context, produtos)
+        return super().to_representation(produtos)
+
+
 class ProdutoSerializer(serializers.ModelSerializer):
     categoria = CategoriaSerializer(read_only=True)
     categoria_id = serializers.UUIDField(write_only=True, required=False)
@@ -33,6 +78,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
             'publicado', 'destaque', 'em_promocao', 'visualizacoes',
             'vendas', 'avaliacao_media', 'total_avaliacoes'
         ]
+        list_serializer_class = ProdutoListSerializerBase
         
         read_only_fields = [
             'id', 'slug', 'preco_atual', 'desconto_percentual', 'disponivel',
@@ -50,13 +96,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
 
     def get_is_favorito(self, obj):
         """Verifica se o produto é favorito do usuário atual"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorito.objects.filter(
-                usuario=request.user,
-                produto=obj
-            ).exists()
-        return False
+        return resolver_is_favorito(self.context, obj)
 
     def get_imagem_principal_url(self, obj):
         """Retorna a URL completa da imagem principal"""
@@ -97,16 +137,6 @@ class ProdutoSerializer(serializers.ModelSerializer):
             if queryset.exists():
                 errors['sku'] = 'Este SKU já está em uso'
         
-        # Validar slug único
-        nome = data.get('nome')
-        if nome and not data.get('slug'):
-            slug = slugify(nome)
-            queryset = Produto.objects.filter(slug=slug)
-            if self.instance:
-                queryset = queryset.exclude(id=self.instance.id)
-            if queryset.exists():
-                errors['nome'] = 'Já existe um produto com nome similar. Escolha um nome diferente ou informe um slug personalizado.'
-        
         if errors:
             raise serializers.ValidationError(errors)
         
@@ -172,6 +202,7 @@ class ProdutoListSerializer(serializers.ModelSerializer):
     preco_atual = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     desconto_percentual = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     imagem_principal_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     is_favorito = serializers.SerializerMethodField()
     
     class Meta:
@@ -179,9 +210,29 @@ class ProdutoListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nome', 'slug', 'descricao_curta', 'categoria_nome',
             'marca', 'preco', 'preco_promocional', 'preco_atual', 'desconto_percentual',
-            'quantidade', 'disponivel', 'imagem_principal_url', 'is_favorito',
+            'quantidade', 'disponivel', 'imagem_principal_url', 'srcset', 'is_favorito',
             'destaque', 'em_promocao', 'avaliacao_media'
         ]
+        list_serializer_class = ProdutoListSerializerBase
+    
+    def get_srcset(self, obj):
+        """
+        Variantes da imagem principal por formato, no formato do atributo srcset
+        ({'webp': 'url 160w, url 320w, ...', 'jpeg': ...}); None enquanto não geradas.
+        """
+        entrada = obj.imagens_derivadas.get('principal')
+        if not entrada or not obj.imagem_principal or entrada.get('origem') != obj.imagem_principal.name:
+            return None
+        
+        storage = obj.imagem_principal.storage
+        request = self.context.get('request')
+        srcset = {}
+        for variante in entrada['variantes']:
+            url = storage.url(variante['nome'])
+            if request:
+                url = request.build_absolute_uri(url)
+            srcset.setdefault(variante['formato'], []).append(f"{url} {variante['largura']}w")
+        return {formato: ', '.join(urls) for formato, urls in srcset.items()}
     
     def get_imagem_principal_url(self, obj):
         if obj.imagem_principal:
@@ -193,13 +244,7 @@ class ProdutoListSerializer(serializers.ModelSerializer):
     
     def get_is_favorito(self, obj):
         """Verifica se o produto é favorito do usuário atual"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorito.objects.filter(
-                usuario=request.user,
-                produto=obj
-            ).exists()
-        return False
+        return resolver_is_favorito(self.context, obj)
 
 
 class ProdutoCreateUpdateSerializer(serializers.ModelSerializer):
@@ -256,6 +301,21 @@ class FavoritoCreateSerializer(serializers.ModelSerializer):
         fields = ['produto_id', 'notificar_promocao']
 
 
+class AvaliacaoSerializer(serializers.ModelSerializer):
+    usuario_nome = serializers.CharField(source='usuario.nome', read_only=True)
+    
+    class Meta:
+        model = Avaliacao
+        fields = ['id', 'usuario_nome', 'nota', 'comentario', 'data_criacao', 'data_atualizacao']
+        read_only_fields = ['id', 'usuario_nome', 'data_criacao', 'data_atualizacao']
+
+
+class AvaliacaoCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Avaliacao
+        fields = ['nota', 'comentario']
+
+
 class ProdutoHistoricoPrecoSerializer(serializers.ModelSerializer):
     alterado_por_nome = serializers.CharField(source='alterado_por.nome', read_only=True)
     
@@ -0,0 +1,192 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from categorias.models import Categoria
+from produtos import avaliacoes, cache_detalhe, estatisticas, facetas, imagens
+from produtos.busca import obter_backend
+from produtos.models import Avaliacao, Produto
+
+# Enviado após atualizações em massa feitas com QuerySet.update() (sem post_save).
+# Argumentos: produto_ids (lista de IDs) e campos (nomes dos campos alterados)
+produtos_atualizados_em_lote = Signal()
+
+# Campos que alteram a quantidade_produtos da categoria (aninhada no payload de detalhe)
+CAMPOS_QUANTIDADE_CATEGORIA = ('categoria_id', 'publicado', 'deleted')
+
+# Acima deste tamanho de lote o índice de facetas é descartado em vez de atualizado
+LIMITE_DELTA_FACETAS = 2000
+
+# Campos que compõem o documento do índice de busca
+CAMPOS_BUSCA = {'nome', 'descricao', 'marca', 'sku', 'deleted'}
+
+# Campos que afetam o índice de facetas
+CAMPOS_FACETAS = {'categoria', 'marca', 'estado', 'destaque', 'em_promocao', 'preco', 'publicado', 'deleted'}
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_indice_busca(sender, instance, update_fields=None, **kwargs):
+    """Mantém o índice de busca sincronizado (inclui soft delete, que passa por save)"""
+    if update_fields is not None and not CAMPOS_BUSCA.intersection(update_fields):
+        return
+    obter_backend().indexar(instance)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_do_indice_busca(sender, instance, **kwargs):
+    obter_backend().remover([instance.id])
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_indice_facetas(sender, instance, update_fields=None, **kwargs):
+    """Atualiza os bitmaps de facetas do produto após o commit"""
+    if update_fields is not None and not CAMPOS_FACETAS.intersection(update_fields):
+        return
+    transaction.on_commit(lambda: facetas.atualizar_produtos([instance]))
+
+
+@receiver(post_delete, sender=Produto)
+def remover_do_indice_facetas(sender, instance, **kwargs):
+    transaction.on_commit(lambda: facetas.remover_produtos([instance.id]))
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_estatisticas(sender, instance, created=False, update_fields=None, **kwargs):
+    """Aplica às estatísticas materializadas o delta entre o estado original e o novo"""
+    antigo = None if created else getattr(instance, '_estado_original', None)
+    novo = instance.estado_rastreado()
+    if update_fields is not None and antigo is not None:
+        # Campos fora de update_fields não foram gravados: mantêm o valor original
+        gravados = {'categoria_id' if campo == 'categoria' else campo for campo in update_fields}
+        novo = {campo: novo[campo] if campo in gravados else antigo[campo] for campo in novo}
+        if novo == antigo:
+            return
+    elif not created and antigo is None:
+        # Instância criada em memória e salva sem vir do banco: estado anterior desconhecido
+        estatisticas.recalcular()
+        instance._estado_original = novo
+        return
+
+    estatisticas.aplicar_delta(antigo, novo)
+    instance._estado_original = novo
+
+
+@receiver(post_delete, sender=Produto)
+def remover_das_estatisticas(sender, instance, **kwargs):
+    antigo = getattr(instance, '_estado_original', None) or instance.estado_rastreado()
+    estatisticas.aplicar_delta(antigo, None)
+
+
+def _produtos_em_lotes(produto_ids, campos, tamanho=500):
+    """Carrega os produtos do lote com IN de tamanho limitado"""
+    for inicio in range(0, len(produto_ids), tamanho):
+        yield from Produto.objects.filter(id__in=produto_ids[inicio:inicio + tamanho]).only(*campos)
+
+
+@receiver(produtos_atualizados_em_lote, sender=Produto)
+def atualizar_indices_em_lote(sender, produto_ids, campos, **kwargs):
+    """Atualiza busca, facetas e estatísticas uma única vez para todo o lote"""
+    if CAMPOS_BUSCA.intersection(campos):
+        obter_backend().indexar_em_lote(
+            _produtos_em_lotes(produto_ids, ['id', 'nome', 'descricao', 'marca', 'sku', 'deleted'])
+        )
+
+    if CAMPOS_FACETAS.intersection(campos):
+        if len(produto_ids) > LIMITE_DELTA_FACETAS:
+            # Reconstruir com uma consulta sai mais barato que carregar o lote inteiro
+            transaction.on_commit(facetas.invalidar)
+        else:
+            transaction.on_commit(lambda: facetas.atualizar_produtos(list(_produtos_em_lotes(
+                produto_ids,
+                ['id', 'categoria_id', 'marca', 'estado', 'destaque', 'em_promocao', 'preco', 'publicado', 'deleted']
+            ))))
+
+    if set(Produto.CAMPOS_RASTREADOS).intersection(campos):
+        estatisticas.recalcular()
+
+
+@receiver(pre_save, sender=Produto)
+def marcar_categorias_afetadas(sender, instance, **kwargs):
+    """Guarda as categorias cuja quantidade de produtos muda com este save"""
+    antigo = getattr(instance, '_estado_original', None)
+    novo = instance.estado_rastreado()
+    if antigo is None:
+        instance._categorias_afetadas = {novo['categoria_id']}
+    elif any(antigo[campo] != novo[campo] for campo in CAMPOS_QUANTIDADE_CATEGORIA):
+        instance._categorias_afetadas = {antigo['categoria_id'], novo['categoria_id']}
+    else:
+        instance._categorias_afetadas = set()
+
+
+@receiver(post_save, sender=Produto)
+def invalidar_cache_detalhe(sender, instance, **kwargs):
+    """Troca as versões do produto (e das categorias afetadas) após o commit"""
+    categorias = getattr(instance, '_categorias_afetadas', set())
+
+    def invalidar():
+        cache_detalhe.invalidar_produtos([instance.id])
+        cache_detalhe.invalidar_categorias(categorias)
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_do_cache_detalhe(sender, instance, **kwargs):
+    def invalidar():
+        cache_detalhe.invalidar_produtos([instance.id])
+        cache_detalhe.invalidar_categorias([instance.categoria_id])
+    transaction.on_commit(invalidar)
+
+
+@receiver(produtos_atualizados_em_lote, sender=Produto)
+def invalidar_cache_detalhe_em_lote(sender, produto_ids, campos, **kwargs):
+    categorias = set()
+    if {'categoria', 'categoria_id', 'publicado', 'deleted'}.intersection(campos):
+        for inicio in range(0, len(produto_ids), 500):
+            categorias.update(Produto.objects.filter(
+                id__in=produto_ids[inicio:inicio + 500]
+            ).order_by().values_list('categoria_id', flat=True).distinct())
+
+    def invalidar():
+        cache_detalhe.invalidar_produtos(produto_ids)
+        cache_detalhe.invalidar_categorias(categorias)
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_cache_categoria(sender, instance, **kwargs):
+    """Produtos exibem a categoria aninhada: a troca de versão invalida seus payloads"""
+    transaction.on_commit(lambda: cache_detalhe.invalidar_categorias([instance.id]))
+
+
+@receiver(post_save, sender=Produto)
+def agendar_imagens_derivadas(sender, instance, **kwargs):
+    """
+    Gera as variantes em segundo plano quando uma imagem do produto muda ou
+    ainda está pendente (ex.: tarefa anterior que esgotou as tentativas)
+    """
+    if {'imagens_derivadas', *imagens.CAMPOS_IMAGEM.values()}.intersection(instance.get_deferred_fields()):
+        return
+    tipos = imagens.pendentes(instance)
+    if tipos:
+        imagens.agendar(instance.id, tipos)
+
+
+@receiver(post_delete, sender=Produto)
+def apagar_imagens_derivadas(sender, instance, **kwargs):
+    """Libera as variantes do produto removido"""
+    if 'imagens_derivadas' in instance.get_deferred_fields() or not instance.imagens_derivadas:
+        return
+    storage = Produto._meta.get_field('imagem_principal').storage
+    entradas = list(instance.imagens_derivadas.values())
+
+    def apagar():
+        for entrada in entradas:
+            imagens.apagar_variantes(entrada, storage)
+    transaction.on_commit(apagar)
+
+
+@receiver(post_delete, sender=Avaliacao)
+def remover_dos_agregados_de_avaliacao(sender, instance, **kwargs):
+    """Desconta a avaliação removida (inclusive em cascata) da soma e do total do produto"""
+    avaliacoes.ajustar_agregados(instance.produto_id, -instance.nota, -1)
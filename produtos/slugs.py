@@ -0,0 +1,86 @@
+"""
+Alocação de slugs únicos de produto.
+
+O próximo sufixo livre (nome, nome-1, nome-2, ...) é calculado a partir de uma
+única consulta que traz só o próprio ``base`` e os slugs ``base-<número>``
+(e não ``base-outras-palavras``, que podem ser muitos). Como dois cadastros simultâneos podem
+escolher o mesmo slug, Produto.save() tenta de novo em caso de conflito na
+constraint unique.
+"""
+import re
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+# Espaço reservado para o sufixo numérico em Produto.slug (max_length=255)
+TAMANHO_BASE = 245
+
+# Nomes distintos por consulta no modo em lote
+BASES_POR_CONSULTA = 200
+
+
+def slug_base(nome):
+    return slugify(nome)[:TAMANHO_BASE].strip('-') or 'produto'
+
+
+def slugs_ocupados(bases, excluir_id=None):
+    """Slugs existentes iguais a alguma das bases ou a base seguida de -<número>"""
+    from produtos.models import Produto
+
+    filtro = Q()
+    for base in bases:
+        # O prefixo restringe pelo índice; a regex descarta base-outras-palavras
+        filtro |= Q(slug=base) | Q(slug__startswith=f'{base}-', slug__regex=rf'^{re.escape(base)}-[0-9]+$')
+    queryset = Produto.objects.filter(filtro)
+    if excluir_id is not None:
+        queryset = queryset.exclude(id=excluir_id)
+    return set(queryset.values_list('slug', flat=True))
+
+
+class AlocadorSlugs:
+    """Escolhe slugs livres em memória a partir do conjunto de slugs ocupados"""
+
+    def __init__(self, ocupados):
+        self.ocupados = ocupados
+        self.proximo_sufixo = {}
+
+    def alocar(self, base):
+        sufixo = self.proximo_sufixo.get(base, 0)
+        slug = f'{base}-{sufixo}' if sufixo else base
+        while slug in self.ocupados:
+            sufixo += 1
+            slug = f'{base}-{sufixo}'
+        self.proximo_sufixo[base] = sufixo + 1
+        self.ocupados.add(slug)
+        return slug
+
+
+def alocar_slug(nome, excluir_id=None):
+    """Slug livre para o nome, com uma consulta"""
+    base = slug_base(nome)
+    return AlocadorSlugs(slugs_ocupados([base], excluir_id)).alocar(base)
+
+
+def atribuir_slugs(produtos):
+    """
+    Atribui slugs aos produtos (não salvos) sem slug, para uso com bulk_create.
+    Uma consulta a cada BASES_POR_CONSULTA nomes distintos; nomes repetidos
+    dentro do próprio lote também recebem slugs distintos.
+    """
+    pendentes = {}
+    ocupados = set()
+    for produto in produtos:
+        if produto.slug:
+            ocupados.add(produto.slug)
+        elif produto.nome:
+            pendentes.setdefault(slug_base(produto.nome), []).append(produto)
+
+    bases = list(pendentes)
+    for inicio in range(0, len(bases), BASES_POR_CONSULTA):
+        ocupados |= slugs_ocupados(bases[inicio:inicio + BASES_POR_CONSULTA])
+
+    alocador = AlocadorSlugs(ocupados)
+    for base, produtos_da_base in pendentes.items():
+        for produto in produtos_da_base:
+            produto.slug = alocador.alocar(base)
+    return produtos
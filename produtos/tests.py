@@ -0,0 +1,745 @@
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import tablib
+from rest_framework.test import APIClient
+
+from categorias.models import Categoria
+from produtos import avaliacoes, cache_detalhe, facetas, historico, imagens, importacao, visualizacoes
+from produtos.busca import filtrar_por_parametros
+from produtos.lote import atualizar_em_lote
+from produtos.models import Avaliacao, Favorito, Produto, ProdutoEstatisticas, ProdutoHistoricoPreco
+from produtos.resources import ProdutoResource
+from produtos.slugs import alocar_slug, slugs_ocupados
+from usuarios.models import Usuario
+
+
+class ConsultasListagemTests(TestCase):
+    """As listagens fazem o mesmo número de consultas para qualquer tamanho de página"""
+
+    URLS = [
+        '/api/produtos/produtos/?page_size=100',
+        '/api/produtos/destaques/?page_size=100',
+        '/api/produtos/promocoes/?page_size=100',
+        '/api/produtos/meus-favoritos/?page_size=100',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(email='lista@teste.com', nome='Teste', senha='Senha@123')
+        self.categorias = [Categoria.objects.create(nome=f'Categoria {i}') for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.total = 0
+
+    def criar_produtos(self, quantidade):
+        for i in range(self.total, self.total + quantidade):
+            produto = Produto.objects.create(
+                nome=f'Produto {i}',
+                descricao=f'Descrição do produto {i}',
+                marca='Marca',
+                preco=Decimal('100.00'),
+                preco_promocional=Decimal('90.00'),
+                destaque=True,
+                categoria=self.categorias[i % len(self.categorias)],
+                quantidade=5
+            )
+            Favorito.objects.create(usuario=self.usuario, produto=produto)
+        self.total += quantidade
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), response
+
+    def test_consultas_constantes(self):
+        self.criar_produtos(5)
+        # Primeira requisição inicializa caches de processo (índice de busca, versões)
+        for url in self.URLS:
+            self.client.get(url)
+
+        esperadas = {}
+        for url in self.URLS:
+            esperadas[url], response = self.consultas(url)
+            self.assertEqual(response.data['count'], 5)
+
+        self.criar_produtos(45)
+        for url in self.URLS:
+            with self.subTest(url=url), self.assertNumQueries(esperadas[url]):
+                response = self.client.get(url)
+            self.assertEqual(response.data['count'], 50)
+
+
+class BuscaTests(TestCase):
+    """Busca textual: filtros aplicados no SQL junto com a correspondência"""
+
+    def setUp(self):
+        self.categorias = [Categoria.objects.create(nome=f'Categoria {i}') for i in range(2)]
+
+    def criar(self, nome, categoria, **campos):
+        return Produto.objects.create(
+            nome=nome, descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+            categoria=categoria, quantidade=1, **campos
+        )
+
+    def buscar(self, parametros):
+        return filtrar_por_parametros(Produto.objects.filter(deleted=False), parametros)
+
+    def test_filtro_nao_perde_resultados_alem_dos_mais_relevantes(self):
+        for i in range(30):
+            self.criar(f'Notebook Notebook Notebook {i}', self.categorias[0])
+        alvo = self.criar('Notebook básico', self.categorias[1])
+
+        resultado = self.buscar({'q': 'notebook', 'categoria_id': str(self.categorias[1].id)})
+        self.assertEqual(list(resultado.values_list('id', flat=True)), [alvo.id])
+        self.assertEqual(self.buscar({'q': 'notebooks'}).count(), 31)
+
+    def test_prefixo_de_sku(self):
+        produto = self.criar('Mouse', self.categorias[0], sku='ABC-12345')
+        self.criar('Teclado', self.categorias[0], sku='XYZ-99')
+        self.assertEqual(list(self.buscar({'q': 'ABC-123'}).values_list('id', flat=True)), [produto.id])
+        self.assertEqual(list(self.buscar({'q': 'abc12'}).values_list('id', flat=True)), [produto.id])
+
+
+class FacetasTests(TestCase):
+    """O índice atualizado incrementalmente equivale ao reconstruído do banco"""
+
+    def setUp(self):
+        cache.clear()
+        facetas.invalidar()
+        self.categorias = [Categoria.objects.create(nome=f'Categoria {i}') for i in range(2)]
+
+    def criar(self, i, **campos):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Produto.objects.create(
+                nome=f'Produto {i}', descricao='Descrição', marca=['Dell', 'Apple'][i % 2],
+                preco=Decimal(40 + i * 30), categoria=self.categorias[i % 2], quantidade=1, **campos
+            )
+
+    def assertIndiceAtual(self, filtros=None, preco_min=None, preco_max=None):
+        _, entradas, _ = facetas.construir()
+        esperado = facetas.IndiceFacetas(entradas).facetar(filtros or {}, preco_min, preco_max)
+        self.assertEqual(facetas.obter_indice().facetar(filtros or {}, preco_min, preco_max), esperado)
+
+    def test_atualizacoes_incrementais(self):
+        produtos = [self.criar(i) for i in range(10)]
+        anterior = facetas.obter_indice()
+        contagem_anterior = anterior.facetar({})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            produtos[0].marca = 'Samsung'
+            produtos[0].preco = Decimal('999.00')
+            produtos[0].save()
+            produtos[1].publicado = False
+            produtos[1].save()
+            produtos[2].soft_delete()
+        self.criar(10)
+
+        self.assertIndiceAtual()
+        self.assertIndiceAtual({'marca': ['apple']}, Decimal('60'), Decimal('300'))
+        # Quem já tinha o índice continua com a versão anterior intacta
+        self.assertEqual(anterior.facetar({}), contagem_anterior)
+        self.assertEqual(facetas.obter_indice().facetar({})['total'], 9)
+
+    def test_preco_nao_finito_e_ignorado(self):
+        for i in range(3):
+            self.criar(i)
+        client = APIClient()
+        for parametros in ['min_preco=nan', 'max_preco=sNaN', 'min_preco=Infinity&max_preco=-inf']:
+            with self.subTest(parametros=parametros):
+                response = client.get(f'/api/produtos/produtos/filter/?{parametros}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['total'], 3)
+
+    def test_reconstroi_quando_entrada_some_do_cache(self):
+        for i in range(4):
+            self.criar(i)
+        facetas.obter_indice()
+        cache.delete(facetas.CHAVE_ENTRADA.format('marca=Dell'))
+        with self.captureOnCommitCallbacks(execute=True):
+            produto = Produto.objects.first()
+            produto.marca = 'Dell'
+            produto.save()
+        self.assertIndiceAtual()
+
+
+class AtualizacaoEmLoteTests(TestCase):
+    """Ativar promoção grava o mesmo preço no produto e no histórico"""
+
+    def test_preco_promocional_igual_ao_historico(self):
+        categoria = Categoria.objects.create(nome='Categoria')
+        precos = [Decimal('10.05'), Decimal('0.05'), Decimal('199.99')]
+        produtos = [
+            Produto.objects.create(
+                nome=f'Produto {i}', descricao='Descrição', marca='Marca', preco=preco,
+                categoria=categoria, quantidade=1
+            )
+            for i, preco in enumerate(precos)
+        ]
+
+        self.assertEqual(atualizar_em_lote([produto.id for produto in produtos], 'ativar_promocao'), 3)
+        for produto in produtos:
+            produto.refresh_from_db()
+            historico = ProdutoHistoricoPreco.objects.filter(produto=produto).latest('data_alteracao')
+            self.assertTrue(produto.em_promocao)
+            self.assertEqual(historico.preco_antigo, produto.preco)
+            self.assertEqual(historico.preco_novo, produto.preco_promocional)
+        self.assertEqual(produtos[0].preco_promocional, Decimal('9.05'))
+
+
+class RespostaCondicionalTests(TestCase):
+    """ETag das listagens: parâmetros da requisição e contadores das categorias"""
+
+    def setUp(self):
+        cache.clear()
+        self.categorias = [Categoria.objects.create(nome=f'Categoria {i}') for i in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto = Produto.objects.create(
+                nome='Produto', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=self.categorias[0], quantidade=1
+            )
+        self.client = APIClient()
+
+    def test_etag_depende_dos_parametros(self):
+        url = '/api/produtos/produtos/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url + '?ordering=preco', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ordenacao_por_visualizacoes_sem_condicional(self):
+        response = self.client.get('/api/produtos/produtos/?ordering=-visualizacoes')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_etag_das_categorias_muda_com_os_produtos(self):
+        url = '/api/categorias/categorias/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto.categoria = self.categorias[1]
+            self.produto.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class TemporizadorImediato:
+    """threading.Timer síncrono para os testes"""
+
+    def __init__(self, espera, funcao, args):
+        self.funcao, self.args = funcao, args
+
+    def start(self):
+        self.funcao(*self.args)
+
+
+class ImagensDerivadasTests(TestCase):
+    """Tarefas de variantes que falham são repetidas e reagendadas"""
+
+    def executar(self, falhas):
+        chamadas = []
+
+        def processar(produto_id, tipo):
+            chamadas.append(tipo)
+            if len(chamadas) <= falhas:
+                raise OperationalError('database table is locked: midia_blobs')
+
+        imagens._agendadas.add((1, 'principal'))
+        with mock.patch.object(imagens, 'processar', processar), \
+                mock.patch.object(imagens.threading, 'Timer', TemporizadorImediato), \
+                mock.patch.object(imagens, '_submeter', imagens._tarefa):
+            imagens._tarefa(1, 'principal')
+        self.assertNotIn((1, 'principal'), imagens._agendadas)
+        return len(chamadas)
+
+    def test_repete_com_backoff(self):
+        self.assertEqual(self.executar(falhas=2), 3)
+
+    def test_desiste_apos_as_tentativas(self):
+        self.assertEqual(self.executar(falhas=100), imagens.TENTATIVAS)
+
+    def test_save_reagenda_imagem_pendente(self):
+        categoria = Categoria.objects.create(nome='Categoria')
+        produto = Produto.objects.create(
+            nome='Produto', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+            categoria=categoria, quantidade=1
+        )
+        Produto.objects.filter(id=produto.id).update(imagem_principal='produtos/original.png')
+        produto.refresh_from_db()
+
+        with mock.patch.object(imagens, 'agendar') as agendar:
+            produto.quantidade = 2
+            produto.save(update_fields=['quantidade'])
+        agendar.assert_called_once_with(produto.id, ['principal'])
+
+
+class SlugsTests(TestCase):
+    """Só slugs base e base-<número> são considerados ocupados"""
+
+    def test_slugs_ocupados(self):
+        categoria = Categoria.objects.create(nome='Categoria')
+        for slug in ['mouse', 'mouse-2', 'mouse-sem-fio', 'mouse-sem-fio-1', 'mousepad']:
+            Produto.objects.create(
+                nome=slug, slug=slug, descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=categoria, quantidade=1
+            )
+        self.assertEqual(slugs_ocupados(['mouse']), {'mouse', 'mouse-2'})
+        self.assertEqual(alocar_slug('Mouse'), 'mouse-1')
+        self.assertEqual(alocar_slug('Mouse sem fio'), 'mouse-sem-fio-2')
+
+
+class AvaliacoesTests(TestCase):
+    """Agregados de avaliações: média arredondada no banco e reparo por recalcular()"""
+
+    def setUp(self):
+        cache.clear()
+        categoria = Categoria.objects.create(nome='Categoria')
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Produto {i}', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=categoria, quantidade=1
+            )
+            for i in range(3)
+        ]
+        self.usuarios = [
+            Usuario.objects.create_user(email=f'avaliador{i}@teste.com', nome='Teste', senha='Senha@123')
+            for i in range(3)
+        ]
+
+    def avaliar_todos(self, notas):
+        for produto in self.produtos:
+            for usuario, nota in zip(self.usuarios, notas):
+                avaliacoes.avaliar(produto.id, usuario, nota)
+
+    def medias_gravadas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT avaliacao_media FROM produtos')
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def test_media_gravada_arredondada(self):
+        self.avaliar_todos([4, 3, 3])
+        for media in self.medias_gravadas():
+            self.assertEqual(Decimal(str(media)), Decimal('3.33'))
+
+        produto = Produto.objects.get(id=self.produtos[0].id)
+        self.assertEqual((produto.soma_avaliacoes, produto.total_avaliacoes), (10, 3))
+        self.assertEqual(produto.avaliacao_media, Decimal('3.33'))
+
+        # Nova nota do mesmo usuário só troca a diferença
+        avaliacoes.avaliar(produto.id, self.usuarios[0], 1)
+        produto.refresh_from_db()
+        self.assertEqual((produto.soma_avaliacoes, produto.total_avaliacoes), (7, 3))
+        self.assertEqual(produto.avaliacao_media, Decimal('2.33'))
+
+    def test_cursor_por_media_percorre_todos(self):
+        self.avaliar_todos([4, 3, 3])
+        client = APIClient()
+        url = '/api/produtos/produtos/?cursor=&ordering=-avaliacao_media&page_size=1'
+        vistos = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(produto['id'] for produto in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(vistos), sorted(str(produto.id) for produto in self.produtos))
+        self.assertEqual(len(vistos), client.get('/api/produtos/produtos/').data['count'])
+
+    def test_recalcular_corrige_divergencias(self):
+        self.avaliar_todos([5, 4])
+        # Nota alterada sem passar por avaliar() e agregados zerados
+        Avaliacao.objects.filter(produto=self.produtos[0], usuario=self.usuarios[1]).update(nota=1)
+        Produto.objects.filter(id=self.produtos[1].id).update(soma_avaliacoes=0, total_avaliacoes=0)
+
+        self.assertEqual(avaliacoes.recalcular(tamanho_lote=2), 2)
+        agregados = dict(
+            (produto_id, (soma, total, media))
+            for produto_id, soma, total, media in Produto.objects.values_list(
+                'id', 'soma_avaliacoes', 'total_avaliacoes', 'avaliacao_media'
+            )
+        )
+        self.assertEqual(agregados[self.produtos[0].id], (6, 2, Decimal('3.00')))
+        self.assertEqual(agregados[self.produtos[1].id], (9, 2, Decimal('4.50')))
+        self.assertEqual(avaliacoes.recalcular(), 0)
+
+
+class PaginacaoCursorTests(TestCase):
+    """Modo cursor (keyset): ordem total por (campo, id) e recusa na busca por relevância"""
+
+    def setUp(self):
+        cache.clear()
+        categoria = Categoria.objects.create(nome='Categoria')
+        # Preços repetidos: o desempate fica com o id
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Notebook {i}', descricao='Descrição', marca='Marca', preco=Decimal(10 + i % 3),
+                categoria=categoria, quantidade=1
+            )
+            for i in range(7)
+        ]
+        self.client = APIClient()
+
+    def percorrer(self, url):
+        vistos = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            vistos.extend(produto['id'] for produto in response.data['results'])
+            url = response.data['next']
+        return vistos
+
+    def test_percorre_com_empates(self):
+        ordenados = sorted(self.produtos, key=lambda produto: (produto.preco, produto.id))
+        esperado = [str(produto.id) for produto in ordenados]
+        self.assertEqual(self.percorrer('/api/produtos/produtos/?cursor=&ordering=preco&page_size=2'), esperado)
+        self.assertEqual(
+            self.percorrer('/api/produtos/produtos/?cursor=&ordering=-preco&page_size=3'),
+            list(reversed(esperado))
+        )
+
+    def test_ordenacao_padrao_e_cursor_invalido(self):
+        vistos = self.percorrer('/api/produtos/produtos/?cursor=&page_size=2')
+        self.assertEqual(sorted(vistos), sorted(str(produto.id) for produto in self.produtos))
+        self.assertEqual(self.client.get('/api/produtos/produtos/?cursor=invalido').status_code, 404)
+
+    def test_busca_por_relevancia_recusa_cursor(self):
+        response = self.client.get('/api/produtos/buscar/?q=notebook&cursor=')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+        response = self.client.get('/api/produtos/buscar/?q=notebook&page_size=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 7)
+        # Sem termo não há ranking: o cursor continua disponível
+        self.assertEqual(len(self.percorrer('/api/produtos/buscar/?cursor=&ordering=preco&page_size=4')), 7)
+
+
+class VisualizacoesTests(TestCase):
+    """Buffer de visualizações: deltas acumulados e gravados em UPDATEs agrupados"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nome='Categoria')
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Produto {i}', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=categoria, quantidade=1
+            )
+            for i in range(3)
+        ]
+        # Intervalo longo: a thread de fundo não descarrega durante o teste
+        self.contador = visualizacoes.ContadorVisualizacoes(intervalo=3600)
+        self.addCleanup(self.contador.parar)
+
+    def visualizacoes(self):
+        return dict(Produto.objects.values_list('id', 'visualizacoes'))
+
+    def updates(self, contexto):
+        return [consulta['sql'] for consulta in contexto.captured_queries if consulta['sql'].startswith('UPDATE')]
+
+    def test_descarrega_em_um_update(self):
+        produto = self.produtos[0]
+        for _ in range(25):
+            self.contador.registrar(produto.id)
+        self.assertEqual(self.contador.pendentes(), 25)
+        self.assertEqual(self.visualizacoes()[produto.id], 0)
+
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.contador.descarregar(), 25)
+        self.assertEqual(len(self.updates(contexto)), 1)
+        self.assertEqual(self.visualizacoes()[produto.id], 25)
+        self.assertEqual(self.contador.pendentes(), 0)
+
+    def test_agrupa_produtos_com_o_mesmo_incremento(self):
+        for produto, quantidade in zip(self.produtos, [2, 2, 5]):
+            for _ in range(quantidade):
+                self.contador.registrar(produto.id)
+
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.contador.descarregar(), 9)
+        self.assertEqual(len(self.updates(contexto)), 2)
+        self.assertEqual(list(self.visualizacoes().values()).count(2), 2)
+        self.assertEqual(self.visualizacoes()[self.produtos[2].id], 5)
+
+    def test_erro_mantem_no_buffer(self):
+        for _ in range(4):
+            self.contador.registrar(self.produtos[0].id)
+        with mock.patch.object(visualizacoes.transaction, 'atomic', side_effect=OperationalError('database is locked')):
+            self.assertEqual(self.contador.descarregar(), 0)
+        self.assertEqual(self.contador.pendentes(), 4)
+        self.assertEqual(self.contador.descarregar(), 4)
+        self.assertEqual(self.visualizacoes()[self.produtos[0].id], 4)
+
+    @override_settings(PRODUTOS_VISUALIZACOES_BUFFER=False)
+    def test_sem_buffer_grava_na_hora(self):
+        produto = self.produtos[0]
+        pendentes = visualizacoes.contador.pendentes()
+        with self.assertNumQueries(1):
+            visualizacoes.registrar_visualizacao(produto.id)
+        self.assertEqual(self.visualizacoes()[produto.id], 1)
+        self.assertEqual(visualizacoes.contador.pendentes(), pendentes)
+
+
+class CacheDetalheTests(TestCase):
+    """Payload de detalhe em cache, invalidado por versão após o commit"""
+
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nome='Informática')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto = Produto.objects.create(
+                nome='Notebook', descricao='Descrição', marca='Marca', preco=Decimal('10.00'),
+                categoria=self.categoria, quantidade=1
+            )
+        self.url = f'/api/produtos/produtos/{self.produto.id}/'
+        self.client = APIClient()
+        # Visualizações do retrieve ficam no buffer do processo: gravadas ainda no banco de teste
+        self.addCleanup(visualizacoes.contador.descarregar)
+
+    def detalhe(self):
+        response = self.client.get(self.url)
+        return response.status_code, response.data
+
+    def test_cache_sem_consultas_ao_produto(self):
+        cache_detalhe.obter_payload(self.produto.id)
+        with self.assertNumQueries(0):
+            dados = cache_detalhe.obter_payload(self.produto.id)
+        self.assertEqual(dados['nome'], 'Notebook')
+
+        self.detalhe()
+        with CaptureQueriesContext(connection) as contexto:
+            status_code, _ = self.detalhe()
+        self.assertEqual(status_code, 200)
+        self.assertFalse([consulta for consulta in contexto.captured_queries if 'produtos' in consulta['sql']])
+
+    def test_save_do_produto_invalida(self):
+        self.detalhe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto.nome = 'Notebook Pro'
+            self.produto.save()
+        self.assertEqual(self.detalhe()[1]['nome'], 'Notebook Pro')
+
+    def test_renomear_categoria_invalida(self):
+        self.detalhe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria.nome = 'Computadores'
+            self.categoria.save()
+        self.assertEqual(self.detalhe()[1]['categoria']['nome'], 'Computadores')
+
+    def test_despublicar_invalida(self):
+        self.assertEqual(self.detalhe()[0], 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto.publicado = False
+            self.produto.save()
+        self.assertEqual(self.detalhe()[0], 404)
+
+    def test_invalidacao_so_apos_o_commit(self):
+        self.detalhe()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.produto.nome = 'Notebook Pro'
+            self.produto.save()
+        # Antes do commit a versão é a mesma: a entrada antiga continua válida
+        self.assertEqual(cache_detalhe.obter_payload(self.produto.id)['nome'], 'Notebook')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache_detalhe.obter_payload(self.produto.id)['nome'], 'Notebook Pro')
+
+
+class HistoricoPrecosTests(TestCase):
+    """Série de preços: cursor no modo bruto e OHLC de dias consolidados mais dias recentes"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nome='Categoria')
+        self.produto = Produto.objects.create(
+            nome='Notebook', descricao='Descrição', marca='Marca', preco=Decimal('85.00'),
+            categoria=categoria, quantidade=1
+        )
+        ProdutoHistoricoPreco.objects.filter(produto=self.produto).delete()
+        self.hoje = timezone.localdate()
+        self.segunda = self.hoje - timedelta(days=self.hoje.weekday() + 14)
+        self.url = f'/api/produtos/produtos/{self.produto.id}/historico-precos/'
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Usuario.objects.create_superuser(email='admin@teste.com', nome='Admin', senha='Senha@123')
+        )
+
+    def registrar(self, dia, hora, preco_antigo, preco_novo):
+        linha = ProdutoHistoricoPreco.objects.create(
+            produto=self.produto, preco_antigo=Decimal(preco_antigo), preco_novo=Decimal(preco_novo)
+        )
+        # data_alteracao é auto_now_add: a data do teste entra por update
+        quando = historico.inicio_do_dia(dia) + timedelta(hours=hora)
+        ProdutoHistoricoPreco.objects.filter(pk=linha.pk).update(data_alteracao=quando)
+
+    def registrar_serie(self):
+        self.registrar(self.segunda, 10, 0, 100)
+        self.registrar(self.segunda, 12, 100, 80)
+        self.registrar(self.segunda + timedelta(days=1), 10, 80, 120)
+        self.registrar(self.segunda + timedelta(days=7), 10, 120, 90)
+        self.registrar(self.segunda + timedelta(days=8), 10, 0, 0)
+        self.assertEqual(historico.consolidar(), 3)
+        # Dias depois da consolidação: agregados do histórico bruto
+        self.registrar(self.hoje, 0, 90, 95)
+        self.registrar(self.hoje, 1, 95, 85)
+
+    def serie(self, resolucao):
+        response = self.client.get(f'{self.url}?resolucao={resolucao}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('next', response.data)
+        return [
+            (ponto['periodo'], ponto['abertura'], ponto['maxima'], ponto['minima'],
+             ponto['fechamento'], ponto['alteracoes'])
+            for ponto in response.data['results']
+        ]
+
+    def test_agregar_ignora_linhas_sem_preco(self):
+        agora = timezone.now()
+        linhas = [
+            (1, agora, Decimal('0'), Decimal('0')),
+            (1, agora, None, None),
+            (1, agora, Decimal('0'), Decimal('50')),
+            (2, agora, Decimal('0'), Decimal('0')),
+        ]
+        self.assertEqual(
+            list(historico.agregar_por_dia(linhas)),
+            [(1, timezone.localdate(agora), Decimal('50'), Decimal('50'), Decimal('50'), Decimal('50'), 1)]
+        )
+
+    def test_serie_diaria_junta_consolidado_e_recente(self):
+        self.registrar_serie()
+        self.assertEqual(self.serie('diario'), [
+            (self.segunda.isoformat(), '100.00', '100.00', '80.00', '80.00', 2),
+            ((self.segunda + timedelta(days=1)).isoformat(), '80.00', '120.00', '80.00', '120.00', 1),
+            ((self.segunda + timedelta(days=7)).isoformat(), '120.00', '120.00', '90.00', '90.00', 1),
+            (self.hoje.isoformat(), '90.00', '95.00', '85.00', '85.00', 2),
+        ])
+
+    def test_serie_semanal(self):
+        self.registrar_serie()
+        segunda_atual = self.hoje - timedelta(days=self.hoje.weekday())
+        self.assertEqual(self.serie('semanal'), [
+            (self.segunda.isoformat(), '100.00', '120.00', '80.00', '120.00', 3),
+            ((self.segunda + timedelta(days=7)).isoformat(), '120.00', '120.00', '90.00', '90.00', 1),
+            (segunda_atual.isoformat(), '90.00', '95.00', '85.00', '85.00', 2),
+        ])
+
+    def test_bruto_percorre_por_cursor(self):
+        for hora in range(5):
+            self.registrar(self.hoje, hora, 10 + hora, 11 + hora)
+        # Empate de data_alteracao: o desempate fica com o id
+        self.registrar(self.hoje, 4, 20, 21)
+        esperado = [
+            str(pk) for pk in ProdutoHistoricoPreco.objects.order_by('-data_alteracao', '-id').values_list('id', flat=True)
+        ]
+
+        vistos = []
+        url = f'{self.url}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['resolucao'], 'bruto')
+            vistos.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(vistos, esperado)
+
+        # Campos lidos pela aba de histórico do template (data.results)
+        item = self.client.get(self.url).data['results'][0]
+        self.assertLessEqual({'data_alteracao', 'preco_antigo', 'preco_novo', 'alterado_por_nome'}, set(item))
+        self.assertEqual(self.client.get(f'{self.url}?cursor=invalido').status_code, 400)
+        self.assertEqual(self.client.get(f'{self.url}?resolucao=mensal').status_code, 400)
+
+
+class ImportacaoTests(TestCase):
+    """Importação em massa (comando e admin): upsert pelo SKU e índices atualizados ao final"""
+
+    CABECALHO = ['sku', 'nome', 'descricao', 'marca', 'preco', 'categoria']
+
+    def setUp(self):
+        cache.clear()
+        facetas.invalidar()
+        self.categoria = Categoria.objects.create(nome='Informática')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.existente = Produto.objects.create(
+                nome='Mouse', sku='SKU-1', descricao='Descrição', marca='Dell', preco=Decimal('100.00'),
+                categoria=self.categoria, quantidade=1
+            )
+        self.usuario = Usuario.objects.create_superuser(email='admin@teste.com', nome='Admin', senha='Senha@123')
+        # Índice de facetas já em cache antes da importação
+        self.assertEqual(facetas.obter_indice().facetar({})['total'], 1)
+
+    def linhas(self):
+        return [
+            ['SKU-1', 'Mouse', 'Descrição', 'Dell', '90,00', 'Informática'],
+            ['SKU-2', 'Mouse', 'Descrição', 'Logitech', '50,00', 'Informática'],
+            ['SKU-3', 'Mouse', 'Descrição', 'Logitech', '60', 'Informática'],
+        ]
+
+    def assertImportado(self):
+        self.assertEqual(Produto.objects.count(), 3)
+        atualizado = Produto.objects.get(sku='SKU-1')
+        self.assertEqual((atualizado.id, atualizado.preco, atualizado.slug), (self.existente.id, Decimal('90.00'), 'mouse'))
+
+        # Slugs distintos entre si e do produto existente, mesmo com o mesmo nome
+        self.assertEqual(
+            sorted(Produto.objects.values_list('slug', flat=True)), ['mouse', 'mouse-1', 'mouse-2']
+        )
+
+        historico_importado = ProdutoHistoricoPreco.objects.filter(alterado_por=self.usuario)
+        self.assertEqual(
+            sorted(historico_importado.values_list('produto__sku', 'preco_antigo', 'preco_novo')),
+            [('SKU-1', Decimal('100.00'), Decimal('90.00')),
+             ('SKU-2', Decimal('0.00'), Decimal('50.00')),
+             ('SKU-3', Decimal('0.00'), Decimal('60.00'))]
+        )
+
+        # bulk_create/bulk_update não disparam os sinais por produto
+        estatisticas = ProdutoEstatisticas.objects.get(pk=1)
+        self.assertEqual(estatisticas.total_produtos, 3)
+        # Produtos novos sem coluna de quantidade entram sem estoque
+        self.assertEqual((estatisticas.produtos_sem_estoque, estatisticas.valor_total_estoque), (2, Decimal('90.00')))
+        indice = facetas.obter_indice()
+        self.assertEqual(indice.facetar({})['total'], 3)
+        self.assertEqual(indice.facetar({'marca': ['logitech']})['total'], 2)
+
+    def test_comando_faz_upsert_pelo_sku(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'produtos.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                for linha in [self.CABECALHO, *self.linhas(), ['SKU-4', '', '', '', '', '']]:
+                    arquivo.write(';'.join(linha) + '\n')
+            with self.captureOnCommitCallbacks(execute=True):
+                resultado = importacao.importar(caminho, workers=1, usuario=self.usuario)
+
+        self.assertEqual(
+            (resultado.lidas, resultado.criados, resultado.atualizados, resultado.invalidas), (4, 2, 1, 1)
+        )
+        self.assertIn('Linha 5', resultado.erros[0])
+        self.assertImportado()
+
+    def test_simulacao_nao_grava(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'produtos.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                for linha in [self.CABECALHO, *self.linhas()]:
+                    arquivo.write(','.join(linha).replace('90,00', '90.00').replace('50,00', '50.00') + '\n')
+            resultado = importacao.importar(caminho, workers=1, simular=True)
+
+        self.assertEqual((resultado.criados, resultado.atualizados), (2, 1))
+        self.assertEqual(Produto.objects.count(), 1)
+        self.assertEqual(Produto.objects.get().preco, Decimal('100.00'))
+
+    def test_recurso_do_admin_faz_upsert_pelo_sku(self):
+        dados = tablib.Dataset(headers=self.CABECALHO)
+        for linha in self.linhas():
+            dados.append([linha[0], linha[1], linha[2], linha[3], linha[4].replace(',', '.'), linha[5]])
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = ProdutoResource().import_data(dados, raise_errors=True, user=self.usuario)
+
+        self.assertFalse(resultado.has_errors())
+        self.assertEqual((resultado.totals['new'], resultado.totals['update']), (2, 1))
+        self.assertImportado()
@@ -26,6 +26,7 @@ extra_urlpatterns = [
     path('meus-favoritos/', views.ProdutoViewSet.as_view({'get': 'meus_favoritos'}), name='meus-favoritos'),
     path('<uuid:pk>/favoritar/', views.ProdutoViewSet.as_view({'post': 'favoritar'}), name='produto-favoritar'),
     path('<uuid:pk>/desfavoritar/', views.ProdutoViewSet.as_view({'delete': 'desfavoritar'}), name='produto-desfavoritar'),
+    path('<uuid:pk>/avaliar/', views.ProdutoViewSet.as_view({'post': 'avaliar'}), name='produto-avaliar'),
     path('<uuid:pk>/historico-precos/', views.ProdutoViewSet.as_view({'get': 'historico_precos'}), name='produto-historico-precos'),
 ]
 
@@ -3,26 +3,47 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, F, Count, Sum, Avg, Min, Max
+from django.db.models import Q, F, Count, Sum, Avg, Min, Max, Prefetch
 from django.db import transaction
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
 from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
+import base64
+from datetime import datetime, time
+import json
 import logging
+import uuid
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from categorias.models import Categoria
-from produtos.models import Produto, Favorito, ProdutoHistoricoPreco
+from produtos.models import Produto, Favorito
+from produtos.busca import filtrar_por_parametros
+from produtos import facetas
+from produtos import estatisticas as estatisticas_produtos
+from produtos.lote import ACOES as ACOES_EM_LOTE, atualizar_em_lote
+from produtos import avaliacoes, cache_detalhe
+from produtos import exportacao
+from produtos import historico as historico_precos
+from produtos.condicional import RespostaCondicionalMixin, gerar_etag, timestamp
+from produtos.visualizacoes import registrar_visualizacao
+from midia.uploads import UploadImagemMixin
 from produtos.serializers import (
     ProdutoSerializer,
     ProdutoListSerializer,
     ProdutoCreateUpdateSerializer,
     FavoritoSerializer,
     FavoritoCreateSerializer,
-    ProdutoHistoricoPrecoSerializer,
+    AvaliacaoSerializer,
+    AvaliacaoCreateSerializer,
     ProdutoEstatisticasSerializer
 )
 from categorias.models import Categoria
@@ -31,13 +52,111 @@ logger = logging.getLogger(__name__)
 
 
 class ProdutoPagination(PageNumberPagination):
+    """
+    Paginação por número de página, com modo cursor (keyset) opcional.
+    
+    Com ?cursor= na query string a página é buscada por
+    (campo de ordenação, id) em vez de OFFSET, sem COUNT(*). O desempate por
+    id mantém a ordem total entre itens com o mesmo valor.
+    
+    Resultados ordenados por relevância (busca textual) não têm um campo
+    estável para o cursor: nesse caso ?cursor= é recusado com 400.
+    """
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
     page_query_param = 'page'
+    
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    cursor_ordering_fields = ['data_criacao', 'preco', 'avaliacao_media', 'visualizacoes']
+    cursor_ordering_padrao = '-data_criacao'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.modo_cursor = self.cursor_query_param in request.query_params
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        if self.ordenado_por_relevancia(queryset):
+            raise ValidationError({
+                self.cursor_query_param: 'Paginação por cursor indisponível na busca por relevância; use page.'
+            })
+        return self.paginar_por_cursor(queryset, request)
+    
+    def ordenado_por_relevancia(self, queryset):
+        return any(str(campo).lstrip('-') == 'relevancia' for campo in queryset.query.order_by)
+    
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.proximo_link,
+            'results': data
+        })
+    
+    def get_ordenacao_cursor(self, queryset, request):
+        """Ordenação do cursor: parâmetro ?ordering= se permitido e existente no modelo"""
+        ordenacao = request.query_params.get(self.ordering_query_param, self.cursor_ordering_padrao)
+        campo = ordenacao.lstrip('-')
+        if campo not in self.cursor_ordering_fields:
+            return self.cursor_ordering_padrao
+        try:
+            queryset.model._meta.get_field(campo)
+        except FieldDoesNotExist:
+            return self.cursor_ordering_padrao
+        return ordenacao
+    
+    def codificar_cursor(self, ordenacao, valor, pk):
+        dados = {'o': ordenacao, 'v': valor.isoformat() if hasattr(valor, 'isoformat') else str(valor), 'id': str(pk)}
+        return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode()
+    
+    def decodificar_cursor(self, cursor, queryset):
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            ordenacao = dados['o']
+            campo = queryset.model._meta.get_field(ordenacao.lstrip('-'))
+            if campo.name not in self.cursor_ordering_fields:
+                raise ValueError(ordenacao)
+            valor = campo.to_python(dados['v'])
+            pk = queryset.model._meta.pk.to_python(dados['id'])
+        except (ValueError, TypeError, KeyError, FieldDoesNotExist, DjangoValidationError):
+            raise NotFound('Cursor inválido')
+        return ordenacao, valor, pk
+    
+    def paginar_por_cursor(self, queryset, request):
+        self.request = request
+        self.page_size_atual = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        
+        if cursor:
+            ordenacao, valor, pk = self.decodificar_cursor(cursor, queryset)
+        else:
+            ordenacao, valor, pk = self.get_ordenacao_cursor(queryset, request), None, None
+        
+        campo = ordenacao.lstrip('-')
+        descendente = ordenacao.startswith('-')
+        if valor is not None:
+            operador = 'lt' if descendente else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{campo}__{operador}': valor}) |
+                Q(**{campo: valor, f'pk__{operador}': pk})
+            )
+        prefixo = '-' if descendente else ''
+        queryset = queryset.order_by(f'{prefixo}{campo}', f'{prefixo}pk')
+        
+        resultados = list(queryset[:self.page_size_atual + 1])
+        self.proximo_link = None
+        if len(resultados) > self.page_size_atual:
+            resultados = resultados[:self.page_size_atual]
+            ultimo = resultados[-1]
+            self.proximo_link = replace_query_param(
+                request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.codificar_cursor(ordenacao, getattr(ultimo, campo), ultimo.pk)
+            )
+        return resultados
 
 
-class ProdutoViewSet(viewsets.ModelViewSet):
+class ProdutoViewSet(UploadImagemMixin, RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Produto.objects.filter(deleted=False)
     pagination_class = ProdutoPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -46,10 +165,11 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     ordering_fields = ['nome', 'preco', 'preco_promocional', 'data_criacao', 'avaliacao_media', 'visualizacoes']
     ordering = ['-data_criacao']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    acoes_upload_imagem = ('upload_imagem', 'create', 'update', 'partial_update')
     
     def get_queryset(self):
         """Retorna queryset baseado nas permissões"""
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().para_listagem()
         
         # Usuários não autenticados só veem produtos publicados
         if not self.request.user.is_authenticated:
@@ -66,9 +186,9 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         """Define permissões baseadas na ação"""
         if self.action in ['list', 'retrieve', 'search', 'filter_products', 'categorias', 'destaques', 'promocoes']:
             return [AllowAny()]
-        elif self.action in ['create', 'destroy', 'bulk_update', 'estatisticas', 'historico_precos']:
+        elif self.action in ['create', 'destroy', 'bulk_update', 'estatisticas', 'historico_precos', 'exportar']:
             return [IsAdminUser()]
-        elif self.action in ['favoritar', 'desfavoritar', 'meus_favoritos', 'upload_imagem']:
+        elif self.action in ['favoritar', 'desfavoritar', 'meus_favoritos', 'upload_imagem', 'avaliar']:
             return [IsAuthenticated()]
         return [IsAuthenticated()]
     
@@ -86,16 +206,59 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
     
+    def get_favoritos_context(self, favoritos):
+        """Contexto para FavoritoSerializer com is_favorito já resolvido (sem consultas extras)"""
+        context = self.get_serializer_context()
+        context['favoritos'] = {favorito.produto_id: True for favorito in favoritos}
+        return context
+    
     def retrieve(self, request, *args, **kwargs):
-        """Detalhes do produto com incremento de visualizações"""
-        instance = self.get_object()
+        """Detalhes do produto (payload em cache) com incremento de visualizações"""
+        try:
+            produto_id = uuid.UUID(str(kwargs[self.lookup_field]))
+        except ValueError:
+            raise NotFound('Produto não encontrado')
+        
+        dados = cache_detalhe.obter_payload(produto_id)
+        
+        # Mesma visibilidade de get_queryset: não publicados só para admin
+        if not dados['publicado'] and not request.user.is_staff:
+            raise NotFound('Produto não encontrado')
+        
+        is_favorito = request.user.is_authenticated and Favorito.objects.filter(
+            usuario=request.user,
+            produto_id=produto_id
+        ).exists()
         
         # Incrementar visualizações (apenas para usuários não-admin)
         if not request.user.is_staff:
-            instance.incrementar_visualizacoes()
+            registrar_visualizacao(produto_id)
         
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        # Validadores a partir dos timestamps do payload, antes de montar a resposta
+        categoria = dados['categoria'] or {}
+        etag = gerar_etag(
+            dados['id'], dados['data_atualizacao'], categoria.get('atualizado_em'),
+            categoria.get('quantidade_produtos'), is_favorito
+        )
+        ultima_modificacao = timestamp(
+            parse_datetime(dados['data_atualizacao']),
+            parse_datetime(categoria['atualizado_em']) if categoria else None
+        )
+        
+        def gerar_resposta():
+            resposta = cache_detalhe.aplicar_requisicao(dados, request, is_favorito)
+            if not request.user.is_staff:
+                resposta['visualizacoes'] += 1
+            return Response(resposta)
+        
+        return self.responder_condicional(request, etag, ultima_modificacao, gerar_resposta)
+    
+    # O contador de visualizações não altera data_atualizacao
+    ordenacoes_sem_condicional = ('visualizacoes',)
+
+    def agregados_condicionais(self):
+        # Nome da categoria aparece nas listagens
+        return {'categoria_modificacao': Max('categoria__atualizado_em')}
     
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -144,52 +307,7 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='buscar')
     def search(self, request):
         """Busca avançada de produtos"""
-        query = request.GET.get('q', '').strip()
-        categoria_id = request.GET.get('categoria_id')
-        min_preco = request.GET.get('min_preco')
-        max_preco = request.GET.get('max_preco')
-        marca = request.GET.get('marca')
-        estado = request.GET.get('estado')
-        destaque = request.GET.get('destaque')
-        em_promocao = request.GET.get('em_promocao')
-        
-        produtos = self.get_queryset()
-        
-        # Aplicar filtros
-        if query:
-            produtos = produtos.filter(
-                Q(nome__icontains=query) |
-                Q(descricao__icontains=query) |
-                Q(marca__icontains=query) |
-                Q(sku__icontains=query)
-            )
-        
-        if categoria_id:
-            produtos = produtos.filter(categoria_id=categoria_id)
-        
-        if min_preco:
-            try:
-                produtos = produtos.filter(preco__gte=float(min_preco))
-            except ValueError:
-                pass
-        
-        if max_preco:
-            try:
-                produtos = produtos.filter(preco__lte=float(max_preco))
-            except ValueError:
-                pass
-        
-        if marca:
-            produtos = produtos.filter(marca__iexact=marca)
-        
-        if estado:
-            produtos = produtos.filter(estado=estado)
-        
-        if destaque is not None:
-            produtos = produtos.filter(destaque=destaque.lower() == 'true')
-        
-        if em_promocao is not None:
-            produtos = produtos.filter(em_promocao=em_promocao.lower() == 'true')
+        produtos = filtrar_por_parametros(self.get_queryset(), request.GET)
         
         # Paginação
         page = self.paginate_queryset(produtos)
@@ -202,29 +320,29 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='filter')
     def filter_products(self, request):
-        """Filtros avançados com opções disponíveis"""
-        # Obter opções únicas para filtros
-        marcas = Produto.objects.filter(
-            publicado=True, deleted=False
-        ).values_list('marca', flat=True).distinct().order_by('marca')
-        
-        estados = Produto.objects.filter(
-            publicado=True, deleted=False
-        ).values_list('estado', flat=True).distinct().order_by('estado')
-        
-        # Preços mínimo e máximo
-        preco_stats = Produto.objects.filter(
-            publicado=True, deleted=False
-        ).aggregate(
-            min_preco=Min('preco'),
-            max_preco=Max('preco')
+        """
+        Facetas do catálogo para os filtros atuais: contagem por categoria, marca,
+        estado, destaque e promoção, histograma por faixa de preço e faixa min/max.
+        Calculadas a partir do índice de bitmaps (produtos.facetas), sem varrer a tabela.
+        """
+        filtros, min_preco, max_preco = facetas.ler_filtros(request.query_params)
+        resultado = facetas.obter_indice().facetar(filtros, min_preco, max_preco)
+        
+        # Nomes das categorias presentes nas facetas
+        categorias = resultado['facetas']['categoria']
+        nomes = dict(
+            Categoria.objects.filter(
+                id__in=[item['valor'] for item in categorias]
+            ).values_list('id', 'nome')
         )
+        for item in categorias:
+            item['nome'] = nomes.get(uuid.UUID(item['valor']))
         
-        return Response({
-            'marcas': list(marcas),
-            'estados': list(estados),
-            'faixa_preco': preco_stats
-        })
+        # Chaves mantidas por compatibilidade com o front-end
+        resultado['marcas'] = sorted(item['valor'] for item in resultado['facetas']['marca'])
+        resultado['estados'] = sorted(item['valor'] for item in resultado['facetas']['estado'])
+        
+        return Response(resultado)
     
     @action(detail=False, methods=['get'], url_path='destaques')
     def destaques(self, request):
@@ -294,7 +412,7 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         
         return Response({
             'mensagem': mensagem,
-            'favorito': FavoritoSerializer(favorito).data
+            'favorito': FavoritoSerializer(favorito, context=self.get_favoritos_context([favorito])).data
         }, status=status_code)
     
     @action(detail=True, methods=['delete'], url_path='desfavoritar')
@@ -320,16 +438,43 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='meus-favoritos')
     def meus_favoritos(self, request):
         """Listar favoritos do usuário"""
-        favoritos = Favorito.objects.filter(usuario=request.user).select_related('produto')
+        favoritos = Favorito.objects.filter(usuario=request.user).prefetch_related(
+            Prefetch('produto', queryset=Produto.objects.para_listagem())
+        )
         
         page = self.paginate_queryset(favoritos)
         if page is not None:
-            serializer = FavoritoSerializer(page, many=True)
+            serializer = FavoritoSerializer(page, many=True, context=self.get_favoritos_context(page))
             return self.get_paginated_response(serializer.data)
         
-        serializer = FavoritoSerializer(favoritos, many=True)
+        serializer = FavoritoSerializer(favoritos, many=True, context=self.get_favoritos_context(favoritos))
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], url_path='avaliar')
+    def avaliar(self, request, pk=None):
+        """Registrar (ou atualizar) a avaliação do usuário para o produto"""
+        produto = self.get_object()
+        
+        serializer = AvaliacaoCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        avaliacao, created = avaliacoes.avaliar(
+            produto.id,
+            request.user,
+            serializer.validated_data['nota'],
+            serializer.validated_data.get('comentario', '')
+        )
+        agregados = Produto.objects.filter(id=produto.id).values('avaliacao_media', 'total_avaliacoes').first()
+        
+        logger.info(f'Produto avaliado: {produto.nome} por {request.user.email} (nota {avaliacao.nota})')
+        
+        return Response({
+            'mensagem': 'Avaliação registrada' if created else 'Avaliação atualizada',
+            'avaliacao': AvaliacaoSerializer(avaliacao).data,
+            'avaliacao_media': str(agregados['avaliacao_media']),
+            'total_avaliacoes': agregados['total_avaliacoes']
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'], url_path='upload-imagem')
     def upload_imagem(self, request, pk=None):
         """Upload de imagem para produto"""
@@ -342,18 +487,7 @@ class ProdutoViewSet(viewsets.ModelViewSet):
                 'erro': 'Nenhuma imagem enviada'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Validar tipo de arquivo
-        extensoes_validas = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-        if not any(imagem.name.lower().endswith(ext) for ext in extensoes_validas):
-            return Response({
-                'erro': f'Formato de imagem inválido. Use: {", ".join(extensoes_validas)}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Validar tamanho (max 10MB)
-        if imagem.size > 10 * 1024 * 1024:
-            return Response({
-                'erro': 'Imagem muito grande. Tamanho máximo: 10MB'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        # Formato (magic bytes) e tamanho já validados durante o upload (midia.uploads)
         
         # Salvar imagem
         if tipo == 'secundaria':
@@ -363,68 +497,105 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         
         produto.save()
         
-        logger.info(f'Imagem {tipo} upload para produto: {produto.nome}')
+        logger.info(f'Imagem {tipo} upload para produto: {produto.nome} (sha256 {imagem.sha256})')
         
+        arquivo = produto.imagem_secundaria if tipo == 'secundaria' else produto.imagem_principal
         return Response({
             'mensagem': f'Imagem {tipo} salva com sucesso',
-            'url': request.build_absolute_uri(imagem.url) if hasattr(imagem, 'url') else None
+            'url': request.build_absolute_uri(arquivo.url)
         }, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'], url_path='historico-precos')
     def historico_precos(self, request, pk=None):
-        """Histórico de preços do produto"""
+        """
+        Histórico de preços do produto.
+        
+        Parâmetros: inicio/fim (data ou data e hora ISO) e resolucao:
+        - bruto (padrão): alterações, mais recentes primeiro, paginadas por cursor
+        - diario / semanal: série OHLC consolidada (ver produtos.historico)
+        """
         produto = self.get_object()
-        historico = ProdutoHistoricoPreco.objects.filter(produto=produto).order_by('-data_alteracao')
+        resolucao = request.GET.get('resolucao', 'bruto')
+        if resolucao not in historico_precos.RESOLUCOES:
+            return Response({
+                'erro': f'Resolução inválida. Opções: {", ".join(historico_precos.RESOLUCOES)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = ProdutoHistoricoPrecoSerializer(historico, many=True)
-        return Response(serializer.data)
+        try:
+            inicio = self._ler_data(request.GET.get('inicio'))
+            fim = self._ler_data(request.GET.get('fim'), fim_do_dia=True)
+        except ValueError:
+            return Response({
+                'erro': 'Datas inválidas. Use o formato AAAA-MM-DD ou data e hora ISO 8601'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if resolucao != 'bruto':
+            return Response({
+                'resolucao': resolucao,
+                'results': historico_precos.serie(produto.id, resolucao, inicio, fim)
+            })
+        
+        try:
+            tamanho = min(
+                int(request.GET.get('page_size', historico_precos.TAMANHO_PAGINA)),
+                historico_precos.TAMANHO_PAGINA_MAXIMO
+            )
+            itens, cursor = historico_precos.pagina_bruta(
+                produto.id, inicio, fim, request.GET.get('cursor'), max(tamanho, 1)
+            )
+        except ValueError:
+            return Response({'erro': 'Cursor ou tamanho de página inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'resolucao': resolucao,
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', cursor) if cursor else None,
+            'results': itens
+        })
+    
+    @staticmethod
+    def _ler_data(valor, fim_do_dia=False):
+        """Data/hora de um parâmetro; datas sem hora cobrem o dia inteiro"""
+        if not valor:
+            return None
+        data_hora = parse_datetime(valor)
+        if data_hora is None:
+            dia = parse_date(valor)
+            if dia is None:
+                raise ValueError(valor)
+            data_hora = datetime.combine(dia, time.max if fim_do_dia else time.min)
+        if timezone.is_naive(data_hora):
+            data_hora = timezone.make_aware(data_hora)
+        return data_hora
     
     @action(detail=False, methods=['get'], url_path='estatisticas')
     def estatisticas(self, request):
         """Estatísticas gerais dos produtos"""
-        cache_key = 'produtos_estatisticas'
-        estatisticas = cache.get(cache_key)
-        
-        if not estatisticas:
-            # Estatísticas básicas
-            total_produtos = Produto.objects.filter(deleted=False).count()
-            produtos_ativos = Produto.objects.filter(publicado=True, deleted=False).count()
-            produtos_em_promocao = Produto.objects.filter(em_promocao=True, publicado=True, deleted=False).count()
-            produtos_sem_estoque = Produto.objects.filter(quantidade=0, publicado=True, deleted=False).count()
-            
-            # Produtos por categoria
-            produtos_por_categoria = {}
-            categorias = Categoria.objects.filter(ativo=True, deletado=False)
-            for categoria in categorias:
-                count = Produto.objects.filter(
-                    categoria=categoria, 
-                    publicado=True, 
-                    deleted=False
-                ).count()
-                if count > 0:
-                    produtos_por_categoria[categoria.nome] = count
-            
-            # Valor total do estoque
-            valor_total_estoque = Produto.objects.filter(
-                publicado=True, deleted=False
-            ).aggregate(
-                total=Sum(F('preco') * F('quantidade'))
-            )['total'] or 0
-            
-            estatisticas = {
-                'total_produtos': total_produtos,
-                'produtos_ativos': produtos_ativos,
-                'produtos_em_promocao': produtos_em_promocao,
-                'produtos_sem_estoque': produtos_sem_estoque,
-                'produtos_por_categoria': produtos_por_categoria,
-                'valor_total_estoque': valor_total_estoque
-            }
-            
-            cache.set(cache_key, estatisticas, 60 * 15)  # Cache de 15 minutos
+        # Lido das tabelas materializadas, mantidas incrementalmente pelos sinais
+        estatisticas = estatisticas_produtos.ler()
         
         serializer = ProdutoEstatisticasSerializer(estatisticas)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='exportar')
+    def exportar(self, request):
+        """
+        Exporta o catálogo em fluxo (?formato=csv|ndjson|xlsx), com os mesmos
+        filtros da busca avançada. Inclui produtos não publicados.
+        """
+        formato = request.GET.get('formato', 'csv')
+        if formato not in exportacao.FORMATOS:
+            return Response({
+                'erro': f'Formato inválido. Opções: {", ".join(exportacao.FORMATOS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        produtos = filtrar_por_parametros(Produto.objects.filter(deleted=False), request.GET)
+        content_type, extensao = exportacao.FORMATOS[formato]
+        response = StreamingHttpResponse(exportacao.exportar(produtos, formato), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="produtos-{timezone.localdate():%Y%m%d}.{extensao}"'
+        
+        logger.info(f'Exportação de produtos ({formato}) por {request.user.email}')
+        return response
+    
     @action(detail=False, methods=['post'], url_path='bulk-update')
     def bulk_update(self, request):
         """Atualização em massa de produtos"""
@@ -436,28 +607,20 @@ class ProdutoViewSet(viewsets.ModelViewSet):
                 'erro': 'IDs dos produtos e ação são obrigatórios'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        produtos = Produto.objects.filter(id__in=produto_ids, deleted=False)
-        total_atualizados = 0
-        
-        with transaction.atomic():
-            for produto in produtos:
-                if acao == 'publicar':
-                    produto.publicado = True
-                elif acao == 'ocultar':
-                    produto.publicado = False
-                elif acao == 'destacar':
-                    produto.destaque = True
-                elif acao == 'remover_destaque':
-                    produto.destaque = False
-                elif acao == 'ativar_promocao':
-                    produto.em_promocao = True
-                elif acao == 'desativar_promocao':
-                    produto.em_promocao = False
-                else:
-                    continue
-                
-                produto.save()
-                total_atualizados += 1
+        if acao not in ACOES_EM_LOTE:
+            return Response({
+                'erro': f'Ação inválida. Opções: {", ".join(ACOES_EM_LOTE)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            produto_ids = [uuid.UUID(str(produto_id)) for produto_id in produto_ids]
+        except ValueError:
+            return Response({
+                'erro': 'IDs de produtos inválidos'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # UPDATEs por conjunto, em lotes; histórico e índices atualizados em massa
+        total_atualizados = atualizar_em_lote(produto_ids, acao, usuario=request.user)
         
         logger.info(f'Bulk update: {total_atualizados} produtos atualizados com ação "{acao}" por {request.user.email}')
         
@@ -0,0 +1,121 @@
+"""
+Contador de visualizações com escrita atrasada (write-behind).
+
+As visualizações são acumuladas em memória e gravadas periodicamente por uma
+thread de fundo, em UPDATEs agrupados do tipo ``visualizacoes = visualizacoes + n``.
+Nada se perde em um desligamento normal: o buffer é descarregado no atexit
+(gunicorn e runserver encerram os workers com sys.exit).
+
+Settings:
+- PRODUTOS_VISUALIZACOES_BUFFER: desativa o buffer quando False (UPDATE imediato)
+- PRODUTOS_VISUALIZACOES_INTERVALO: segundos entre descargas (padrão: 10)
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class ContadorVisualizacoes:
+    """Agregador de visualizações por processo, descarregado por uma thread de fundo"""
+
+    def __init__(self, intervalo=10):
+        self.intervalo = intervalo
+        self._pendentes = Counter()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._worker = None
+        self._pid = None
+
+    def registrar(self, produto_id, quantidade=1):
+        """Acumula visualizações de um produto"""
+        with self._lock:
+            self._garantir_worker()
+            self._pendentes[produto_id] += quantidade
+
+    def pendentes(self):
+        with self._lock:
+            return sum(self._pendentes.values())
+
+    def descarregar(self):
+        """Grava as visualizações acumuladas; em caso de erro, devolve-as ao buffer"""
+        from produtos.models import Produto
+
+        with self._lock:
+            if not self._pendentes:
+                return 0
+            pendentes, self._pendentes = self._pendentes, Counter()
+
+        # Um UPDATE por quantidade distinta, cobrindo todos os produtos com o mesmo incremento
+        por_quantidade = defaultdict(list)
+        for produto_id, quantidade in pendentes.items():
+            por_quantidade[quantidade].append(produto_id)
+
+        try:
+            with transaction.atomic():
+                for quantidade, ids in por_quantidade.items():
+                    for inicio in range(0, len(ids), 500):
+                        Produto.objects.filter(id__in=ids[inicio:inicio + 500]).update(
+                            visualizacoes=F('visualizacoes') + quantidade
+                        )
+        except Exception as e:
+            logger.error(f'Erro ao gravar visualizações, mantendo no buffer: {str(e)}')
+            with self._lock:
+                self._pendentes.update(pendentes)
+            return 0
+
+        total = sum(pendentes.values())
+        logger.debug(f'{total} visualizações gravadas para {len(pendentes)} produtos')
+        return total
+
+    def parar(self):
+        """Encerra a thread de fundo e descarrega o que restou no buffer"""
+        self._parar.set()
+        if self._worker and self._worker.is_alive() and self._worker is not threading.current_thread():
+            self._worker.join(timeout=self.intervalo)
+        self.descarregar()
+
+    def _garantir_worker(self):
+        # Após um fork o processo filho herda o buffer, mas não a thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pendentes = Counter()
+            self._parar = threading.Event()
+            self._worker = None
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._executar,
+                name='contador-visualizacoes',
+                daemon=True
+            )
+            self._worker.start()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.descarregar()
+            finally:
+                close_old_connections()
+
+
+contador = ContadorVisualizacoes(
+    intervalo=getattr(settings, 'PRODUTOS_VISUALIZACOES_INTERVALO', 10)
+)
+atexit.register(contador.parar)
+
+
+def registrar_visualizacao(produto_id):
+    """Registra uma visualização do produto (buffer ou UPDATE imediato, conforme settings)"""
+    from produtos.models import Produto
+
+    if getattr(settings, 'PRODUTOS_VISUALIZACOES_BUFFER', True):
+        contador.registrar(produto_id)
+    else:
+        Produto.objects.filter(id=produto_id).update(visualizacoes=F('visualizacoes') + 1)
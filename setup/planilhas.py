@@ -0,0 +1,41 @@
+"""
+Leitura de planilhas (CSV / XLSX) em fluxo, compartilhada pelas importações
+dos apps (catálogo de produtos, base de CEPs).
+
+O cabeçalho da primeira linha vira as chaves de cada linha, em minúsculas;
+linhas vazias são puladas. openpyxl só é importado para arquivos XLSX.
+"""
+import csv
+import os
+
+
+def ler_linhas(caminho):
+    """Gera (numero, {coluna: valor}) de um CSV ou XLSX, sem carregar o arquivo inteiro"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        planilha = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            linhas = planilha.active.iter_rows(values_only=True)
+            cabecalho = [str(coluna or '').strip().lower() for coluna in next(linhas, ())]
+            for numero, valores in enumerate(linhas, start=2):
+                if any(valor not in (None, '') for valor in valores):
+                    yield numero, dict(zip(cabecalho, valores))
+        finally:
+            planilha.close()
+    elif extensao == '.csv':
+        with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+            except csv.Error:
+                dialeto = csv.excel
+            leitor = csv.reader(arquivo, dialeto)
+            cabecalho = [coluna.strip().lower() for coluna in next(leitor, [])]
+            for numero, valores in enumerate(leitor, start=2):
+                if any(valores):
+                    yield numero, dict(zip(cabecalho, valores))
+    else:
+        raise ValueError(f'Formato não suportado: {extensao} (use .csv ou .xlsx)')
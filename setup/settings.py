@@ -35,11 +35,14 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
+    'import_export',
     
     # Custom apps
     'usuarios',
     'produtos',
     'categorias',
+    'midia',
+    'notificacoes',
 ]
 
 MIDDLEWARE = [
@@ -121,6 +124,34 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Storage de mídia endereçado por conteúdo (midia.storage)
+# MIDIA_STORAGE_BACKEND: 'local' (MEDIA_ROOT) ou 's3' (django-storages)
+MIDIA_STORAGE_BACKEND = os.getenv('MIDIA_STORAGE_BACKEND', 'local')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'midia.storage.ArmazenamentoLocal',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+if MIDIA_STORAGE_BACKEND == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'midia.storage_s3.ArmazenamentoS3',
+        'OPTIONS': {
+            'bucket_name': os.getenv('AWS_STORAGE_BUCKET_NAME', ''),
+            'region_name': os.getenv('AWS_S3_REGION_NAME') or None,
+            'endpoint_url': os.getenv('AWS_S3_ENDPOINT_URL') or None,
+            'custom_domain': os.getenv('AWS_S3_CUSTOM_DOMAIN') or None,
+            'querystring_auth': False,
+        },
+    }
+
+# Blobs sem referências são apagados por coletar_blobs após esta carência (horas)
+MIDIA_BLOBS_CARENCIA_HORAS = int(os.getenv('MIDIA_BLOBS_CARENCIA_HORAS', '24'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -184,18 +215,39 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = 'noreply@sistemagestao.com'
+EMAIL_TIMEOUT = 10  # segundos (SMTP usado pelo worker da outbox)
+
+# Outbox de e-mails (notificacoes.outbox): enviados pelo comando processar_outbox
+NOTIFICACOES_OUTBOX_MAX_TENTATIVAS = int(os.getenv('NOTIFICACOES_OUTBOX_MAX_TENTATIVAS', '5'))
+NOTIFICACOES_OUTBOX_BACKOFF = int(os.getenv('NOTIFICACOES_OUTBOX_BACKOFF', '60'))
+NOTIFICACOES_OUTBOX_RETENCAO_DIAS = int(os.getenv('NOTIFICACOES_OUTBOX_RETENCAO_DIAS', '30'))
 
 # Custom User Model
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
 
 # Configurações de sessão para integração com JWT
+# SESSION_BACKEND: db, cached_db, cache ou signed_cookies
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
 SESSION_COOKIE_AGE = 3600  # 1 hora
-SESSION_SAVE_EVERY_REQUEST = True  # Renovar sessão a cada requisição
+# Desligado: a sessão só é gravada quando muda, e a validade é renovada
+# quando passa da metade de SESSION_COOKIE_AGE (ver usuarios.authentication)
+SESSION_SAVE_EVERY_REQUEST = os.getenv('SESSION_SAVE_EVERY_REQUEST', 'False') == 'True'
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# API sem sessão: requisições em JWT_API_PREFIXO autenticam só pelo token JWT
+# (login e logout continuam criando/encerrando a sessão das páginas HTML)
+JWT_API_STATELESS = os.getenv('JWT_API_STATELESS', 'False') == 'True'
+JWT_API_PREFIXO = '/api/'
+
 # Frontend URL
 FRONTEND_URL = 'http://localhost:8000'
 
@@ -212,4 +264,15 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
-}
\ No newline at end of file
+}
+# Contador de visualizações de produtos (gravação agrupada em segundo plano)
+PRODUTOS_VISUALIZACOES_BUFFER = os.getenv('PRODUTOS_VISUALIZACOES_BUFFER', 'True') == 'True'
+PRODUTOS_VISUALIZACOES_INTERVALO = int(os.getenv('PRODUTOS_VISUALIZACOES_INTERVALO', '10'))
+
+# Uploads de imagem (produtos e foto de usuário): recebidos em streaming e limitados
+MIDIA_UPLOAD_TAMANHO_MAXIMO = int(os.getenv('MIDIA_UPLOAD_TAMANHO_MAXIMO', str(10 * 1024 * 1024)))
+
+# Consulta de CEP (usuarios.cep): backend remoto usado quando o CEP não está na base local
+# (usuarios.cep.MemoriaBackend funciona sem rede, para testes e desenvolvimento offline)
+USUARIOS_CEP_BACKEND = os.getenv('USUARIOS_CEP_BACKEND', 'usuarios.cep.BrasilApiBackend')
+USUARIOS_CEP_TIMEOUT = (2, 3)  # segundos: conexão, leitura
@@ -3,7 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
-from usuarios.views import CustomTokenObtainPairView
+from usuarios.views import CepView, CustomTokenObtainPairView
 from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
 urlpatterns = [
@@ -18,6 +18,9 @@ urlpatterns = [
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+
+    # Consulta de endereço por CEP (usada pelos formulários de cadastro e perfil)
+    path('api/cep/<str:cep>/', CepView.as_view(), name='cep'),
     
     # Frontend URLs
     path('', TemplateView.as_view(template_name='index.html'), name='index'),
@@ -273,7 +273,7 @@ async handleLoginSuccess(data) {
             // Adicionar delay para evitar muitas requisições
             await new Promise(resolve => setTimeout(resolve, 500));
             
-            const response = await fetch(`https://brasilapi.com.br/api/cep/v2/${cep}`, {
+            const response = await fetch(`/api/cep/${cep}/`, {
                 headers: {
                     'Accept': 'application/json'
                 }
@@ -298,10 +298,10 @@ async handleLoginSuccess(data) {
     }
 
     preencherEndereco(data) {
-        this.preencherCampo('logradouro', data.street);
-        this.preencherCampo('bairro', data.neighborhood);
-        this.preencherCampo('cidade', data.city);
-        this.preencherCampo('estado', data.state);
+        this.preencherCampo('logradouro', data.logradouro);
+        this.preencherCampo('bairro', data.bairro);
+        this.preencherCampo('cidade', data.cidade);
+        this.preencherCampo('estado', data.estado);
     }
 
     preencherCampo(id, value) {
@@ -315,26 +315,21 @@ class CepHandler {
         this.limparErros();
 
         try {
-            console.log(`Fazendo requisição para ViaCEP: ${cepNumerico}`);
+            console.log(`Consultando CEP na API: ${cepNumerico}`);
             
-            // Faz a requisição à API ViaCEP
-            const response = await fetch(`https://viacep.com.br/ws/${cepNumerico}/json/`, {
+            // Consulta o serviço de CEP do próprio sistema
+            const response = await fetch(`/api/cep/${cepNumerico}/`, {
                 method: 'GET',
                 headers: {
                     'Accept': 'application/json',
-                },
-                timeout: 10000 // 10 segundos timeout
+                }
             });
 
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-            }
-
             const data = await response.json();
             console.log('Resposta da API:', data);
 
-            if (data.erro) {
-                throw new Error('CEP não encontrado na base de dados');
+            if (!response.ok) {
+                throw new Error(data.erro || `HTTP ${response.status}: ${response.statusText}`);
             }
 
             // Preenche os campos com os dados retornados
@@ -369,12 +364,12 @@ class CepHandler {
         }
         
         if (this.cidadeInput) {
-            this.cidadeInput.value = data.localidade || '';
+            this.cidadeInput.value = data.cidade || '';
             this.cidadeInput.classList.add('preenchido-auto');
         }
         
         if (this.estadoInput) {
-            this.estadoInput.value = data.uf || '';
+            this.estadoInput.value = data.estado || '';
             this.estadoInput.classList.add('preenchido-auto');
         }
         
@@ -4,4 +4,6 @@ from django.apps import AppConfig
 class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuarios'
-    
\ No newline at end of file
+
+    def ready(self):
+        from usuarios import signals  # noqa: F401
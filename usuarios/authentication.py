@@ -1,133 +1,202 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils.translation import gettext_lazy as _
 import logging
-from django.contrib.auth import get_user_model
+import time
+
+from usuarios import cache_usuarios
 
 logger = logging.getLogger(__name__)
-User = get_user_model()
+
+# Caches por requisição (atributos do HttpRequest), compartilhados entre
+# JWTAuthMiddleware e CustomJWTAuthentication
+ATRIBUTO_TOKENS = '_tokens_jwt'
+ATRIBUTO_USUARIOS = '_usuarios_autenticados'
+ATRIBUTO_SESSAO_SINCRONIZADA = '_sessao_jwt_sincronizada'
+
+# Chave da sessão com o instante (epoch) da última renovação da validade
+CHAVE_RENOVACAO = 'renovada_em'
+
+
+def requisicao_django(request):
+    """HttpRequest por trás de um Request do DRF (ou o próprio HttpRequest)"""
+    return getattr(request, '_request', request)
+
+
+def api_sem_sessao(request):
+    """Modo JWT_API_STATELESS: requisições da API autenticam só pelo token, sem ler ou gravar a sessão"""
+    request = requisicao_django(request)
+    return getattr(settings, 'JWT_API_STATELESS', False) and request.path.startswith(
+        getattr(settings, 'JWT_API_PREFIXO', '/api/')
+    )
+
+
+def atualizar_sessao(request, **valores):
+    """
+    Grava na sessão apenas os valores que mudaram: o SessionMiddleware só
+    salva sessões modificadas. Sem SESSION_SAVE_EVERY_REQUEST, a validade da
+    sessão é renovada quando já passou da metade de SESSION_COOKIE_AGE.
+    """
+    sessao = requisicao_django(request).session
+    for chave, valor in valores.items():
+        if sessao.get(chave) != valor:
+            sessao[chave] = valor
+
+    if not settings.SESSION_SAVE_EVERY_REQUEST:
+        agora = int(time.time())
+        if agora - sessao.get(CHAVE_RENOVACAO, 0) >= settings.SESSION_COOKIE_AGE // 2:
+            sessao[CHAVE_RENOVACAO] = agora
+
+
+def validar_token(request, raw_token):
+    """
+    Decodifica e valida o token de acesso uma única vez por requisição.
+    Levanta InvalidToken (também nas chamadas seguintes com o mesmo token).
+    """
+    request = requisicao_django(request)
+    if isinstance(raw_token, bytes):
+        raw_token = raw_token.decode()
+    tokens = request.__dict__.setdefault(ATRIBUTO_TOKENS, {})
+    if raw_token not in tokens:
+        try:
+            tokens[raw_token] = JWTAuthentication().get_validated_token(raw_token)
+        except InvalidToken as e:
+            tokens[raw_token] = e
+    resultado = tokens[raw_token]
+    if isinstance(resultado, InvalidToken):
+        raise resultado
+    return resultado
+
+
+def carregar_usuario(request, user_id):
+    """
+    Usuário ativo e não deletado com o ID (ou None), resolvido uma vez por
+    requisição a partir do cache de usuários (banco só quando a entrada falta).
+    """
+    request = requisicao_django(request)
+    usuarios = request.__dict__.setdefault(ATRIBUTO_USUARIOS, {})
+    chave = str(user_id)
+    if chave not in usuarios:
+        try:
+            usuario = cache_usuarios.obter(user_id)
+        except (ValueError, DjangoValidationError):
+            # ID malformado no token ou na sessão
+            usuario = None
+        usuarios[chave] = usuario if usuario is not None and usuario.is_active and not usuario.deleted else None
+    return usuarios[chave]
+
+
+def autenticar_token(request, raw_token):
+    """
+    Usuário e token validado correspondentes ao JWT.
+    Levanta InvalidToken ou AuthenticationFailed.
+    """
+    validated_token = validar_token(request, raw_token)
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    if not user_id:
+        raise AuthenticationFailed(
+            _('Token inválido: user_id não encontrado'),
+            code='token_invalid'
+        )
+
+    usuario = carregar_usuario(request, user_id)
+    if usuario is None:
+        logger.warning(f'Tentativa de autenticação com usuário não encontrado: {user_id}')
+        raise AuthenticationFailed(
+            _('Usuário não encontrado ou inativo'),
+            code='user_not_found'
+        )
+    return usuario, validated_token
+
+
+def usuario_da_sessao(request):
+    """Usuário guardado na sessão (user_id); limpa a sessão se ele não existir mais"""
+    request = requisicao_django(request)
+    if api_sem_sessao(request):
+        return None
+    user_id = request.session.get('user_id')
+    if not user_id:
+        return None
+
+    usuario = carregar_usuario(request, user_id)
+    if usuario is None:
+        del request.session['user_id']
+    else:
+        atualizar_sessao(request)
+    return usuario
+
+
+def sincronizar_sessao(request, usuario, token):
+    """
+    Guarda o token e o usuário na sessão Django. A sessão só é gravada (pelo
+    SessionMiddleware) quando esses valores mudam ou a validade é renovada.
+    """
+    request = requisicao_django(request)
+    if api_sem_sessao(request) or request.__dict__.get(ATRIBUTO_SESSAO_SINCRONIZADA):
+        return
+    request.__dict__[ATRIBUTO_SESSAO_SINCRONIZADA] = True
+
+    if isinstance(token, bytes):
+        token = token.decode()
+    atualizar_sessao(
+        request,
+        jwt_access=str(token),
+        user_id=str(usuario.id),
+        is_authenticated=True
+    )
+    if request.session.modified:
+        logger.debug(f'Sessão Django sincronizada para usuário JWT: {usuario.email}')
 
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
     Autenticação JWT customizada que sincroniza com sessão Django.
+
+    O token é validado e o usuário carregado uma única vez por requisição:
+    quando o JWTAuthMiddleware já resolveu o mesmo token, o resultado é reaproveitado.
     """
-    
+
     def authenticate(self, request):
         """
         Tenta autenticar via JWT e sincroniza com sessão Django.
         """
-        # Primeiro tenta a autenticação JWT padrão
-        auth_result = super().authenticate(request)
-        
-        if auth_result:
-            user, validated_token = auth_result
-            
-            # Sincronizar com sessão Django
-            self.sync_with_django_session(request, user, validated_token)
-            
-            return user, validated_token
-        
-        # Se JWT falhou, tentar sessão Django
-        return self.authenticate_via_session(request)
-    
-    def sync_with_django_session(self, request, user, validated_token):
-        """
-        Sincroniza autenticação JWT com sessão Django.
-        """
-        try:
-            # Criar sessão se não existir
-            if not request.session.session_key:
-                request.session.create()
-            
-            # Armazenar informações na sessão
-            request.session['jwt_access'] = str(validated_token)
-            request.session['user_id'] = str(user.id)
-            request.session['is_authenticated'] = True
-            
-            # Manter sessão ativa
-            request.session.save()
-            
-            logger.debug(f'Sessão Django sincronizada para usuário JWT: {user.email}')
-            
-        except Exception as e:
-            logger.error(f'Erro ao sincronizar sessão Django: {str(e)}')
-    
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+
+        if raw_token is None:
+            # Sem JWT no header, tentar sessão Django
+            return self.authenticate_via_session(request)
+
+        user, validated_token = autenticar_token(request, raw_token)
+
+        # Sincronizar com sessão Django
+        sincronizar_sessao(request, user, raw_token)
+
+        logger.debug(f'Usuário autenticado via JWT: {user.email}')
+
+        return user, validated_token
+
     def authenticate_via_session(self, request):
         """
         Tenta autenticar via sessão Django.
         """
-        user_id = request.session.get('user_id')
-        
-        if not user_id:
-            return None
-        
-        try:
-            user = User.objects.get(
-                id=user_id,
-                is_active=True,
-                deleted=False
-            )
-            
-            # Verificar se há token JWT válido na sessão
-            jwt_token = request.session.get('jwt_access')
-            if jwt_token:
-                try:
-                    validated_token = self.get_validated_token(jwt_token)
-                    return user, validated_token
-                except AuthenticationFailed:
-                    # Token JWT expirado, mas sessão ainda válida
-                    pass
-            
-            # Retornar apenas o usuário (sem token) para sessão pura
-            return user, None
-            
-        except User.DoesNotExist:
-            # Limpar sessão inválida
-            if 'user_id' in request.session:
-                del request.session['user_id']
-                request.session.save()
+        user = usuario_da_sessao(request)
+
+        if user is None:
             return None
-    
-    def get_user(self, validated_token):
-        """
-        Retorna o usuário autenticado correspondente ao token.
-        """
-        try:
-            user_id = validated_token.get('user_id')
-            
-            if not user_id:
-                raise AuthenticationFailed(
-                    _('Token inválido: user_id não encontrado'),
-                    code='token_invalid'
-                )
-            
-            # Buscar usuário na tabela customizada
-            usuario = User.objects.get(
-                id=user_id,
-                is_active=True,
-                deleted=False
-            )
-            
-            logger.debug(f'Usuário autenticado via JWT: {usuario.email}')
-            
-            return usuario
-            
-        except User.DoesNotExist:
-            logger.warning(f'Tentativa de autenticação com usuário não encontrado: {user_id}')
-            raise AuthenticationFailed(
-                _('Usuário não encontrado ou inativo'),
-                code='user_not_found'
-            )
-        except KeyError as e:
-            logger.error(f'Erro no token JWT: {str(e)}')
-            raise AuthenticationFailed(
-                _('Token inválido'),
-                code='token_invalid'
-            )
-        except Exception as e:
-            logger.error(f'Erro na autenticação JWT: {str(e)}')
-            raise AuthenticationFailed(
-                _('Erro na autenticação'),
-                code='authentication_error'
-            )
\ No newline at end of file
+
+        # Verificar se há token JWT válido na sessão
+        jwt_token = requisicao_django(request).session.get('jwt_access')
+        if jwt_token:
+            try:
+                return user, validar_token(request, jwt_token)
+            except InvalidToken:
+                # Token JWT expirado, mas sessão ainda válida
+                pass
+
+        # Retornar apenas o usuário (sem token) para sessão pura
+        return user, None
@@ -0,0 +1,91 @@
+"""
+Cache do usuário autenticado.
+
+Guarda por ID um snapshot compacto do usuário: os valores da linha (sem
+segredos) e as permissões já resolvidas. A chave combina o ID com uma versão;
+save/delete do usuário e mudanças de grupos ou permissões trocam a versão após
+o commit, de modo que entradas antigas nunca mais são lidas e expiram pelo TTL.
+
+A instância é reconstruída com from_db: password e reset_token ficam adiados
+(carregados do banco apenas se acessados) e save() grava só os campos carregados.
+
+Setting: USUARIOS_CACHE_AUTH_TIMEOUT (segundos, padrão: 5 minutos).
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+from usuarios.models import Usuario
+
+CHAVE_VERSAO = 'usuarios:auth:versao:{}'
+CHAVE_SNAPSHOT = 'usuarios:auth:{}:{}'
+
+TIMEOUT = getattr(settings, 'USUARIOS_CACHE_AUTH_TIMEOUT', 5 * 60)
+
+# Nunca vão para o cache
+CAMPOS_SECRETOS = ('password', 'reset_token')
+
+# Usuário inexistente (cacheado para não repetir a consulta)
+INEXISTENTE = ()
+
+
+def campos_snapshot():
+    return [campo.attname for campo in Usuario._meta.concrete_fields if campo.attname not in CAMPOS_SECRETOS]
+
+
+def versao(user_id):
+    """Versão do usuário; inicializada com um valor único quando ausente"""
+    chave = CHAVE_VERSAO.format(user_id)
+    valor = cache.get(chave)
+    if valor is None:
+        valor = uuid.uuid4().hex
+        if not cache.add(chave, valor, None):
+            valor = cache.get(chave) or valor
+    return valor
+
+
+def invalidar(user_ids):
+    cache.set_many({CHAVE_VERSAO.format(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+
+def _instancia(campos, valores):
+    return Usuario.from_db(router.db_for_read(Usuario), campos, valores)
+
+
+def _montar(snapshot):
+    campos, valores, permissoes = snapshot
+    usuario = _instancia(campos, valores)
+    if permissoes is not None:
+        # Mesmos atributos em que o ModelBackend guarda as permissões resolvidas
+        usuario._user_perm_cache, usuario._group_perm_cache = permissoes
+        usuario._perm_cache = {*permissoes[0], *permissoes[1]}
+    return usuario
+
+
+def obter(user_id):
+    """
+    Usuário com o ID (em qualquer estado) ou None.
+    Sem consultas ao banco quando a entrada do cache está válida.
+    """
+    # A versão é lida antes do banco: uma escrita concorrente troca a versão
+    # depois do commit e torna a entrada gravada aqui inalcançável
+    chave = CHAVE_SNAPSHOT.format(user_id, versao(user_id))
+    snapshot = cache.get(chave)
+    if snapshot is None:
+        campos = campos_snapshot()
+        valores = Usuario.objects.filter(id=user_id).values_list(*campos).first()
+        if valores is None:
+            snapshot = INEXISTENTE
+        else:
+            usuario = _instancia(campos, valores)
+            permissoes = None
+            if usuario.is_active and not usuario.is_superuser:
+                # Superusuários ativos têm todas as permissões sem consultar os backends
+                backend = ModelBackend()
+                permissoes = (backend.get_user_permissions(usuario), backend.get_group_permissions(usuario))
+            snapshot = (campos, tuple(valores), permissoes)
+        cache.set(chave, snapshot, TIMEOUT)
+    return _montar(snapshot) if snapshot else None
@@ -0,0 +1,223 @@
+"""
+Consulta de endereço por CEP.
+
+A consulta segue esta ordem:
+1. a base local (tabela ceps, importada com o comando importar_ceps);
+2. o cache compartilhado;
+3. o backend remoto (BrasilAPI), com uma sessão HTTP reaproveitada e um
+   timeout curto.
+
+As respostas remotas ficam em cache, inclusive "não encontrado" (por menos
+tempo). Uma falha remota também fica em cache por alguns segundos, para que
+um serviço fora do ar não prenda cada requisição até o timeout.
+
+O backend remoto vem da setting USUARIOS_CEP_BACKEND (caminho pontuado da
+classe). MemoriaBackend responde sem rede, para testes e desenvolvimento offline.
+
+Settings:
+- USUARIOS_CEP_TIMEOUT: (conexão, leitura) em segundos, padrão (2, 3)
+- USUARIOS_CEP_CACHE_TIMEOUT: segundos, padrão 30 dias
+"""
+import logging
+import re
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from setup.planilhas import ler_linhas
+from usuarios.models import Cep
+
+logger = logging.getLogger(__name__)
+
+CHAVE_CACHE = 'usuarios:cep:{}'
+
+TIMEOUT = getattr(settings, 'USUARIOS_CEP_TIMEOUT', (2, 3))
+TIMEOUT_CACHE = getattr(settings, 'USUARIOS_CEP_CACHE_TIMEOUT', 30 * 24 * 60 * 60)
+TIMEOUT_CACHE_NAO_ENCONTRADO = 24 * 60 * 60
+TIMEOUT_CACHE_FALHA = 30
+
+TAMANHO_LOTE = 5000
+
+CAMPOS_ENDERECO = ('logradouro', 'bairro', 'cidade', 'estado')
+
+# Marcadores guardados no cache no lugar do endereço
+NAO_ENCONTRADO = 'nao_encontrado'
+INDISPONIVEL = 'indisponivel'
+
+
+class CepIndisponivel(Exception):
+    """Backend remoto fora do ar, lento demais ou com resposta inválida"""
+
+
+def normalizar(cep):
+    """Os 8 dígitos do CEP (aceita 00000-000), ou None se o formato for inválido"""
+    correspondencia = re.fullmatch(r'(\d{5})-?(\d{3})', str(cep or '').strip())
+    return ''.join(correspondencia.groups()) if correspondencia else None
+
+
+def formatar(cep):
+    return f'{cep[:5]}-{cep[5:]}'
+
+
+def _endereco(cep, dados):
+    return {'cep': formatar(cep), **{campo: dados.get(campo) or '' for campo in CAMPOS_ENDERECO}}
+
+
+class BrasilApiBackend:
+    """BrasilAPI (CEP v2) via uma sessão HTTP por processo, com pool de conexões"""
+
+    URL = 'https://brasilapi.com.br/api/cep/v2/{}'
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or TIMEOUT
+        self.sessao = requests.Session()
+        self.sessao.headers['Accept'] = 'application/json'
+        # Sem novas tentativas: o timeout já é o tempo máximo de espera
+        self.sessao.mount('https://', HTTPAdapter(pool_maxsize=10, max_retries=0))
+
+    def consultar(self, cep):
+        """Endereço do CEP ou None se não existir. Levanta CepIndisponivel."""
+        try:
+            resposta = self.sessao.get(self.URL.format(cep), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise CepIndisponivel(str(e)) from e
+
+        if resposta.status_code in (400, 404):
+            return None
+        if resposta.status_code != 200:
+            raise CepIndisponivel(f'HTTP {resposta.status_code}')
+        try:
+            dados = resposta.json()
+        except ValueError as e:
+            raise CepIndisponivel('Resposta inválida') from e
+        return {
+            'logradouro': dados.get('street'),
+            'bairro': dados.get('neighborhood'),
+            'cidade': dados.get('city'),
+            'estado': dados.get('state'),
+        }
+
+
+class MemoriaBackend:
+    """Backend sem rede: endereços em memória e consultas registradas"""
+
+    def __init__(self, enderecos=None, indisponivel=False):
+        self.enderecos = {normalizar(cep): endereco for cep, endereco in (enderecos or {}).items()}
+        self.indisponivel = indisponivel
+        self.consultas = []
+
+    def consultar(self, cep):
+        self.consultas.append(cep)
+        if self.indisponivel:
+            raise CepIndisponivel('Backend em memória indisponível')
+        return self.enderecos.get(cep)
+
+
+class ServicoCep:
+    """Consulta de CEP: base local, cache e backend remoto, nessa ordem"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def consultar(self, cep):
+        """
+        Endereço do CEP (cep, logradouro, bairro, cidade, estado) ou None se
+        ele não existir. Levanta ValueError para formato inválido e
+        CepIndisponivel quando o backend remoto falha.
+        """
+        digitos = normalizar(cep)
+        if digitos is None:
+            raise ValueError(f'CEP inválido: {cep}')
+
+        local = Cep.objects.filter(cep=digitos).values(*CAMPOS_ENDERECO).first()
+        if local is not None:
+            return _endereco(digitos, local)
+
+        chave = CHAVE_CACHE.format(digitos)
+        dados = cache.get(chave)
+        if dados is None:
+            try:
+                dados = self.backend.consultar(digitos)
+            except CepIndisponivel as e:
+                logger.warning(f'Falha ao consultar o CEP {digitos}: {e}')
+                cache.set(chave, INDISPONIVEL, TIMEOUT_CACHE_FALHA)
+                raise
+            if dados is None:
+                dados = NAO_ENCONTRADO
+                cache.set(chave, dados, TIMEOUT_CACHE_NAO_ENCONTRADO)
+            else:
+                dados = {campo: dados.get(campo) or '' for campo in CAMPOS_ENDERECO}
+                cache.set(chave, dados, TIMEOUT_CACHE)
+
+        if dados == INDISPONIVEL:
+            raise CepIndisponivel('Falha recente na consulta remota')
+        if dados == NAO_ENCONTRADO:
+            return None
+        return _endereco(digitos, dados)
+
+
+_servico = None
+
+
+def obter_servico():
+    """Serviço de CEP com o backend configurado (um por processo)"""
+    global _servico
+    if _servico is None:
+        caminho = getattr(settings, 'USUARIOS_CEP_BACKEND', None)
+        backend = import_string(caminho)() if caminho else BrasilApiBackend()
+        _servico = ServicoCep(backend)
+    return _servico
+
+
+def definir_backend(backend):
+    """Troca o backend remoto (ex.: MemoriaBackend nos testes); None volta ao configurado"""
+    global _servico
+    _servico = ServicoCep(backend) if backend is not None else None
+
+
+def consultar(cep):
+    return obter_servico().consultar(cep)
+
+
+def importar(caminho, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa CEPs de um CSV ou XLSX com as colunas cep, logradouro, bairro,
+    cidade e estado (upsert pelo CEP, em lotes). Retorna (importados, invalidos).
+    """
+    importados = invalidos = 0
+    # Por CEP: uma linha repetida no mesmo lote não pode gerar dois upserts
+    lote = {}
+
+    def gravar():
+        Cep.objects.bulk_create(
+            list(lote.values()),
+            batch_size=tamanho_lote,
+            update_conflicts=True,
+            unique_fields=['cep'],
+            update_fields=list(CAMPOS_ENDERECO)
+        )
+
+    for numero, linha in ler_linhas(caminho):
+        digitos = normalizar(linha.get('cep'))
+        valores = {campo: str(linha.get(campo) or '').strip() for campo in CAMPOS_ENDERECO}
+        valores['estado'] = valores['estado'].upper()
+        if digitos is None or not valores['cidade'] or len(valores['estado']) != 2:
+            logger.warning(f'Linha {numero} ignorada: CEP, cidade ou estado inválido')
+            invalidos += 1
+            continue
+
+        lote[digitos] = Cep(cep=digitos, **{
+            campo: valor[:Cep._meta.get_field(campo).max_length] for campo, valor in valores.items()
+        })
+        if len(lote) == tamanho_lote:
+            gravar()
+            importados += len(lote)
+            lote = {}
+
+    if lote:
+        gravar()
+        importados += len(lote)
+    return importados, invalidos
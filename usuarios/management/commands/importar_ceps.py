@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios import cep
+
+
+class Command(BaseCommand):
+    help = 'Importa a base local de CEPs de um arquivo CSV ou XLSX (upsert pelo CEP)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo com as colunas cep, logradouro, bairro, cidade e estado')
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=cep.TAMANHO_LOTE,
+            help=f'CEPs por lote (padrão: {cep.TAMANHO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            importados, invalidos = cep.importar(options['arquivo'], tamanho_lote=options['lote'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if invalidos:
+            self.stdout.write(self.style.WARNING(f'{invalidos} linhas inválidas ignoradas'))
+        self.stdout.write(self.style.SUCCESS(f'Importação concluída: {importados} CEPs'))
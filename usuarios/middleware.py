@@ -1,19 +1,21 @@
-import jwt
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
 import logging
 from django.utils.deprecation import MiddlewareMixin
 
+from usuarios.authentication import api_sem_sessao, autenticar_token, sincronizar_sessao, usuario_da_sessao
+
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 
 class JWTAuthMiddleware(MiddlewareMixin):
     """
     Middleware para autenticar usuários via JWT e sincronizar com sessão Django.
+    
+    Token validado e usuário ficam em cache na requisição e são reaproveitados
+    pela CustomJWTAuthentication do DRF (ver usuarios.authentication).
     """
     
     def process_request(self, request):
@@ -22,61 +24,37 @@ class JWTAuthMiddleware(MiddlewareMixin):
         
         if token:
             try:
-                # Validar token JWT
-                validated_token = UntypedToken(token)
-                user_id = validated_token.get('user_id')
+                user, validated_token = autenticar_token(request, token)
+                
+                # Autenticar usuário na request Django
+                request.user = user
+                
+                # Sincronizar com sessão Django
+                sincronizar_sessao(request, user, token)
                 
-                if user_id:
-                    # Buscar usuário
-                    try:
-                        user = User.objects.get(
-                            id=user_id,
-                            is_active=True,
-                            deleted=False
-                        )
-                        
-                        # Autenticar usuário na request Django
-                        request.user = user
-                        
-                        # Sincronizar com sessão Django se não existir
-                        if not request.session.session_key:
-                            request.session.create()
-                        
-                        # Armazenar token JWT na sessão
-                        request.session['jwt_access'] = token
-                        request.session['user_id'] = str(user_id)
-                        request.session.save()
-                        
-                        logger.debug(f'Usuário autenticado via middleware JWT: {user.email}')
-                        
-                    except User.DoesNotExist:
-                        request.user = AnonymousUser()
-                        logger.warning(f'Usuário não encontrado no middleware: {user_id}')
+                logger.debug(f'Usuário autenticado via middleware JWT: {user.email}')
                 
-            except (InvalidToken, TokenError, jwt.DecodeError, 
-                    jwt.ExpiredSignatureError, jwt.InvalidSignatureError) as e:
+            except (InvalidToken, AuthenticationFailed) as e:
                 # Token JWT inválido, tentar sessão Django
                 request.user = AnonymousUser()
                 logger.debug(f'Token JWT inválido no middleware: {str(e)}')
         
+        if api_sem_sessao(request):
+            # API sem sessão: sem JWT válido a requisição é anônima, sem carregar a sessão
+            if not token or not request.user.is_authenticated:
+                request.user = AnonymousUser()
+            return
+        
         # Se JWT falhou, verificar sessão Django
         if not hasattr(request, 'user') or not request.user.is_authenticated:
-            user_id = request.session.get('user_id')
-            if user_id:
-                try:
-                    user = User.objects.get(
-                        id=user_id,
-                        is_active=True,
-                        deleted=False
-                    )
+            if request.session.get('user_id'):
+                user = usuario_da_sessao(request)
+                if user is not None:
                     request.user = user
                     logger.debug(f'Usuário autenticado via sessão no middleware: {user.email}')
-                except User.DoesNotExist:
+                else:
+                    # Sessão inválida (user_id já removido da sessão)
                     request.user = AnonymousUser()
-                    # Limpar sessão inválida
-                    if 'user_id' in request.session:
-                        del request.session['user_id']
-                        request.session.save()
     
     def get_token_from_request(self, request):
         """
@@ -104,6 +82,9 @@ class JWTAuthMiddleware(MiddlewareMixin):
         """
         Processa a resposta para manter sessão sincronizada.
         """
+        if api_sem_sessao(request):
+            return response
+        
         # Se o usuário está autenticado e tem tokens JWT na sessão
         if hasattr(request, 'user') and request.user.is_authenticated:
             jwt_access = request.session.get('jwt_access')
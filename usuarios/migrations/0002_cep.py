@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cep',
+            fields=[
+                ('cep', models.CharField(help_text='Somente os 8 dígitos', max_length=8, primary_key=True, serialize=False)),
+                ('logradouro', models.CharField(blank=True, default='', max_length=200)),
+                ('bairro', models.CharField(blank=True, default='', max_length=100)),
+                ('cidade', models.CharField(max_length=100)),
+                ('estado', models.CharField(max_length=2)),
+            ],
+            options={
+                'verbose_name': 'CEP',
+                'verbose_name_plural': 'CEPs',
+                'db_table': 'ceps',
+            },
+        ),
+    ]
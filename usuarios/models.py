@@ -212,4 +212,21 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         if not re.search(r'[!@#$%^&*(),.?":{}|<>]', senha):
             erros.append("A senha deve conter pelo menos 1 caractere especial")
         
-        return len(erros) == 0, erros[0] if erros else "Senha válida"
\ No newline at end of file
+        return len(erros) == 0, erros[0] if erros else "Senha válida"
+
+
+class Cep(models.Model):
+    """Base local de CEPs (importada com o comando importar_ceps)"""
+    cep = models.CharField(max_length=8, primary_key=True, help_text='Somente os 8 dígitos')
+    logradouro = models.CharField(max_length=200, blank=True, default='')
+    bairro = models.CharField(max_length=100, blank=True, default='')
+    cidade = models.CharField(max_length=100)
+    estado = models.CharField(max_length=2)
+
+    class Meta:
+        db_table = 'ceps'
+        verbose_name = 'CEP'
+        verbose_name_plural = 'CEPs'
+
+    def __str__(self):
+        return f'{self.cep[:5]}-{self.cep[5:]} ({self.cidade}/{self.estado})'
@@ -3,7 +3,8 @@ from rest_framework import serializers
 from usuarios.models import Usuario
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
-import requests
+
+from usuarios import cep as servico_cep
 
 
 class CadastroSerializer(serializers.ModelSerializer):
@@ -107,13 +108,14 @@ class CadastroSerializer(serializers.ModelSerializer):
             # Formatar CEP
             value = f"{value[:5]}-{value[5:]}"
             
-            # Consultar BrasilAPI
+            # Consultar o serviço de CEP (o endereço é reaproveitado no create)
             try:
-                response = requests.get(f'https://brasilapi.com.br/api/cep/v2/{value}')
-                if response.status_code != 200:
+                self.endereco_cep = servico_cep.consultar(value)
+            except servico_cep.CepIndisponivel:
+                pass  # Se o serviço falhar, continuamos sem validação
+            else:
+                if self.endereco_cep is None:
                     raise serializers.ValidationError('CEP não encontrado')
-            except:
-                pass  # Se a API falhar, continuamos sem validação
         
         return value
 
@@ -146,18 +148,11 @@ class CadastroSerializer(serializers.ModelSerializer):
         return usuario
 
     def buscar_endereco_por_cep(self, data):
-        """Busca endereço usando BrasilAPI"""
-        cep = data['cep'].replace('-', '')
-        try:
-            response = requests.get(f'https://brasilapi.com.br/api/cep/v2/{cep}')
-            if response.status_code == 200:
-                endereco = response.json()
-                data['logradouro'] = endereco.get('street', data.get('logradouro', ''))
-                data['bairro'] = endereco.get('neighborhood', data.get('bairro', ''))
-                data['cidade'] = endereco.get('city', data.get('cidade', ''))
-                data['estado'] = endereco.get('state', data.get('estado', ''))
-        except:
-            pass  # Silencia erros da API
+        """Preenche o endereço com o resultado da consulta feita em validate_cep"""
+        endereco = getattr(self, 'endereco_cep', None)
+        if endereco:
+            for campo in servico_cep.CAMPOS_ENDERECO:
+                data[campo] = endereco[campo] or data.get(campo, '')
 
     @staticmethod
     def validar_cpf(cpf):
@@ -373,18 +368,15 @@ class UsuarioUpdateSerializer(serializers.ModelSerializer):
             # Formatar CEP
             value = f"{value[:5]}-{value[5:]}"
             
-            # Se logradouro não foi fornecido, buscar da API
+            # Se logradouro não foi fornecido, buscar no serviço de CEP
             if not self.initial_data.get('logradouro'):
                 try:
-                    response = requests.get(f'https://brasilapi.com.br/api/cep/v2/{value}')
-                    if response.status_code == 200:
-                        endereco = response.json()
+                    endereco = servico_cep.consultar(value)
+                    if endereco is not None:
                         # Atualizar dados do serializer
-                        self.initial_data['logradouro'] = endereco.get('street', '')
-                        self.initial_data['bairro'] = endereco.get('neighborhood', '')
-                        self.initial_data['cidade'] = endereco.get('city', '')
-                        self.initial_data['estado'] = endereco.get('state', '')
-                except:
-                    pass
+                        for campo in servico_cep.CAMPOS_ENDERECO:
+                            self.initial_data[campo] = endereco[campo]
+                except (servico_cep.CepIndisponivel, AttributeError):
+                    pass  # Serviço fora do ar ou dados imutáveis (QueryDict)
         
         return value
\ No newline at end of file
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from usuarios import cache_usuarios
+from usuarios.models import Usuario
+
+
+def invalidar_apos_commit(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: cache_usuarios.invalidar(user_ids))
+
+
+def membros(grupos):
+    return Usuario.objects.filter(groups__in=grupos).values_list('id', flat=True).distinct()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    """save (inclui soft_delete e restore) e delete trocam a versão do snapshot"""
+    invalidar_apos_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+def invalidar_cache_permissoes_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    """Grupos ou permissões diretas do usuário alterados (por qualquer um dos lados)"""
+    if not reverse:
+        if action.startswith('post_'):
+            invalidar_apos_commit([instance.pk])
+        return
+
+    # Lado do grupo/permissão: pk_set são usuários; no clear, lidos antes da remoção
+    if action in ('post_add', 'post_remove'):
+        invalidar_apos_commit(pk_set)
+    elif action == 'pre_clear':
+        relacao = 'groups' if sender is Usuario.groups.through else 'user_permissions'
+        invalidar_apos_commit(Usuario.objects.filter(**{relacao: instance}).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidar_cache_permissoes_grupo(sender, instance, action, reverse, pk_set, **kwargs):
+    """Permissões de um grupo mudam para todos os seus membros"""
+    if not reverse:
+        if action.startswith('post_'):
+            invalidar_apos_commit(membros([instance.pk]))
+        return
+
+    if action in ('post_add', 'post_remove'):
+        invalidar_apos_commit(membros(pk_set))
+    elif action == 'pre_clear':
+        invalidar_apos_commit(membros(instance.group_set.values_list('id', flat=True)))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidar_cache_grupo_removido(sender, instance, **kwargs):
+    invalidar_apos_commit(membros([instance.pk]))
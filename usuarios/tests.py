@@ -0,0 +1,245 @@
+import os
+import tempfile
+from contextlib import nullcontext
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from usuarios import cache_usuarios
+from usuarios.authentication import CHAVE_RENOVACAO
+from usuarios import cep as servico_cep
+from usuarios.cep import MemoriaBackend, definir_backend
+from usuarios.models import Cep, Usuario
+
+ENDERECO = {'logradouro': 'Praça da Sé', 'bairro': 'Sé', 'cidade': 'São Paulo', 'estado': 'SP'}
+
+
+class CepTests(TestCase):
+    """Consulta de CEP: base local, cache e backend remoto, sem rede"""
+
+    def setUp(self):
+        cache.clear()
+        self.backend = MemoriaBackend({'01001-000': ENDERECO})
+        definir_backend(self.backend)
+        self.addCleanup(definir_backend, None)
+        self.client = APIClient()
+
+    def test_base_local_nao_consulta_o_backend(self):
+        Cep.objects.create(
+            cep='20040002', logradouro='Rua da Assembleia', bairro='Centro', cidade='Rio de Janeiro', estado='RJ'
+        )
+        endereco = servico_cep.consultar('20040-002')
+        self.assertEqual(endereco['cep'], '20040-002')
+        self.assertEqual(endereco['cidade'], 'Rio de Janeiro')
+        self.assertEqual(self.backend.consultas, [])
+
+    def test_segunda_consulta_vem_do_cache(self):
+        esperado = {'cep': '01001-000', **ENDERECO}
+        self.assertEqual(servico_cep.consultar('01001000'), esperado)
+        self.assertEqual(servico_cep.consultar('01001-000'), esperado)
+        self.assertEqual(self.backend.consultas, ['01001000'])
+
+    def test_nao_encontrado_fica_em_cache(self):
+        self.assertIsNone(servico_cep.consultar('99999999'))
+        self.assertIsNone(servico_cep.consultar('99999999'))
+        self.assertEqual(self.backend.consultas, ['99999999'])
+        response = self.client.get('/api/cep/99999-999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.backend.consultas, ['99999999'])
+
+    def test_falha_remota_responde_503_e_fica_em_cache(self):
+        definir_backend(MemoriaBackend(indisponivel=True))
+        with mock.patch.object(servico_cep.cache, 'set', wraps=cache.set) as gravar:
+            response = self.client.get('/api/cep/01001-000/')
+        self.assertEqual(response.status_code, 503)
+        gravar.assert_called_once_with(
+            servico_cep.CHAVE_CACHE.format('01001000'), servico_cep.INDISPONIVEL, servico_cep.TIMEOUT_CACHE_FALHA
+        )
+
+        backend = servico_cep.obter_servico().backend
+        self.assertEqual(self.client.get('/api/cep/01001000/').status_code, 503)
+        self.assertEqual(backend.consultas, ['01001000'])
+
+    def test_cep_invalido_responde_400(self):
+        for cep in ['123', '0100100a', '01001-0000']:
+            with self.subTest(cep=cep):
+                self.assertEqual(self.client.get(f'/api/cep/{cep}/').status_code, 400)
+        self.assertEqual(self.backend.consultas, [])
+
+    def test_endpoint_com_cache_publico(self):
+        response = self.client.get('/api/cep/01001000/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cidade'], 'São Paulo')
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+    def test_importar_csv_com_upsert_pelo_cep(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'ceps.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(
+                    'CEP;Logradouro;Bairro;Cidade;Estado\n'
+                    '20040-002;Rua da Assembleia;Centro;Rio de Janeiro;rj\n'
+                    '123;Rua;Bairro;Cidade;SP\n'
+                    '20040002;Rua da Assembleia;Centro;Rio de Janeiro;RJ\n'
+                )
+            self.assertEqual(servico_cep.importar(caminho), (1, 1))
+        cep = Cep.objects.get()
+        self.assertEqual((cep.cep, cep.cidade, cep.estado), ('20040002', 'Rio de Janeiro', 'RJ'))
+
+
+class AutenticacaoJWTTests(TestCase):
+    """Token decodificado e usuário carregado uma vez por requisição (middleware + DRF)"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(email='jwt@teste.com', nome='Teste', senha='Senha@123')
+        self.token = str(RefreshToken.for_user(self.usuario).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def get(self):
+        response = self.client.get('/api/usuarios/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'jwt@teste.com')
+        return response
+
+    def test_token_e_usuario_resolvidos_uma_vez(self):
+        validar = mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True,
+            side_effect=JWTAuthentication.get_validated_token
+        )
+        with validar as validacoes, mock.patch.object(cache_usuarios, 'obter', wraps=cache_usuarios.obter) as obter, \
+                CaptureQueriesContext(connection) as contexto:
+            self.get()
+        self.assertEqual(validacoes.call_count, 1)
+        self.assertEqual(obter.call_count, 1)
+        consultas_usuario = [consulta for consulta in contexto.captured_queries if 'FROM "usuarios"' in consulta['sql']]
+        self.assertEqual(len(consultas_usuario), 1)
+
+    def test_requisicao_seguinte_so_le_a_sessao(self):
+        self.get()
+        # Usuário e permissões vêm do cache; a sessão não mudou e não é gravada
+        with self.assertNumQueries(1):
+            self.get()
+
+    def test_token_invalido(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(self.client.get('/api/usuarios/me/').status_code, 401)
+
+
+class SessaoJWTTests(TestCase):
+    """A sessão só é gravada quando muda ou quando passa da metade da validade"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(email='sessao@teste.com', nome='Teste', senha='Senha@123')
+        self.client = APIClient()
+        self.autenticar(str(RefreshToken.for_user(self.usuario).access_token))
+
+    def autenticar(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def gravacoes(self, instante=None):
+        """Escritas na tabela de sessões em uma requisição (no instante epoch informado)"""
+        relogio = nullcontext()
+        if instante is not None:
+            relogio = mock.patch('usuarios.authentication.time.time', return_value=instante)
+        with CaptureQueriesContext(connection) as contexto, relogio:
+            self.assertEqual(self.client.get('/api/usuarios/me/').status_code, 200)
+        return len([
+            consulta for consulta in contexto.captured_queries
+            if consulta['sql'].startswith(('INSERT INTO "django_session"', 'UPDATE "django_session"'))
+        ])
+
+    def test_sessao_inalterada_nao_e_gravada(self):
+        self.assertEqual(self.gravacoes(), 1)
+        self.assertEqual(self.gravacoes(), 0)
+        self.assertEqual(self.gravacoes(), 0)
+
+    def test_valor_alterado_grava_a_sessao(self):
+        self.gravacoes()
+        sessao = self.client.session
+        sessao['jwt_access'] = 'outro'
+        sessao.save()
+        # O token do header volta para a sessão
+        self.assertEqual(self.gravacoes(), 1)
+        self.assertEqual(self.gravacoes(), 0)
+
+    def test_renovacao_apos_metade_da_validade(self):
+        inicio = 1_900_000_000
+        self.assertEqual(self.gravacoes(inicio), 1)
+        metade = settings.SESSION_COOKIE_AGE // 2
+        self.assertEqual(self.gravacoes(inicio + metade - 1), 0)
+        self.assertEqual(self.gravacoes(inicio + metade), 1)
+        self.assertEqual(self.client.session[CHAVE_RENOVACAO], inicio + metade)
+        self.assertEqual(self.gravacoes(inicio + metade + 60), 0)
+
+
+class CacheUsuariosTests(TestCase):
+    """Snapshot do usuário autenticado: sem segredos e invalidado por escritas e permissões"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(email='cache@teste.com', nome='Teste', senha='Senha@123')
+        self.permissao = Permission.objects.get(codename='view_cep')
+        self.grupo = Group.objects.create(name='Atendimento')
+
+    def versao_muda(self, alteracao):
+        """A alteração troca a versão do snapshot (só após o commit)"""
+        anterior = cache_usuarios.versao(self.usuario.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            alteracao()
+            self.assertEqual(cache_usuarios.versao(self.usuario.id), anterior)
+        return cache_usuarios.versao(self.usuario.id) != anterior
+
+    def test_snapshot_sem_segredos(self):
+        self.usuario.gerar_reset_token()
+        cache_usuarios.obter(self.usuario.id)
+        campos, valores, _ = cache.get(
+            cache_usuarios.CHAVE_SNAPSHOT.format(self.usuario.id, cache_usuarios.versao(self.usuario.id))
+        )
+        self.assertNotIn('password', campos)
+        self.assertNotIn('reset_token', campos)
+        usuario = Usuario.objects.get(id=self.usuario.id)
+        self.assertNotIn(usuario.password, valores)
+        self.assertNotIn(usuario.reset_token, valores)
+
+        # Segredos adiados: lidos do banco apenas se acessados
+        with self.assertNumQueries(0):
+            cacheado = cache_usuarios.obter(self.usuario.id)
+        self.assertEqual(cacheado.get_deferred_fields(), {'password', 'reset_token'})
+        self.assertTrue(cacheado.check_password('Senha@123'))
+
+    def test_save_invalida(self):
+        def alterar():
+            self.usuario.nome = 'Outro Nome'
+            self.usuario.save()
+        cache_usuarios.obter(self.usuario.id)
+        self.assertTrue(self.versao_muda(alterar))
+        self.assertEqual(cache_usuarios.obter(self.usuario.id).nome, 'Outro Nome')
+
+    def test_grupos_e_permissoes_invalidam(self):
+        cache_usuarios.obter(self.usuario.id)
+        self.assertTrue(self.versao_muda(lambda: self.usuario.groups.add(self.grupo)))
+        self.assertTrue(self.versao_muda(lambda: self.grupo.permissions.add(self.permissao)))
+        self.assertTrue(cache_usuarios.obter(self.usuario.id).has_perm('usuarios.view_cep'))
+
+        self.assertTrue(self.versao_muda(lambda: self.permissao.group_set.clear()))
+        self.assertFalse(cache_usuarios.obter(self.usuario.id).has_perm('usuarios.view_cep'))
+
+        self.assertTrue(self.versao_muda(lambda: self.usuario.user_permissions.add(self.permissao)))
+        self.assertTrue(self.versao_muda(lambda: self.grupo.user_set.clear()))
+        self.assertTrue(self.versao_muda(lambda: self.permissao.user_set.remove(self.usuario)))
+        self.assertFalse(cache_usuarios.obter(self.usuario.id).has_perm('usuarios.view_cep'))
+
+    def test_grupo_removido_invalida(self):
+        self.usuario.groups.add(self.grupo)
+        self.assertTrue(self.versao_muda(self.grupo.delete))
@@ -6,14 +6,17 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 from django.db import transaction
 from django.contrib.auth import login, logout
+from django.utils.cache import patch_cache_control
 import logging
 
 
 
+from midia.uploads import UploadImagemMixin
+from notificacoes.outbox import enfileirar_email
+from usuarios import cep as servico_cep
 from usuarios.models import Usuario
 from usuarios.serializers import (
     CadastroSerializer,
@@ -84,11 +87,12 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             )
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(UploadImagemMixin, viewsets.ModelViewSet):
     queryset = Usuario.objects.filter(deleted=False, is_active=True)
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
+    acoes_upload_imagem = ('cadastro', 'atualizar_perfil', 'create', 'update', 'partial_update')
     
     def get_permissions(self):
         if self.action in ['cadastro', 'recuperar_senha', 'resetar_senha']:
@@ -143,25 +147,23 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                     deleted=False
                 )
                 
-                # Gerar token de recuperação
-                reset_token = usuario.gerar_reset_token()
-                
-                # Em produção, enviar email
-                if not settings.DEBUG:
+                # Gerar token e enfileirar o email na mesma transação
+                # (enviado pelo comando processar_outbox)
+                with transaction.atomic():
+                    reset_token = usuario.gerar_reset_token()
                     reset_url = f"{settings.FRONTEND_URL}/resetar-senha?token={reset_token}"
                     
-                    send_mail(
-                        subject='Recuperação de Senha - Sistema Gestão',
-                        message=f'Olá {usuario.nome},\n\n'
-                               f'Para resetar sua senha, clique no link abaixo:\n'
-                               f'{reset_url}\n\n'
-                               f'Este link expira em 1 hora.\n\n'
-                               f'Se você não solicitou esta recuperação, ignore este email.\n\n'
-                               f'Atenciosamente,\n'
-                               f'Equipe Sistema Gestão',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[email],
-                        fail_silently=False,
+                    enfileirar_email(
+                        assunto='Recuperação de Senha - Sistema Gestão',
+                        mensagem=f'Olá {usuario.nome},\n\n'
+                                 f'Para resetar sua senha, clique no link abaixo:\n'
+                                 f'{reset_url}\n\n'
+                                 f'Este link expira em 1 hora.\n\n'
+                                 f'Se você não solicitou esta recuperação, ignore este email.\n\n'
+                                 f'Atenciosamente,\n'
+                                 f'Equipe Sistema Gestão',
+                        destinatarios=[email],
+                        tipo='recuperacao_senha'
                     )
                 
                 logger.info(f'Solicitação de recuperação de senha para: {email}')
@@ -359,4 +361,29 @@ class SessionAuthView(generics.GenericAPIView):
         return Response({
             'autenticado': False,
             'mensagem': 'Nenhuma sessão ativa'
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+class CepView(generics.GenericAPIView):
+    """Endereço de um CEP (base local, cache e BrasilAPI, nessa ordem)"""
+    permission_classes = [AllowAny]
+    # Consulta pública: dispensa autenticação (e a leitura da sessão)
+    authentication_classes = []
+
+    def get(self, request, cep):
+        try:
+            endereco = servico_cep.consultar(cep)
+        except ValueError:
+            return Response({'erro': 'CEP inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        except servico_cep.CepIndisponivel:
+            return Response(
+                {'erro': 'Serviço de CEP indisponível, tente novamente'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if endereco is None:
+            return Response({'erro': 'CEP não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = Response(endereco)
+        patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+        return response